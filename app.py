@@ -12,8 +12,11 @@ from flask_login import LoginManager
 from app.models.database import init_db
 from app.models.user import User
 
-def create_app(config_class=Config):
-    """Factory para crear la aplicación Flask"""
+def create_app(config_class=Config, start_workers=True):
+    """Factory para crear la aplicación Flask
+    
+    ``start_workers=False`` configura los servicios sin arrancar el procesamiento de tareas.
+    """
     app = Flask(__name__)
     app.config.from_object(config_class)
 
@@ -100,6 +103,15 @@ def create_app(config_class=Config):
     
     # Inicializar base de datos y usuario admin
     init_db(app)
+    
+    # Índices del historial de tareas (también en BBDD creadas por versiones anteriores)
+    from app.services.task_history import ensure_task_indexes
+    with app.app_context():
+        ensure_task_indexes()
+    
+    # Planificador, reanudación de checkpoints y precarga de modelos: con la BBDD ya lista
+    if start_workers:
+        sync_service.start()
 
     # Configurar Flask-Login
     login_manager = LoginManager()
@@ -122,6 +134,8 @@ def create_app(config_class=Config):
 
 if __name__ == '__main__':
     from datetime import datetime
-    app = create_app()
+    # Con debug=True el recargador de Werkzeug ejecuta este módulo también en un proceso padre
+    # que solo vigila archivos: las tareas se procesan únicamente en el hijo que sirve peticiones
+    app = create_app(start_workers=os.environ.get('WERKZEUG_RUN_MAIN') == 'true')
     app.run(host='0.0.0.0', port=5000, debug=True)
 
@@ -5,13 +5,15 @@ Blueprint de API para el procesamiento de archivos - CORREGIDO
 import os
 import uuid
 import json
+from datetime import datetime
 from pathlib import Path
-from flask import Blueprint, request, jsonify, current_app, send_file
+from flask import Blueprint, Response, request, jsonify, current_app, send_file
 from werkzeug.utils import secure_filename
 from app.services.sync_service import sync_service
+from app.services.events import event_bus, format_sse
+from app.services.task_history import query_task_history, parse_date
 from app.utils.file_utils import allowed_file, get_file_extension
 from flask_login import login_required
-from app.models.task import SyncTask
 
 bp = Blueprint('api', __name__)
 
@@ -39,8 +41,9 @@ def upload_files():
                 'error': 'Formato de archivo no soportado. Use: mp4, avi, mkv, mov, wmv, flv, webm'
             }), 400
         
-        # Obtener nombre personalizado opcional
+        # Obtener nombre personalizado y prioridad opcionales
         custom_name = request.form.get('custom_name', '').strip()
+        priority = request.form.get('priority', 0, type=int)
         
         # Generar ID único para la tarea
         task_id = str(uuid.uuid4())
@@ -65,13 +68,14 @@ def upload_files():
             str(original_path), 
             str(dubbed_path),
             custom_name=custom_name,
-            source_type='local'
+            source_type='local',
+            priority=priority
         )
         
         return jsonify({
             'task_id': task_id,
-            'message': 'Archivos subidos correctamente. Procesamiento iniciado.',
-            'status': 'processing'
+            'message': 'Archivos subidos correctamente. Tarea en cola de procesamiento.',
+            'status': 'queued'
         }), 200
         
     except Exception as e:
@@ -107,22 +111,118 @@ def download_result(task_id):
 @bp.route('/tasks')
 @login_required
 def list_tasks():
-    """Listar todas las tareas (en memoria y en BBDD)"""
+    """Listar tareas: las de memoria (primera página) y una página del historial en BBDD
+    
+    Parámetros: ``limit`` (1-200), ``cursor`` (``next_cursor`` de la página anterior),
+    ``status`` (lista separada por comas), ``since``/``until`` (fechas ISO).
+    """
     try:
-        # Tareas en memoria (en curso)
-        tasks_in_memory = sync_service.list_all_tasks().get('tasks', [])
-        # Tareas históricas en BBDD
-        db_tasks = SyncTask.query.order_by(SyncTask.created_at.desc()).all()
-        tasks_db = [t.to_dict() for t in db_tasks]
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+        cursor = request.args.get('cursor') or None
+        statuses = [status for status in request.args.get('status', '').split(',') if status]
+        try:
+            since = parse_date(request.args.get('since'))
+            until = parse_date(request.args.get('until'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Tareas en curso (en memoria): solo en la primera página y con los mismos filtros;
+        # las terminadas se leen de la BBDD, así la respuesta no crece con el uptime
+        memory_tasks = sync_service.list_all_tasks(active_only=True).get('tasks', [])
+        tasks_in_memory = [] if cursor else [
+            task for task in memory_tasks
+            if (not statuses or task['status'] in statuses)
+            and (not since or datetime.fromisoformat(task['created_at']) >= since)
+            and (not until or datetime.fromisoformat(task['created_at']) < until)
+        ]
+        
+        # Historial en BBDD sin duplicar las tareas que siguen en memoria
+        try:
+            tasks_db, next_cursor = query_task_history(
+                limit, cursor=cursor, statuses=statuses, since=since, until=until,
+                exclude_ids=[task['task_id'] for task in memory_tasks]
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         return jsonify({
             'tasks_in_memory': tasks_in_memory,
             'tasks_db': tasks_db,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
             'total': len(tasks_in_memory) + len(tasks_db)
         }), 200
     except Exception as e:
         current_app.logger.error(f"Error en list_tasks: {str(e)}")
         return jsonify({'error': 'Error al listar tareas'}), 500
 
+@bp.route('/tasks/stream')
+@login_required
+def stream_tasks():
+    """Stream SSE con el estado de las tareas (sustituye al sondeo periódico)
+    
+    Envía primero un evento ``snapshot`` con las tareas en curso y después un evento
+    ``task`` por cada cambio. ``?task_id=`` limita el stream a una tarea. Al reconectar,
+    el navegador manda ``Last-Event-ID`` y solo recibe lo que se perdió.
+    """
+    task_filter = request.args.get('task_id')
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    
+    def snapshot():
+        # Sin filtro, solo las tareas en curso; con filtro, esa tarea aunque haya terminado
+        tasks = sync_service.list_all_tasks(active_only=not task_filter, task_id=task_filter)['tasks']
+        return format_sse(None, 'snapshot', {'tasks': tasks})
+    
+    def generate():
+        cursor = last_id
+        if cursor is None or cursor > event_bus.last_id:
+            # Conexión nueva (o el servidor se reinició): estado completo
+            cursor = event_bus.last_id
+            yield snapshot()
+        while True:
+            events, complete = event_bus.wait(cursor, timeout=15)
+            if not complete:
+                yield snapshot()
+            for event_id, event_type, data in events:
+                cursor = event_id
+                if not task_filter or data.get('task_id') == task_filter:
+                    yield format_sse(event_id, event_type, data)
+            if not events:
+                yield ': keepalive\n\n'  # detecta clientes desconectados y evita timeouts de proxies
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@bp.route('/tasks/<task_id>/retry', methods=['POST'])
+@login_required
+def retry_task(task_id):
+    """Reintentar una tarea fallida desde la etapa que falló"""
+    try:
+        result = sync_service.retry_task(task_id)
+    except ValueError:
+        return jsonify({'error': 'Identificador de tarea no válido'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 409
+    
+    if result is None:
+        return jsonify({'error': 'Tarea no encontrada'}), 404
+    result['message'] = 'Tarea reencolada. Se reanudará desde la última etapa completada.'
+    return jsonify(result), 200
+
+@bp.route('/tasks/<task_id>', methods=['DELETE'])
+@login_required
+def cancel_task(task_id):
+    """Cancelar una tarea en cola o en curso"""
+    try:
+        result = sync_service.cancel_task(task_id)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 409
+    
+    if result is None:
+        return jsonify({'error': 'Tarea no encontrada'}), 404
+    result['message'] = 'Tarea cancelada' if result['status'] == 'cancelled' else 'Cancelando tarea...'
+    return jsonify(result), 200
+
 # ===== ENDPOINTS PARA NAVEGACIÓN COMPLETA NFS =====
 
 @bp.route('/nfs-config')
@@ -379,6 +479,11 @@ def nfs_upload():
         dubbed_path = data.get('dubbed_path')
         custom_name = data.get('custom_name', '')
         
+        try:
+            priority = int(data.get('priority', 0) or 0)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Prioridad no válida'}), 400
+        
         if not original_path or not dubbed_path:
             return jsonify({'error': 'Se requieren ambas rutas de archivos'}), 400
         
@@ -430,13 +535,14 @@ def nfs_upload():
             str(original_full), 
             str(dubbed_full),
             custom_name=custom_name,
-            source_type='nfs'
+            source_type='nfs',
+            priority=priority
         )
         
         return jsonify({
             'task_id': task_id,
-            'message': 'Procesamiento iniciado con archivos del servidor.',
-            'status': 'processing',
+            'message': 'Tarea en cola con archivos del servidor.',
+            'status': 'queued',
             'original_file': original_path,
             'dubbed_file': dubbed_path,
             'custom_name': custom_name
@@ -0,0 +1,189 @@
+"""
+Motor de alineamiento temporal por tramos entre pista original y doblada
+"""
+
+import bisect
+import numpy as np
+from typing import List, Optional, Tuple, Dict
+
+class OffsetRegion:
+    """Tramo del timeline original con un desfase constante (dub = orig + offset)"""
+    def __init__(self, start: float, end: Optional[float], offset: float, anchors: int = 0):
+        self.start = start
+        self.end = end
+        self.offset = offset
+        self.anchors = anchors
+
+    def to_dict(self) -> Dict:
+        return {
+            'start': round(self.start, 3),
+            'end': round(self.end, 3) if self.end is not None else None,
+            'offset': round(self.offset, 3),
+            'anchors': self.anchors
+        }
+
+    def __repr__(self):
+        end = f"{self.end:.2f}" if self.end is not None else "end"
+        return f"OffsetRegion({self.start:.2f}-{end}: {self.offset:+.3f}s)"
+
+class OffsetMap:
+    """Mapa tiempo → offset formado por tramos contiguos y ordenados"""
+    def __init__(self, regions: List[OffsetRegion]):
+        self.regions = regions or [OffsetRegion(0.0, None, 0.0)]
+        self._starts = [region.start for region in self.regions]
+
+    @classmethod
+    def constant(cls, offset: float) -> 'OffsetMap':
+        """Crear un mapa con un único desfase global"""
+        return cls([OffsetRegion(0.0, None, offset)])
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'OffsetMap':
+        return cls([
+            OffsetRegion(r['start'], r.get('end'), r['offset'], r.get('anchors', 0))
+            for r in data.get('regions', [])
+        ])
+
+    @property
+    def is_global(self) -> bool:
+        return len(self.regions) == 1
+
+    @property
+    def global_offset(self) -> float:
+        """Offset dominante (el del tramo con más anclas)"""
+        return max(self.regions, key=lambda r: r.anchors).offset
+
+    def offset_at(self, t: float) -> float:
+        index = max(0, bisect.bisect_right(self._starts, t) - 1)
+        return self.regions[index].offset
+
+    def to_dict(self) -> Dict:
+        return {
+            'global_offset': round(self.global_offset, 3),
+            'regions': [region.to_dict() for region in self.regions]
+        }
+
+def find_anchors(orig_embeddings: np.ndarray, dub_embeddings: np.ndarray,
+                 threshold: float = 0.7, band: int = 100,
+                 block_size: int = 256) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Buscar pares (orig, dub) mutuamente más similares dentro de una banda diagonal
+
+    Los embeddings deben venir normalizados. Sólo se evalúan las columnas a menos
+    de ``band`` posiciones de la diagonal esperada, por bloques de filas, de modo
+    que la memoria es O(N·band) en lugar de O(N·M).
+    """
+    n_orig, n_dub = len(orig_embeddings), len(dub_embeddings)
+    empty = np.array([], dtype=np.int64)
+    if n_orig == 0 or n_dub == 0:
+        return empty, empty, np.array([], dtype=np.float32)
+
+    ratio = n_dub / n_orig
+    row_best_col = np.full(n_orig, -1, dtype=np.int64)
+    row_best_sim = np.full(n_orig, -np.inf, dtype=np.float32)
+    col_best_sim = np.full(n_dub, -np.inf, dtype=np.float32)
+
+    for row_start in range(0, n_orig, block_size):
+        row_end = min(row_start + block_size, n_orig)
+        rows = np.arange(row_start, row_end)
+        centers = np.round(rows * ratio).astype(np.int64)
+        col_lo = max(0, int(centers[0]) - band)
+        col_hi = min(n_dub, int(centers[-1]) + band + 1)
+        if col_lo >= col_hi:
+            continue
+
+        block = orig_embeddings[row_start:row_end] @ dub_embeddings[col_lo:col_hi].T
+        cols = np.arange(col_lo, col_hi)
+        outside = np.abs(cols[None, :] - centers[:, None]) > band
+        block[outside] = -np.inf
+
+        best = np.argmax(block, axis=1)
+        row_best_col[row_start:row_end] = best + col_lo
+        row_best_sim[row_start:row_end] = block[np.arange(len(rows)), best]
+        col_best_sim[col_lo:col_hi] = np.maximum(col_best_sim[col_lo:col_hi], block.max(axis=0))
+
+    valid = (row_best_col >= 0) & (row_best_sim >= threshold)
+    orig_idx = np.nonzero(valid)[0]
+    dub_idx = row_best_col[valid]
+    sims = row_best_sim[valid]
+
+    # Conservar sólo los pares mutuamente mejores
+    mutual = sims >= col_best_sim[dub_idx]
+    return orig_idx[mutual], dub_idx[mutual], sims[mutual]
+
+def longest_monotonic_chain(orig_idx: np.ndarray, dub_idx: np.ndarray) -> np.ndarray:
+    """Índices de la subsecuencia creciente más larga en ambos ejes (O(K log K))"""
+    tails: List[int] = []
+    tail_pos: List[int] = []
+    predecessors = np.full(len(dub_idx), -1, dtype=np.int64)
+
+    for k, value in enumerate(dub_idx):
+        position = bisect.bisect_left(tails, value)
+        if position > 0:
+            predecessors[k] = tail_pos[position - 1]
+        if position == len(tails):
+            tails.append(value)
+            tail_pos.append(k)
+        else:
+            tails[position] = value
+            tail_pos[position] = k
+
+    chain = []
+    k = tail_pos[-1] if tail_pos else -1
+    while k >= 0:
+        chain.append(k)
+        k = predecessors[k]
+    return np.array(chain[::-1], dtype=np.int64)
+
+def build_offset_map(orig_starts: np.ndarray, orig_ends: np.ndarray,
+                     offsets: np.ndarray, tolerance: float = 0.5,
+                     min_anchors: int = 2) -> OffsetMap:
+    """Agrupar anclas consecutivas con offset similar en tramos contiguos"""
+    if len(offsets) == 0:
+        return OffsetMap([])
+
+    groups: List[List[int]] = [[0]]
+    for k in range(1, len(offsets)):
+        reference = np.median(offsets[groups[-1]])
+        if abs(offsets[k] - reference) <= tolerance:
+            groups[-1].append(k)
+        else:
+            groups.append([k])
+
+    # Los grupos con pocas anclas se consideran ruido, salvo que sea el único
+    strong = [g for g in groups if len(g) >= min_anchors] or [max(groups, key=len)]
+
+    # Fusionar grupos consecutivos que hayan quedado con el mismo offset
+    merged: List[List[int]] = [strong[0]]
+    for group in strong[1:]:
+        if abs(np.median(offsets[group]) - np.median(offsets[merged[-1]])) <= tolerance:
+            merged[-1] = merged[-1] + group
+        else:
+            merged.append(group)
+
+    regions = []
+    for n, group in enumerate(merged):
+        if n == 0:
+            start = 0.0
+        else:
+            previous = merged[n - 1]
+            start = float(orig_ends[previous[-1]] + orig_starts[group[0]]) / 2.0
+            regions[-1].end = start
+        regions.append(OffsetRegion(start, None, float(np.median(offsets[group])), len(group)))
+
+    return OffsetMap(regions)
+
+def align_segments(orig_starts: np.ndarray, orig_ends: np.ndarray, dub_starts: np.ndarray,
+                   orig_embeddings: np.ndarray, dub_embeddings: np.ndarray,
+                   threshold: float = 0.7, band: int = 100,
+                   tolerance: float = 0.5) -> Tuple[OffsetMap, int]:
+    """Alinear segmentos y devolver el mapa de offsets y el número de anclas usadas"""
+    orig_idx, dub_idx, _ = find_anchors(orig_embeddings, dub_embeddings, threshold, band)
+    if len(orig_idx) == 0:
+        return OffsetMap([]), 0
+
+    chain = longest_monotonic_chain(orig_idx, dub_idx)
+    orig_idx, dub_idx = orig_idx[chain], dub_idx[chain]
+    offsets = dub_starts[dub_idx] - orig_starts[orig_idx]
+
+    offset_map = build_offset_map(orig_starts[orig_idx], orig_ends[orig_idx], offsets, tolerance)
+    return offset_map, len(chain)
@@ -0,0 +1,141 @@
+"""
+Motores de reconocimiento de voz (ASR) intercambiables
+
+Todos reciben audio float32 mono a 16 kHz (ver ``AudioSource.read``) y devuelven
+segmentos ``{'start', 'end', 'text', 'confidence'}`` con tiempos relativos al audio.
+"""
+
+import os
+import math
+import importlib.util
+import psutil
+import numpy as np
+from typing import Dict, List, Optional
+
+# Whisper rellena cada llamada hasta ventanas de 30 s: los fragmentos deben ocupar múltiplos de esto
+WINDOW_SECONDS = 30
+
+class ASRBackend:
+    """Interfaz común: cargar, transcribir y estimar la memoria ocupada"""
+
+    name = ''
+    module = ''
+
+    def __init__(self, model_name: str, device: str = 'cpu', compute_type: str = 'default'):
+        self.model_name = model_name
+        self.device = device
+        self.compute_type = compute_type
+        self.model = None
+        self.footprint = 0
+
+    @classmethod
+    def available(cls) -> bool:
+        return importlib.util.find_spec(cls.module) is not None
+
+    def load(self) -> 'ASRBackend':
+        """Cargar el modelo y medir cuánta memoria residente ha añadido"""
+        process = psutil.Process(os.getpid())
+        before = process.memory_info().rss
+        self.model = self._load()
+        self.footprint = max(0, process.memory_info().rss - before)
+        return self
+
+    def _load(self):
+        raise NotImplementedError
+
+    def transcribe(self, audio: np.ndarray, options: Dict) -> List[Dict]:
+        raise NotImplementedError
+
+    def detect_language(self, audio: np.ndarray) -> Optional[str]:
+        """Código del idioma más probable en los primeros ``WINDOW_SECONDS`` del audio"""
+        raise NotImplementedError
+
+    def memory_footprint(self) -> int:
+        """Bytes de memoria que ocupa el modelo cargado"""
+        return self.footprint
+
+class WhisperBackend(ASRBackend):
+    """Modelo de referencia openai-whisper (PyTorch)"""
+
+    name = 'whisper'
+    module = 'whisper'
+
+    def _load(self):
+        import whisper
+        return whisper.load_model(self.model_name, device=self.device)
+
+    def transcribe(self, audio: np.ndarray, options: Dict) -> List[Dict]:
+        result = self.model.transcribe(audio, verbose=False, **options)
+        return [
+            {'start': segment['start'], 'end': segment['end'], 'text': segment['text'],
+             'confidence': float(np.exp(segment.get('avg_logprob', 0.0)))}
+            for segment in result.get('segments', [])
+        ]
+
+    def detect_language(self, audio: np.ndarray) -> Optional[str]:
+        import whisper
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=self.model.dims.n_mels)
+        _, probs = self.model.detect_language(mel.to(self.model.device))
+        return max(probs, key=probs.get) if probs else None
+
+    def memory_footprint(self) -> int:
+        # En GPU el RSS no refleja los pesos: contar los parámetros
+        if self.model is not None:
+            return sum(p.numel() * p.element_size() for p in self.model.parameters())
+        return self.footprint
+
+class FasterWhisperBackend(ASRBackend):
+    """faster-whisper (CTranslate2), cuantizado a int8 en CPU"""
+
+    name = 'faster-whisper'
+    module = 'faster_whisper'
+
+    def _load(self):
+        from faster_whisper import WhisperModel
+        compute_type = self.compute_type
+        if compute_type == 'default':
+            compute_type = 'float16' if self.device == 'cuda' else 'int8'
+        threads = int(os.environ.get('NUM_THREADS', 0)) or os.cpu_count() or 1
+        return WhisperModel(self.model_name, device=self.device, compute_type=compute_type, cpu_threads=threads)
+
+    def transcribe(self, audio: np.ndarray, options: Dict) -> List[Dict]:
+        segments, _ = self.model.transcribe(
+            audio,
+            language=options.get('language'),
+            temperature=options.get('temperature', 0.0),
+            beam_size=options.get('beam_size', 1),
+            best_of=options.get('best_of', 1),
+            patience=options.get('patience', 1.0),
+            word_timestamps=options.get('word_timestamps', False),
+            vad_filter=False  # los tramos de voz ya los decide vad.py
+        )
+        # El generador decodifica de forma perezosa: consumirlo aquí
+        return [
+            {'start': segment.start, 'end': segment.end, 'text': segment.text,
+             'confidence': float(math.exp(segment.avg_logprob))}
+            for segment in segments
+        ]
+
+    def detect_language(self, audio: np.ndarray) -> Optional[str]:
+        # transcribe() detecta el idioma al llamarse; los segmentos (perezosos) no se decodifican
+        _, info = self.model.transcribe(audio[:WINDOW_SECONDS * 16000], vad_filter=False)
+        return info.language
+
+def default_device() -> str:
+    """GPU si PyTorch la detecta; en nodos sin PyTorch (solo CTranslate2) se usa CPU"""
+    try:
+        import torch
+    except ImportError:
+        return 'cpu'
+    return 'cuda' if torch.cuda.is_available() else 'cpu'
+
+BACKENDS = {backend.name: backend for backend in (WhisperBackend, FasterWhisperBackend)}
+
+def get_backend_class(name: str):
+    if name not in BACKENDS:
+        raise ValueError(f"Motor ASR desconocido: {name} (disponibles: {', '.join(BACKENDS)})")
+    return BACKENDS[name]
+
+def create_backend(name: str, model_name: str, device: str = 'cpu', compute_type: str = 'default') -> ASRBackend:
+    """Crear y cargar el motor ``name`` ('whisper' o 'faster-whisper')"""
+    return get_backend_class(name)(model_name, device=device, compute_type=compute_type).load()
@@ -0,0 +1,238 @@
+"""
+Análisis de señal de audio sin IA: envolventes de energía y correlación cruzada por FFT
+"""
+
+import numpy as np
+from typing import Dict, Tuple, Union
+from app.services.audio_source import AudioSource, FFmpegPipeSource, open_source
+
+ENVELOPE_RATE = 100  # Hz (una trama cada 10 ms)
+PCM16_POWER = 32768.0 ** 2  # Energía en unidades PCM de 16 bits: el suelo de log1p queda en 1 LSB
+
+def _as_source(audio: Union[str, AudioSource]) -> AudioSource:
+    """Aceptar una ruta (WAV o contenedor) o una fuente ya abierta"""
+    return open_source(audio) if isinstance(audio, str) else audio
+
+def _mono(block: np.ndarray) -> np.ndarray:
+    return block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+
+def onset_envelope(audio: Union[str, AudioSource], envelope_rate: int = ENVELOPE_RATE,
+                   chunk_seconds: int = 60) -> np.ndarray:
+    """Envolvente de onsets (flujo de energía log rectificado) diezmada a ``envelope_rate``
+
+    Se calcula por bloques sobre la fuente (memmap del WAV o tubería de FFmpeg),
+    sin cargar el audio completo.
+    """
+    source = _as_source(audio)
+    hop = source.sample_rate // envelope_rate
+    parts = []
+    pending = np.zeros(0, dtype=np.float32)
+    for block in source.blocks(hop * envelope_rate * chunk_seconds):
+        pending = np.concatenate([pending, _mono(block)])
+        count = len(pending) // hop
+        frames = pending[:count * hop].reshape(-1, hop)
+        parts.append(np.log1p(np.einsum('ij,ij->i', frames, frames) / hop * PCM16_POWER).astype(np.float32))
+        pending = pending[count * hop:]
+
+    energy = np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+    flux = np.diff(energy, prepend=energy[:1])
+    return np.maximum(flux, 0.0)
+
+def _normalized_xcorr(window: np.ndarray, search: np.ndarray) -> np.ndarray:
+    """Correlación normalizada de ``window`` deslizándose sobre ``search`` (vía FFT)"""
+    window = window - window.mean()
+    norm = np.linalg.norm(window)
+    n_lags = len(search) - len(window) + 1
+    if norm == 0 or n_lags <= 0:
+        return np.zeros(max(n_lags, 0), dtype=np.float32)
+
+    size = 1 << int(np.ceil(np.log2(len(search) + len(window))))
+    spectrum = np.fft.rfft(search, size) * np.conj(np.fft.rfft(window, size))
+    corr = np.fft.irfft(spectrum, size)[:n_lags]
+
+    # Energía local de la señal de búsqueda (media restada) para cada desplazamiento
+    cumsum = np.concatenate(([0.0], np.cumsum(search, dtype=np.float64)))
+    cumsum_sq = np.concatenate(([0.0], np.cumsum(np.square(search, dtype=np.float64))))
+    n = len(window)
+    local_sum = cumsum[n:n + n_lags] - cumsum[:n_lags]
+    local_sq = cumsum_sq[n:n + n_lags] - cumsum_sq[:n_lags]
+    local_norm = np.sqrt(np.maximum(local_sq - local_sum ** 2 / n, 1e-12))
+    return corr / (norm * local_norm)
+
+def xcorr_offset(orig_env: np.ndarray, dub_env: np.ndarray, envelope_rate: int = ENVELOPE_RATE,
+                 max_offset: float = 120.0, n_windows: int = 6, window_seconds: float = 60.0,
+                 tolerance: float = 0.1) -> Tuple[float, float, Dict]:
+    """Estimar offset (dub - orig) correlando varias ventanas de la envolvente original
+
+    Devuelve ``(offset, confidence, details)``. La confianza combina la fracción de
+    ventanas que coinciden en el mismo desfase con la altura media de sus picos;
+    ``details['consistent']`` indica si todas las ventanas fiables coinciden.
+    """
+    window = int(window_seconds * envelope_rate)
+    max_lag = int(max_offset * envelope_rate)
+    if len(orig_env) < window or len(dub_env) < window:
+        window = min(len(orig_env), len(dub_env)) // 2
+    if window <= 0:
+        return 0.0, 0.0, {'windows': [], 'consistent': False}
+
+    positions = np.linspace(0, len(orig_env) - window, n_windows + 2)[1:-1].astype(int)
+    results = []
+    for position in positions:
+        search_start = max(0, position - max_lag)
+        search_end = min(len(dub_env), position + window + max_lag)
+        corr = _normalized_xcorr(orig_env[position:position + window], dub_env[search_start:search_end])
+        if len(corr) == 0:
+            continue
+        best = int(np.argmax(corr))
+        lag = (search_start + best - position) / float(envelope_rate)
+        results.append({'position': position / float(envelope_rate), 'offset': lag, 'peak': float(corr[best])})
+
+    offset, confidence, consistent = _vote_offsets(results, tolerance)
+    return offset, confidence, {'windows': results, 'consistent': consistent}
+
+def _vote_offsets(results, tolerance: float, min_peak: float = 0.25) -> Tuple[float, float, bool]:
+    """Combinar los desfases de varias ventanas en ``(offset, confidence, consistent)``
+
+    ``consistent`` es False si alguna ventana con un pico fiable (``min_peak``) discrepa
+    del desfase votado: el desfase no es único (p. ej. un cambio de rollo) y un offset
+    global no sirve aunque la mayoría coincida.
+    """
+    if not results:
+        return 0.0, 0.0, False
+
+    offsets = np.array([r['offset'] for r in results])
+    peaks = np.array([r['peak'] for r in results])
+    # Desfase de referencia: el que más ventanas comparten (moda con tolerancia)
+    votes = (np.abs(offsets[:, None] - offsets[None, :]) <= tolerance).sum(axis=1)
+    agree = np.abs(offsets - offsets[np.argmax(votes)]) <= tolerance
+    confidence = float(agree.mean() * np.clip(peaks[agree].mean(), 0.0, 1.0))
+    consistent = bool(np.all(agree | (peaks < min_peak)))
+    return float(np.median(offsets[agree])), confidence, consistent
+
+def windowed_xcorr_offset(orig_path: str, dub_path: str, orig_duration: float, dub_duration: float,
+                          max_offset: float = 120.0, n_windows: int = 8, window_seconds: float = 90.0,
+                          tolerance: float = 0.1, envelope_rate: int = ENVELOPE_RATE) -> Tuple[float, float, Dict]:
+    """Como ``xcorr_offset`` pero decodificando solo ventanas de los contenedores
+
+    Cada ventana del original (``window_seconds``) se busca en la ventana del doblaje
+    ampliada ``max_offset`` por cada lado; el resto del archivo no se lee.
+    """
+    window_seconds = min(window_seconds, orig_duration / 2.0)
+    if window_seconds <= 0:
+        return 0.0, 0.0, {'windows': [], 'consistent': False}
+
+    results = []
+    for start in np.linspace(0, orig_duration - window_seconds, n_windows + 2)[1:-1]:
+        search_start = max(0.0, start - max_offset)
+        search_end = min(dub_duration, start + window_seconds + max_offset)
+        if search_end - search_start < window_seconds:
+            continue
+        orig_env = onset_envelope(FFmpegPipeSource(orig_path, start=start, length=window_seconds),
+                                  envelope_rate=envelope_rate)
+        dub_env = onset_envelope(FFmpegPipeSource(dub_path, start=search_start, length=search_end - search_start),
+                                 envelope_rate=envelope_rate)
+        corr = _normalized_xcorr(orig_env, dub_env)
+        if len(corr) == 0:
+            continue
+        best = int(np.argmax(corr))
+        results.append({
+            'position': round(float(start), 3),
+            'offset': search_start + best / float(envelope_rate) - float(start),
+            'peak': float(corr[best])
+        })
+
+    offset, confidence, consistent = _vote_offsets(results, tolerance)
+    return offset, confidence, {'windows': results, 'consistent': consistent}
+
+def _mel_filterbank(sample_rate: int, n_fft: int, n_bands: int,
+                    fmin: float = 60.0, fmax: float = None) -> np.ndarray:
+    """Banco de filtros triangulares en escala mel, forma (n_fft//2 + 1, n_bands)"""
+    fmax = fmax or sample_rate / 2.0
+    mel = lambda f: 2595.0 * np.log10(1.0 + f / 700.0)
+    hz = lambda m: 700.0 * (10.0 ** (m / 2595.0) - 1.0)
+    edges = hz(np.linspace(mel(fmin), mel(fmax), n_bands + 2))
+    freqs = np.linspace(0, sample_rate / 2.0, n_fft // 2 + 1)
+
+    lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (freqs[None, :] - lower) / np.maximum(center - lower, 1e-9)
+    falling = (upper - freqs[None, :]) / np.maximum(upper - center, 1e-9)
+    return np.maximum(0.0, np.minimum(rising, falling)).T.astype(np.float32)
+
+def band_energies(audio: Union[str, AudioSource], n_bands: int = 24, frame_rate: int = ENVELOPE_RATE,
+                  n_fft: int = 512, chunk_seconds: int = 60) -> np.ndarray:
+    """Energías log-mel por trama, forma (tramas, bandas), calculadas por bloques de la fuente"""
+    source = _as_source(audio)
+    hop = source.sample_rate // frame_rate
+    window = np.hanning(n_fft).astype(np.float32)
+    filterbank = _mel_filterbank(source.sample_rate, n_fft, n_bands)
+    parts = []
+    pending = np.zeros(0, dtype=np.float32)
+    for block in source.blocks(hop * frame_rate * chunk_seconds):
+        pending = np.concatenate([pending, _mono(block)])
+        count = (len(pending) - n_fft) // hop + 1 if len(pending) >= n_fft else 0
+        if count:
+            frames = np.lib.stride_tricks.sliding_window_view(pending, n_fft)[::hop][:count]
+            power = np.square(np.abs(np.fft.rfft(frames * window, axis=1)))
+            parts.append(np.log1p((power @ filterbank) * PCM16_POWER).astype(np.float32))
+            # Conservar las muestras que aún comparten trama con el bloque siguiente
+            pending = pending[count * hop:]
+
+    return np.concatenate(parts) if parts else np.zeros((0, n_bands), dtype=np.float32)
+
+def _standardize(features: np.ndarray) -> np.ndarray:
+    """Normalizar cada banda a media 0 y varianza 1 a lo largo del tiempo"""
+    std = features.std(axis=0)
+    std[std == 0] = 1.0
+    return (features - features.mean(axis=0)) / std
+
+def _lag_correlation(orig: np.ndarray, dub: np.ndarray, lag: int) -> float:
+    """Correlación media entre orig[t] y dub[t + lag] sobre la zona solapada"""
+    start = max(0, -lag)
+    end = min(len(orig), len(dub) - lag)
+    if end - start <= 0:
+        return -1.0
+    a = np.ascontiguousarray(orig[start:end]).ravel()
+    b = np.ascontiguousarray(dub[start + lag:end + lag]).ravel()
+    return float(np.dot(a, b) / len(a))
+
+def spectral_offset(orig_features: np.ndarray, dub_features: np.ndarray,
+                    frame_rate: int = ENVELOPE_RATE, max_offset: float = 120.0,
+                    coarse_factor: int = 10) -> Tuple[float, Dict]:
+    """Buscar el offset (dub - orig) en dos fases: gruesa por FFT y fina por producto escalar
+
+    Devuelve ``(offset, quality)``, donde ``quality`` incluye la correlación del pico
+    (``score``, 0-1) y su prominencia respecto al resto de desfases evaluados.
+    """
+    orig, dub = _standardize(orig_features), _standardize(dub_features)
+
+    # Fase gruesa: promediar bloques de ``coarse_factor`` tramas y correlacionar todas las bandas
+    def decimate(x):
+        usable = len(x) // coarse_factor * coarse_factor
+        return x[:usable].reshape(-1, coarse_factor, x.shape[1]).mean(axis=1)
+
+    orig_c, dub_c = decimate(orig), decimate(dub)
+    if len(orig_c) == 0 or len(dub_c) == 0:
+        return 0.0, {'score': 0.0, 'prominence': 0.0}
+
+    size = 1 << int(np.ceil(np.log2(len(orig_c) + len(dub_c))))
+    spectrum = (np.fft.rfft(dub_c, size, axis=0) * np.conj(np.fft.rfft(orig_c, size, axis=0))).sum(axis=1)
+    corr = np.fft.irfft(spectrum, size)
+
+    max_lag = int(max_offset * frame_rate / coarse_factor)
+    lags = np.arange(-min(max_lag, len(orig_c) - 1), min(max_lag, len(dub_c) - 1) + 1)
+    overlap = np.minimum(len(orig_c), len(dub_c) - lags) - np.maximum(0, -lags)
+    curve = corr[lags % size] / np.maximum(overlap, 1) / orig.shape[1]
+    # Penalizar desfases con poco solapamiento (correlaciones espurias en los extremos)
+    curve = curve * np.minimum(1.0, overlap / (0.5 * min(len(orig_c), len(dub_c))))
+    coarse_lag = int(lags[np.argmax(curve)]) * coarse_factor
+    prominence = float((curve.max() - curve.mean()) / (curve.std() or 1.0))
+
+    # Fase fina: evaluar la resolución completa alrededor del pico grueso
+    fine_lags = range(coarse_lag - 2 * coarse_factor, coarse_lag + 2 * coarse_factor + 1)
+    scores = [(_lag_correlation(orig, dub, lag), lag) for lag in fine_lags]
+    score, best_lag = max(scores)
+
+    return best_lag / float(frame_rate), {
+        'score': round(float(np.clip(score, 0.0, 1.0)), 3),
+        'prominence': round(prominence, 2)
+    }
@@ -0,0 +1,124 @@
+"""
+Caché en disco del audio PCM extraído, direccionada por la huella del archivo fuente
+"""
+
+import os
+import threading
+import hashlib
+from pathlib import Path
+from typing import Dict, Optional
+from app.utils.file_utils import file_fingerprint
+
+class AudioCache:
+    """Caché LRU (por bytes totales) de WAVs de análisis extraídos con FFmpeg"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 20 * 1024 ** 3):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_bytes = max_bytes
+        self.enabled = cache_dir is not None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._pinned: Dict[str, int] = {}
+
+    def configure(self, cache_dir, max_bytes: int, enabled: bool = True):
+        """Configurar directorio y tamaño máximo (se llama desde set_app)"""
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        if enabled:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def key_for(self, source_path: str, sample_rate: int = 16000, channels: int = 1) -> str:
+        """Clave de caché: huella del archivo fuente + parámetros de extracción"""
+        fingerprint = file_fingerprint(source_path)
+        return hashlib.sha1(f"{fingerprint}|{sample_rate}|{channels}".encode('utf-8')).hexdigest()
+
+    def path_for(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.wav"
+
+    def key_lock(self, key: str) -> threading.Lock:
+        """Lock por clave para que dos tareas no extraigan el mismo archivo a la vez"""
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, key: str) -> Optional[str]:
+        """Devolver la ruta cacheada (y marcarla como usada) o None"""
+        path = self.path_for(key)
+        with self._lock:
+            if path.exists():
+                self.hits += 1
+                os.utime(path)  # mtime = último uso (orden LRU)
+                return str(path)
+            self.misses += 1
+            return None
+
+    def temp_path_for(self, key: str) -> str:
+        """Ruta temporal donde escribir una extracción antes de publicarla"""
+        return str(self.cache_dir / f"{key}.{threading.get_ident()}.partial.wav")
+
+    def commit(self, key: str, temp_path: str) -> str:
+        """Publicar atómicamente una extracción completa y aplicar la política de expulsión"""
+        path = self.path_for(key)
+        os.replace(temp_path, path)
+        self.evict()
+        return str(path)
+
+    def pin(self, key: str):
+        """Proteger una entrada de la expulsión mientras una tarea la usa"""
+        with self._lock:
+            self._pinned[key] = self._pinned.get(key, 0) + 1
+
+    def unpin(self, key: str):
+        with self._lock:
+            remaining = self._pinned.get(key, 0) - 1
+            if remaining > 0:
+                self._pinned[key] = remaining
+            else:
+                self._pinned.pop(key, None)
+
+    def _entries(self):
+        entries = []
+        for path in self.cache_dir.glob('*.wav'):
+            if path.name.endswith('.partial.wav'):
+                continue
+            try:
+                stat = path.stat()
+                entries.append((stat.st_mtime, stat.st_size, path))
+            except OSError:
+                continue
+        return entries
+
+    def evict(self):
+        """Eliminar las entradas menos usadas hasta respetar ``max_bytes``"""
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                if path.stem in self._pinned:
+                    continue
+                try:
+                    path.unlink()
+                    total -= size
+                    self.evictions += 1
+                except OSError:
+                    continue
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = self._entries() if self.enabled and self.cache_dir else []
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(entries),
+                'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes
+            }
+
+# Instancia global de la caché
+audio_cache = AudioCache()
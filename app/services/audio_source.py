@@ -0,0 +1,155 @@
+"""
+Fuentes de audio por bloques: WAV en memmap o decodificación FFmpeg por tubería
+
+Los consumidores (Whisper, correlación, energías) leen bloques float32 normalizados
+en [-1, 1] de forma (frames, canales) sin que la fuente escriba archivos temporales.
+"""
+
+import json
+import subprocess
+import numpy as np
+from typing import Dict, Iterator, Optional
+from app.utils.audio_utils import is_wav, open_wav_memmap, read_wav_header
+from app.services.ffmpeg_runner import process_started
+
+PCM_SCALE = {np.dtype(np.uint8): 128.0, np.dtype(np.int16): 32768.0, np.dtype(np.int32): 2147483648.0}
+
+class AudioSource:
+    """Interfaz común de las fuentes de audio"""
+
+    sample_rate: int
+    channels: int
+
+    @property
+    def duration(self) -> float:
+        raise NotImplementedError
+
+    def blocks(self, block_frames: int = 1 << 16) -> Iterator[np.ndarray]:
+        """Iterar bloques float32 de forma (frames, canales)"""
+        raise NotImplementedError
+
+    def read(self) -> np.ndarray:
+        """Leer la señal completa como array float32 mono (formato que espera Whisper)"""
+        parts = [block.mean(axis=1) if block.shape[1] > 1 else block[:, 0] for block in self.blocks()]
+        return np.concatenate(parts).astype(np.float32, copy=False) if parts else np.zeros(0, dtype=np.float32)
+
+class WavSource(AudioSource):
+    """WAV PCM leído por bloques desde un memmap (opcionalmente solo la ventana ``start``/``length``)"""
+
+    def __init__(self, path: str, start: Optional[float] = None, length: Optional[float] = None):
+        self.path = path
+        self._samples, self.sample_rate = open_wav_memmap(path)
+        first = int((start or 0.0) * self.sample_rate)
+        last = first + int(length * self.sample_rate) if length else len(self._samples)
+        self._samples = self._samples[first:last]
+        self.channels = self._samples.shape[1]
+
+    @property
+    def duration(self) -> float:
+        return len(self._samples) / float(self.sample_rate)
+
+    def blocks(self, block_frames: int = 1 << 16) -> Iterator[np.ndarray]:
+        scale = PCM_SCALE[self._samples.dtype]
+        bias = scale if self._samples.dtype == np.uint8 else 0.0
+        for start in range(0, len(self._samples), block_frames):
+            block = np.asarray(self._samples[start:start + block_frames], dtype=np.float32)
+            yield (block - bias) / scale
+
+class FFmpegPipeSource(AudioSource):
+    """Primera pista de audio de cualquier contenedor decodificada a f32le por stdout
+
+    ``start``/``length`` limitan la decodificación a una ventana: FFmpeg busca en el
+    contenedor (``-ss`` antes de ``-i``) y solo lee los paquetes de ese tramo.
+    """
+
+    def __init__(self, path: str, sample_rate: int = 16000, channels: int = 1,
+                 start: Optional[float] = None, length: Optional[float] = None):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.start = start
+        self.length = length
+        self._duration: Optional[float] = None
+
+    @property
+    def duration(self) -> float:
+        """Duración declarada por el contenedor (solo lee cabeceras, no decodifica)"""
+        if self._duration is None:
+            cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', self.path]
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+            if result.returncode != 0 or not result.stdout.strip():
+                raise Exception(f"No se pudo obtener la duración de {self.path}: {result.stderr[-500:]}")
+            self._duration = float(result.stdout.strip())
+        return self._duration
+
+    def blocks(self, block_frames: int = 1 << 16) -> Iterator[np.ndarray]:
+        window = (['-ss', f'{self.start:.3f}'] if self.start else []) + \
+            (['-t', f'{self.length:.3f}'] if self.length else [])
+        cmd = [
+            'ffmpeg', '-nostdin', '-v', 'error',
+            *window,
+            '-i', self.path,
+            '-vn', '-map', '0:a:0',
+            '-ac', str(self.channels),
+            '-ar', str(self.sample_rate),
+            '-f', 'f32le', 'pipe:1'
+        ]
+        frame_bytes = 4 * self.channels
+        buffer = bytearray(block_frames * frame_bytes)
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+        process_started(process)
+        try:
+            while True:
+                # Llenar el bloque completo (read() puede devolver lecturas parciales)
+                view, filled = memoryview(buffer), 0
+                while filled < len(buffer):
+                    n = process.stdout.readinto(view[filled:])
+                    if not n:
+                        break
+                    filled += n
+                usable = filled - filled % frame_bytes
+                if usable:
+                    yield np.frombuffer(buffer, dtype=np.float32, count=usable // 4).reshape(-1, self.channels).copy()
+                if filled < len(buffer):
+                    break
+
+            process.stdout.close()
+            stderr = process.stderr.read().decode('utf-8', 'replace')
+            if process.wait() != 0:
+                raise Exception(f"Error decodificando audio: {stderr[-2000:]}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+def open_source(path: str, sample_rate: int = 16000, channels: int = 1,
+                start: Optional[float] = None, length: Optional[float] = None) -> AudioSource:
+    """Abrir ``path`` como WAV en memmap si lo es, o como decodificación FFmpeg en streaming"""
+    if is_wav(path):
+        return WavSource(path, start=start, length=length)
+    return FFmpegPipeSource(path, sample_rate=sample_rate, channels=channels, start=start, length=length)
+
+def source_duration(path: str) -> float:
+    """Duración en segundos de un WAV (cabecera) o de un contenedor (ffprobe)"""
+    if is_wav(path):
+        return read_wav_header(path)['duration']
+    return FFmpegPipeSource(path).duration
+
+def probe_audio_stream(path: str) -> Dict:
+    """Canales, frecuencia y formato de muestra de la primera pista de audio (solo cabeceras)"""
+    cmd = ['ffprobe', '-v', 'error', '-select_streams', 'a:0',
+           '-show_entries', 'stream=channels,sample_rate,sample_fmt', '-of', 'json', path]
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+    streams = json.loads(result.stdout or '{}').get('streams') if result.returncode == 0 else None
+    if not streams:
+        raise Exception(f"No se pudo analizar la pista de audio de {path}: {result.stderr[-500:]}")
+    stream = streams[0]
+    return {
+        'channels': int(stream.get('channels') or 2),
+        'sample_rate': int(stream.get('sample_rate') or 48000),
+        'sample_fmt': stream.get('sample_fmt', '')
+    }
+
+def native_sample_width(sample_fmt: str) -> int:
+    """Bytes por muestra PCM que conservan la resolución de la fuente (16 bits o 32 para 24 bits y float)"""
+    return 2 if sample_fmt.rstrip('p') in ('u8', 's16') else 4
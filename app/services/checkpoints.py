@@ -0,0 +1,170 @@
+"""
+Checkpoints en disco de las etapas de cada tarea para reanudarlas tras un reinicio o reintento
+"""
+
+import os
+import json
+import shutil
+import time
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Campos de la tarea necesarios para volver a encolarla
+TASK_FIELDS = ('id', 'original_path', 'dubbed_path', 'custom_name', 'source_type', 'priority', 'created_at')
+
+class CheckpointStore:
+    """Un directorio por tarea con ``checkpoint.json`` (resultado de cada etapa) y sus artefactos"""
+
+    def __init__(self, folder: Optional[str] = None):
+        self.folder = Path(folder) if folder else None
+        self.enabled = folder is not None
+        self._lock = threading.Lock()
+
+    def configure(self, folder, enabled: bool = True):
+        """Configurar directorio (se llama desde set_app)"""
+        self.folder = Path(folder)
+        self.enabled = enabled
+        if enabled:
+            self.folder.mkdir(parents=True, exist_ok=True)
+
+    def task_dir(self, task_id: str) -> Path:
+        if not task_id or Path(task_id).name != task_id or task_id in ('.', '..'):
+            raise ValueError(f"Identificador de tarea no válido: {task_id}")
+        return self.folder / task_id
+
+    def _record_path(self, task_id: str) -> Path:
+        return self.task_dir(task_id) / 'checkpoint.json'
+
+    def _read(self, task_id: str) -> Optional[Dict]:
+        path = self._record_path(task_id)
+        if not path.exists():
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write(self, task_id: str, record: Dict):
+        """Escritura atómica: un reinicio a mitad nunca deja un JSON truncado"""
+        path = self._record_path(task_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix('.partial')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def create(self, task: Dict):
+        """Registrar una tarea nueva (sin etapas completadas)"""
+        if not self.enabled:
+            return
+        record = {field: task.get(field) for field in TASK_FIELDS}
+        record.update({'status': 'pending', 'failed_stage': None, 'error': None, 'metadata': {}, 'stages': {}})
+        with self._lock:
+            self._write(task['id'], record)
+
+    def load(self, task_id: str) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            return self._read(task_id)
+
+    def list(self) -> List[Dict]:
+        """Todas las tareas con checkpoint (pendientes, interrumpidas o fallidas)"""
+        if not self.enabled:
+            return []
+        records = []
+        with self._lock:
+            for task_dir in sorted(self.folder.iterdir()):
+                if task_dir.is_dir():
+                    try:
+                        record = self._read(task_dir.name)
+                    except (OSError, ValueError):
+                        continue
+                    if record:
+                        records.append(record)
+        return records
+
+    def get_stage(self, task_id: str, stage: str) -> Optional[Dict]:
+        """Resultado guardado de una etapa completada o None"""
+        record = self.load(task_id)
+        if not record:
+            return None
+        entry = record['stages'].get(stage)
+        return entry['data'] if entry else None
+
+    def save_stage(self, task_id: str, stage: str, data: Dict, metadata: Optional[Dict] = None):
+        """Marcar una etapa como completada con su resultado (JSON serializable)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            record = self._read(task_id)
+            if record is None:
+                return
+            record['stages'][stage] = {'completed_at': datetime.now().isoformat(), 'data': data}
+            record['status'] = 'running'
+            if metadata is not None:
+                record['metadata'] = metadata
+            self._write(task_id, record)
+
+    def mark_failed(self, task_id: str, stage: Optional[str], error: str):
+        """Anotar la etapa que falló (el reintento empieza por ella)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            record = self._read(task_id)
+            if record is None:
+                return
+            record.update({'status': 'failed', 'failed_stage': stage, 'error': error,
+                           'failed_at': datetime.now().isoformat()})
+            self._write(task_id, record)
+
+    def mark_pending(self, task_id: str):
+        """Volver a dejar la tarea pendiente antes de reintentarla"""
+        if not self.enabled:
+            return
+        with self._lock:
+            record = self._read(task_id)
+            if record is None:
+                return
+            record.update({'status': 'pending', 'error': None})
+            self._write(task_id, record)
+
+    def keep(self, task_id: str, path: str) -> str:
+        """Mover un artefacto temporal al directorio de la tarea para que sobreviva a la limpieza"""
+        target = self.task_dir(task_id) / Path(path).name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(path, target)  # os.replace no cruza sistemas de archivos (/tmp suele ser tmpfs)
+        return str(target)
+
+    def expired(self, record: Dict, max_age: float) -> bool:
+        """Si un checkpoint fallido lleva más de ``max_age`` segundos sin reintentarse"""
+        if record.get('status') != 'failed':
+            return False
+        try:
+            failed_at = datetime.fromisoformat(record['failed_at']).timestamp()
+        except (KeyError, TypeError, ValueError):
+            # Checkpoints anteriores sin fecha de fallo: la de la última escritura
+            try:
+                failed_at = self._record_path(record['id']).stat().st_mtime
+            except (OSError, ValueError):
+                return True
+        return time.time() - failed_at > max_age
+
+    def purge_failed(self, max_age: float) -> int:
+        """Eliminar los checkpoints fallidos caducados con sus artefactos (p. ej. el doblaje renderizado)"""
+        purged = 0
+        for record in self.list():
+            if self.expired(record, max_age):
+                self.discard(record['id'])
+                purged += 1
+        return purged
+
+    def discard(self, task_id: str):
+        """Eliminar checkpoint y artefactos (tarea completada, cancelada o caducada)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            shutil.rmtree(self.task_dir(task_id), ignore_errors=True)
+
+# Instancia global del almacén de checkpoints
+checkpoint_store = CheckpointStore()
@@ -0,0 +1,142 @@
+"""
+Caché de embeddings de sentence-transformers en float16 (archivo memmap + índice)
+"""
+
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+def normalize_text(text: str) -> str:
+    """Normalizar texto para la clave de caché (minúsculas, espacios colapsados)"""
+    return ' '.join(text.lower().split())
+
+class _ModelStore:
+    """Vectores de un modelo: ``vectors.f16`` (filas de dimensión fija) + ``index.json``"""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.vectors_path = directory / 'vectors.f16'
+        self.index_path = directory / 'index.json'
+        self.dim = None
+        self.rows: Dict[str, int] = {}
+        self._memmap = None
+        self._memmap_rows = 0
+
+        if self.index_path.exists():
+            try:
+                index = json.loads(self.index_path.read_text())
+                self.dim, self.rows = index['dim'], index['rows']
+                expected = len(self.rows) * self.dim * 2
+                if not self.vectors_path.exists() or self.vectors_path.stat().st_size < expected:
+                    self.clear()
+            except (ValueError, KeyError, OSError):
+                self.clear()
+
+    def clear(self):
+        self.dim, self.rows = None, {}
+        self._memmap, self._memmap_rows = None, 0
+        for path in (self.vectors_path, self.index_path):
+            if path.exists():
+                path.unlink()
+
+    def lookup(self, keys: List[str]) -> np.ndarray:
+        """Leer filas del memmap (se reabre solo si el archivo ha crecido)"""
+        if self._memmap is None or self._memmap_rows < len(self.rows):
+            self._memmap = np.memmap(self.vectors_path, dtype=np.float16, mode='r',
+                                     shape=(len(self.rows), self.dim))
+            self._memmap_rows = len(self.rows)
+        return np.asarray(self._memmap[[self.rows[key] for key in keys]], dtype=np.float32)
+
+    def append(self, keys: List[str], vectors: np.ndarray):
+        """Añadir vectores al final del archivo y reescribir el índice de forma atómica"""
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+        with open(self.vectors_path, 'ab') as f:
+            f.write(vectors.astype(np.float16).tobytes())
+        for key in keys:
+            self.rows[key] = len(self.rows)
+
+        temp_path = self.index_path.with_suffix('.tmp')
+        temp_path.write_text(json.dumps({'dim': self.dim, 'rows': self.rows}))
+        os.replace(temp_path, self.index_path)
+
+class EmbeddingCache:
+    """Caché de embeddings por (modelo, hash del texto normalizado)"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_rows: int = 1_000_000):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_rows = max_rows
+        self.enabled = cache_dir is not None
+        self.hits = 0
+        self.misses = 0
+        self._stores: Dict[str, _ModelStore] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, cache_dir, max_rows: int, enabled: bool = True):
+        """Configurar directorio y número máximo de vectores por modelo"""
+        self.cache_dir = Path(cache_dir)
+        self.max_rows = max_rows
+        self.enabled = enabled
+        self._stores = {}
+
+    def _store(self, model_name: str) -> _ModelStore:
+        name = hashlib.sha1(model_name.encode('utf-8')).hexdigest()[:16]
+        if name not in self._stores:
+            self._stores[name] = _ModelStore(self.cache_dir / name)
+        return self._stores[name]
+
+    def encode(self, model_name: str, texts: List[str],
+               encoder: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Devolver embeddings float32 para ``texts`` codificando solo los que faltan
+
+        ``encoder`` recibe la lista de textos únicos no cacheados y debe devolver una
+        matriz (n, dim) de embeddings normalizados.
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        keys = [hashlib.sha1(normalize_text(t).encode('utf-8')).hexdigest()[:20] for t in texts]
+
+        with self._lock:
+            store = self._store(model_name)
+            missing: Dict[str, str] = {}
+            for key, text in zip(keys, texts):
+                if key not in store.rows and key not in missing:
+                    missing[key] = text
+            self.hits += len(keys) - sum(1 for key in keys if key in missing)
+            self.misses += sum(1 for key in keys if key in missing)
+
+        vectors = np.asarray(encoder(list(missing.values())), dtype=np.float32) if missing else None
+
+        with self._lock:
+            if missing:
+                if len(store.rows) + len(missing) > self.max_rows:
+                    store.clear()
+                positions = {key: n for n, key in enumerate(missing)}
+                new_keys = [key for key in missing if key not in store.rows]
+                if new_keys:
+                    store.append(new_keys, vectors[[positions[key] for key in new_keys]])
+
+            # Entradas perdidas si otro hilo vació el almacén entre la consulta y la escritura
+            absent = {key: text for key, text in zip(keys, texts) if key not in store.rows}
+            if absent:
+                store.append(list(absent), np.asarray(encoder(list(absent.values())), dtype=np.float32))
+            return store.lookup(keys)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+                'vectors': sum(len(store.rows) for store in self._stores.values())
+            }
+
+# Instancia global de la caché
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,49 @@
+"""
+Bus de eventos en memoria para notificar cambios de estado de las tareas (Server-Sent Events)
+"""
+
+import json
+import itertools
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+class EventBus:
+    """Historial acotado de eventos numerados; los clientes esperan en una condición compartida
+
+    Publicar no depende del número de suscriptores: cada conexión SSE solo despierta
+    cuando hay eventos nuevos y lee los que siguen a su último id.
+    """
+
+    def __init__(self, max_events: int = 1000):
+        self._events = deque(maxlen=max_events)
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self.last_id = 0
+
+    def publish(self, event_type: str, data: Dict):
+        with self._cond:
+            self.last_id = next(self._ids)
+            self._events.append((self.last_id, event_type, data))
+            self._cond.notify_all()
+
+    def wait(self, after_id: int, timeout: float = 15.0) -> Tuple[List[Tuple[int, str, Dict]], bool]:
+        """Eventos con id > ``after_id`` (espera hasta ``timeout`` si no hay ninguno)
+
+        Devuelve ``(eventos, completo)``; ``completo`` es False si parte de los eventos
+        pedidos ya salieron del historial y el cliente debe pedir un estado completo.
+        """
+        with self._cond:
+            if self.last_id <= after_id:
+                self._cond.wait_for(lambda: self.last_id > after_id, timeout=timeout)
+            complete = not self._events or self._events[0][0] <= after_id + 1
+            return [event for event in self._events if event[0] > after_id], complete
+
+def format_sse(event_id: Optional[int], event_type: str, data: Dict) -> str:
+    """Serializar un evento en formato text/event-stream"""
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event_type}", f"data: {json.dumps(data, ensure_ascii=False)}"]
+    return '\n'.join(lines) + '\n\n'
+
+# Instancia global del bus de eventos
+event_bus = EventBus()
@@ -0,0 +1,127 @@
+"""
+Ejecución de FFmpeg sin bloquear a ciegas: progreso en vivo (``-progress pipe:1``) y stderr acotado
+"""
+
+import time
+import threading
+import subprocess
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+_tracking = threading.local()
+
+@contextmanager
+def track_processes(on_start: Callable[[subprocess.Popen], None]):
+    """Pasar a ``on_start`` cada proceso FFmpeg que arranque este hilo (para poder terminarlo)
+
+    Las etapas que se ejecutan en el hilo de la tarea lanzan FFmpeg sin conocer la
+    tarea; así sus procesos quedan registrados sin pasar el callback por cada función.
+    """
+    previous = getattr(_tracking, 'on_start', None)
+    _tracking.on_start = on_start
+    try:
+        yield
+    finally:
+        _tracking.on_start = previous
+
+def process_started(process: subprocess.Popen):
+    """Notificar un proceso recién lanzado al ``track_processes`` activo en este hilo"""
+    on_start = getattr(_tracking, 'on_start', None)
+    if on_start:
+        on_start(process)
+
+class FFmpegResult:
+    """Resultado de una invocación: código de salida, final de stderr y rendimiento"""
+
+    def __init__(self, returncode: int, stderr: str, elapsed: float, out_time: float):
+        self.returncode = returncode
+        self.stderr = stderr
+        self.elapsed = elapsed
+        self.out_time = out_time
+
+    @property
+    def speed(self) -> Optional[float]:
+        """Segundos de media procesados por segundo de reloj (x tiempo real)"""
+        return round(self.out_time / self.elapsed, 1) if self.elapsed > 0 and self.out_time else None
+
+    def stats(self) -> Dict:
+        return {'elapsed': round(self.elapsed, 3), 'media_seconds': round(self.out_time, 3), 'speed': self.speed}
+
+def _parse_out_time(values: Dict[str, str]) -> Optional[float]:
+    """Posición de salida en segundos (``out_time_us``; ``out_time_ms`` también va en µs)"""
+    for key in ('out_time_us', 'out_time_ms'):
+        value = values.get(key, '')
+        if value.lstrip('-').isdigit():
+            return max(0, int(value)) / 1e6
+    return None
+
+def run_ffmpeg(cmd: List[str], duration: Optional[float] = None,
+               on_progress: Optional[Callable[[float, Dict], None]] = None,
+               on_start: Optional[Callable[[subprocess.Popen], None]] = None,
+               timeout: Optional[float] = None, stderr_lines: int = 200,
+               min_interval: float = 1.0) -> FFmpegResult:
+    """Ejecutar ``cmd`` (empieza por ``ffmpeg``) leyendo su progreso de forma incremental
+
+    - ``on_progress(fracción, info)`` se llama como mucho cada ``min_interval`` segundos,
+      con la fracción de ``duration`` ya procesada (None si no se conoce la duración) e
+      ``info`` = ``{'out_time', 'speed', 'elapsed'}``.
+    - ``on_start(proceso)`` recibe el Popen en cuanto arranca (para poder terminarlo); sin
+      él se notifica al ``track_processes`` activo.
+    - De stderr solo se conservan las últimas ``stderr_lines`` líneas.
+    - Si vence ``timeout`` el proceso se mata y se lanza ``subprocess.TimeoutExpired``.
+    """
+    cmd = [cmd[0], '-progress', 'pipe:1', '-nostats'] + list(cmd[1:])
+    started = time.time()
+    process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True, errors='replace')
+    (on_start or process_started)(process)
+
+    # stderr en su propio hilo: si nadie lo lee, FFmpeg se bloquea al llenar la tubería
+    tail = deque(maxlen=stderr_lines)
+    stderr_reader = threading.Thread(target=lambda: tail.extend(process.stderr), daemon=True)
+    stderr_reader.start()
+
+    timed_out = threading.Event()
+    def kill():
+        timed_out.set()
+        process.kill()
+    timer = threading.Timer(timeout, kill) if timeout else None
+    if timer:
+        timer.daemon = True
+        timer.start()
+
+    out_time = 0.0
+    values: Dict[str, str] = {}
+    last_report = 0.0
+    try:
+        # Cada bloque de progreso son líneas clave=valor que terminan en progress=continue|end
+        for line in process.stdout:
+            key, _, value = line.strip().partition('=')
+            if key != 'progress':
+                values[key] = value
+                continue
+            out_time = _parse_out_time(values) or out_time
+            now = time.time()
+            if on_progress and (value == 'end' or now - last_report >= min_interval):
+                last_report = now
+                fraction = min(1.0, out_time / duration) if duration else None
+                speed = values.get('speed', '').rstrip('x').strip()
+                on_progress(fraction, {
+                    'out_time': round(out_time, 3),
+                    'speed': float(speed) if speed.replace('.', '', 1).isdigit() else None,
+                    'elapsed': round(now - started, 3)
+                })
+            values = {}
+        process.wait()
+        stderr_reader.join(5)
+    finally:
+        if timer:
+            timer.cancel()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout, stderr=''.join(tail))
+    return FFmpegResult(process.returncode, ''.join(tail), time.time() - started, out_time)
@@ -0,0 +1,141 @@
+"""
+Pool de modelos de IA que se mantienen cargados entre tareas
+"""
+
+import gc
+import time
+import threading
+import psutil
+from typing import Any, Callable, Dict, Hashable, Optional
+
+class ModelPool:
+    """Modelos calientes con expulsión por inactividad y por presión de memoria"""
+
+    def __init__(self, idle_timeout: float = 900.0, max_memory_usage: float = 0.85):
+        self.idle_timeout = idle_timeout
+        self.max_memory_usage = max_memory_usage
+        self.loads = 0
+        self.evictions = 0
+        self._models: Dict[Hashable, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[Hashable, threading.Lock] = {}
+        self._reaper = None
+
+    def configure(self, idle_timeout: float, max_memory_usage: float):
+        self.idle_timeout = idle_timeout
+        self.max_memory_usage = max_memory_usage
+
+    def acquire(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Obtener un modelo (cargándolo si no está en el pool) y marcarlo en uso"""
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Un único hilo carga cada modelo; el resto espera y lo reutiliza
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(key)
+            if entry is None:
+                model = loader()
+                entry = {'model': model, 'in_use': 0, 'last_used': time.time(), 'loaded_at': time.time()}
+                with self._lock:
+                    self._models[key] = entry
+                    self.loads += 1
+
+        with self._lock:
+            entry['in_use'] += 1
+            entry['last_used'] = time.time()
+            return entry['model']
+
+    def release(self, key: Hashable):
+        """Marcar el fin de uso de un modelo (sigue cargado hasta ser expulsado)"""
+        with self._lock:
+            entry = self._models.get(key)
+            if entry:
+                entry['in_use'] = max(0, entry['in_use'] - 1)
+                entry['last_used'] = time.time()
+
+    def peek(self, key: Optional[Hashable]) -> Any:
+        """Devolver el modelo si está cargado, sin cargarlo ni marcarlo en uso"""
+        with self._lock:
+            entry = self._models.get(key) if key is not None else None
+            return entry['model'] if entry else None
+
+    def _evict(self, key: Hashable):
+        self._models.pop(key, None)
+        self.evictions += 1
+
+    def evict_idle(self) -> int:
+        """Expulsar modelos sin uso durante más de ``idle_timeout`` segundos"""
+        now = time.time()
+        with self._lock:
+            idle = [key for key, entry in self._models.items()
+                    if entry['in_use'] == 0 and now - entry['last_used'] > self.idle_timeout]
+            for key in idle:
+                self._evict(key)
+        if idle:
+            self._free_memory()
+        return len(idle)
+
+    def relieve_memory_pressure(self) -> int:
+        """Expulsar modelos libres (el menos usado primero) mientras la memoria esté por encima del límite"""
+        evicted = 0
+        while psutil.virtual_memory().percent / 100.0 > self.max_memory_usage:
+            with self._lock:
+                candidates = sorted(
+                    (entry['last_used'], key) for key, entry in self._models.items() if entry['in_use'] == 0
+                )
+                if not candidates:
+                    break
+                self._evict(candidates[0][1])
+            evicted += 1
+            self._free_memory()
+        return evicted
+
+    def clear(self):
+        """Expulsar todos los modelos que no estén en uso"""
+        with self._lock:
+            for key in [key for key, entry in self._models.items() if entry['in_use'] == 0]:
+                self._evict(key)
+        self._free_memory()
+
+    def _free_memory(self):
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+    def start_reaper(self, interval: float = 60.0):
+        """Hilo de fondo que aplica periódicamente las políticas de expulsión"""
+        if self._reaper and self._reaper.is_alive():
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.evict_idle()
+                    self.relieve_memory_pressure()
+                except Exception:
+                    pass
+
+        self._reaper = threading.Thread(target=run, name='model-pool-reaper', daemon=True)
+        self._reaper.start()
+
+    def stats(self) -> Dict:
+        now = time.time()
+        with self._lock:
+            return {
+                'loaded': [
+                    {'key': '/'.join(str(part) for part in key) if isinstance(key, tuple) else str(key),
+                     'in_use': entry['in_use'], 'idle_seconds': round(now - entry['last_used'], 1)}
+                    for key, entry in self._models.items()
+                ],
+                'loads': self.loads,
+                'evictions': self.evictions
+            }
+
+# Instancia global del pool
+model_pool = ModelPool()
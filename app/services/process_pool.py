@@ -0,0 +1,205 @@
+"""
+Pool de procesos para ejecutar etapas CPU fuera del proceso Flask
+"""
+
+import os
+import signal
+import time
+import importlib
+import threading
+import traceback
+import multiprocessing
+from typing import Any, Callable, Dict, List, Optional
+
+class StageTimeoutError(Exception):
+    """La etapa superó su tiempo máximo y el proceso hijo fue terminado"""
+
+class StageCancelledError(Exception):
+    """La etapa fue cancelada (si ya se estaba ejecutando, su proceso hijo fue terminado)"""
+
+def resolve_stage(func_path: str):
+    """Importar ``'paquete.modulo:funcion'``"""
+    module_name, func_name = func_path.split(':', 1)
+    return getattr(importlib.import_module(module_name), func_name)
+
+def _worker_main(conn, model_settings: Optional[Dict] = None):
+    """Bucle del proceso hijo: recibe trabajos, ejecuta y devuelve el resultado"""
+    # Grupo de procesos propio para poder terminar también a los nietos (ffmpeg)
+    os.setpgrp()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Los modelos viven en el pool de este proceso: aplicar aquí la expulsión por inactividad y memoria
+    from app.services.model_pool import model_pool
+    if model_settings:
+        model_pool.configure(**model_settings)
+    model_pool.start_reaper()
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        func_path, args, kwargs, report_progress = job
+        if report_progress:
+            # Los avances viajan al padre por la misma tubería antes del resultado
+            kwargs['progress'] = lambda *progress: conn.send(('progress', *progress))
+        try:
+            conn.send(('ok', resolve_stage(func_path)(*args, **kwargs)))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}", traceback.format_exc()))
+
+class _Worker:
+    def __init__(self, context, model_settings: Optional[Dict] = None):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, model_settings), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.busy = False
+        self.affinity = set()
+
+    def kill(self):
+        """Terminar el proceso y todo su grupo (incluidos subprocesos como ffmpeg)"""
+        try:
+            os.killpg(self.process.pid, signal.SIGTERM)
+        except (ProcessLookupError, PermissionError, OSError):
+            self.process.terminate()
+        self.process.join(5)
+        if self.process.is_alive():
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError, OSError):
+                self.process.kill()
+            self.process.join(5)
+        self.conn.close()
+
+class StageProcessPool:
+    """Workers persistentes (mantienen sus modelos calientes) con timeout y cancelación"""
+
+    def __init__(self, max_workers: int = 2):
+        self.max_workers = max_workers
+        self.enabled = False
+        self.restarts = 0
+        self.model_settings: Optional[Dict] = None
+        self._context = multiprocessing.get_context('spawn')
+        self._workers: List[_Worker] = []
+        self._cond = threading.Condition()
+
+    def configure(self, max_workers: int, enabled: bool = True, model_settings: Optional[Dict] = None):
+        """``model_settings`` (``idle_timeout``, ``max_memory_usage``) configura el ``model_pool`` de cada worker"""
+        self.max_workers = max(1, max_workers)
+        self.enabled = enabled
+        self.model_settings = model_settings
+
+    def _checkout(self, affinity: Optional[str], cancel_event: Optional[threading.Event] = None) -> _Worker:
+        """Reservar un worker libre respetando las afinidades
+
+        Una afinidad (p. ej. 'ai') queda ligada al worker que cargó sus modelos: si está
+        ocupado se espera a que quede libre en lugar de cargar otra copia en otro worker.
+        El resto de trabajos prefiere workers sin modelos y solo usa uno con afinidad si
+        el pool está lleno. La espera se interrumpe con ``StageCancelledError`` en cuanto
+        se activa ``cancel_event``, sin tocar al worker (ni a sus modelos cargados).
+        """
+        with self._cond:
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise StageCancelledError("Etapa cancelada antes de empezar")
+                self._workers = [w for w in self._workers if w.busy or w.process.is_alive()]
+                idle = [w for w in self._workers if not w.busy]
+                owners = [w for w in self._workers if affinity in w.affinity] if affinity else []
+                plain = [w for w in idle if not w.affinity]
+                worker = None
+                if owners:
+                    worker = next((w for w in owners if not w.busy), None)
+                elif plain:
+                    worker = plain[0]
+                elif len(self._workers) < self.max_workers:
+                    worker = _Worker(self._context, self.model_settings)
+                    self._workers.append(worker)
+                elif idle and (affinity is None or all(w.affinity for w in self._workers)):
+                    # Pool lleno: un trabajo sin afinidad (o una afinidad nueva si todos los
+                    # workers ya tienen la suya) ocupa un worker con modelos
+                    worker = idle[0]
+                if worker is None:
+                    self._cond.wait(0.2)
+                    continue
+                worker.busy = True
+                if affinity:
+                    worker.affinity.add(affinity)
+                return worker
+
+    def _checkin(self, worker: _Worker, discard: bool = False):
+        with self._cond:
+            worker.busy = False
+            if discard and worker in self._workers:
+                self._workers.remove(worker)
+                self.restarts += 1
+            self._cond.notify_all()
+
+    def run(self, func_path: str, *args, timeout: Optional[float] = None,
+            cancel_event: Optional[threading.Event] = None, affinity: Optional[str] = None,
+            on_progress: Optional[Callable] = None, **kwargs) -> Any:
+        """Ejecutar ``func_path(*args, **kwargs)`` en un proceso hijo y devolver su resultado
+
+        Solo los argumentos y el resultado cruzan la frontera del proceso. Si vence
+        ``timeout`` o se activa ``cancel_event`` con el trabajo ya enviado, el hijo se
+        termina y se reemplaza; cancelar antes del envío solo libera la reserva.
+        Con ``on_progress`` la etapa recibe un argumento ``progress`` cuyas llamadas se
+        reenvían a ``on_progress`` en este proceso.
+        """
+        worker = self._checkout(affinity, cancel_event)
+        if cancel_event is not None and cancel_event.is_set():
+            self._checkin(worker)
+            raise StageCancelledError(f"Etapa cancelada antes de empezar: {func_path}")
+        deadline = time.time() + timeout if timeout else None
+        try:
+            worker.conn.send((func_path, args, kwargs, on_progress is not None))
+            while True:
+                if worker.conn.poll(0.2):
+                    status, *payload = worker.conn.recv()
+                    if status != 'progress':
+                        break
+                    try:
+                        on_progress(*payload)
+                    except Exception:
+                        pass  # un fallo al informar no debe dejar el worker reservado
+                if cancel_event is not None and cancel_event.is_set():
+                    worker.kill()
+                    self._checkin(worker, discard=True)
+                    raise StageCancelledError(f"Etapa cancelada: {func_path}")
+                if deadline and time.time() > deadline:
+                    worker.kill()
+                    self._checkin(worker, discard=True)
+                    raise StageTimeoutError(f"Tiempo máximo superado ({timeout:.0f}s) en {func_path}")
+                if not worker.process.is_alive():
+                    self._checkin(worker, discard=True)
+                    raise Exception(f"El proceso de la etapa terminó inesperadamente: {func_path}")
+        except (StageCancelledError, StageTimeoutError):
+            raise
+        except (EOFError, OSError) as e:
+            worker.kill()
+            self._checkin(worker, discard=True)
+            raise Exception(f"Error de comunicación con el proceso de la etapa: {e}")
+
+        self._checkin(worker)
+        if status == 'error':
+            raise Exception(payload[0])
+        return payload[0]
+
+    def shutdown(self):
+        with self._cond:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.kill()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                'enabled': self.enabled,
+                'workers': len(self._workers),
+                'busy': sum(1 for w in self._workers if w.busy),
+                'max_workers': self.max_workers,
+                'restarts': self.restarts
+            }
+
+# Instancia global del pool de procesos
+process_pool = StageProcessPool()
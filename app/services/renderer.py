@@ -0,0 +1,128 @@
+"""
+Renderizador por tramos (time-warp) de la pista doblada a partir de un mapa de offsets
+"""
+
+import time
+import threading
+import subprocess
+import numpy as np
+from typing import List, Optional, Dict
+from app.services.alignment import OffsetRegion
+from app.services.ffmpeg_runner import process_started
+from app.utils.audio_utils import open_wav_memmap, open_wav_writer
+
+def _read_shifted(source: np.ndarray, start: int, end: int, shift: int) -> np.ndarray:
+    """Leer source[start+shift:end+shift] como float32, con silencio fuera de rango"""
+    out = np.zeros((end - start, source.shape[1]), dtype=np.float32)
+    src_start, src_end = start + shift, end + shift
+    lo, hi = max(src_start, 0), min(src_end, len(source))
+    if lo < hi:
+        out[lo - src_start:hi - src_start] = source[lo:hi]
+    return out
+
+class _EncoderWriter:
+    """Salida PCM por tubería a un codificador FFmpeg (misma interfaz que ``wave.Wave_write``)"""
+
+    def __init__(self, path: str, sample_rate: int, channels: int, sample_width: int, encoder_args: List[str]):
+        cmd = [
+            'ffmpeg', '-nostdin', '-v', 'error',
+            '-f', f's{8 * sample_width}le', '-ar', str(sample_rate), '-ac', str(channels), '-i', 'pipe:0',
+            *encoder_args,
+            '-y', path
+        ]
+        # stderr a archivo temporal: una tubería sin leer podría bloquear al codificador
+        self._stderr = subprocess.TemporaryFile()
+        self._process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=self._stderr)
+        process_started(self._process)
+
+    def writeframes(self, data: bytes):
+        self._process.stdin.write(data)
+
+    def close(self):
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self._process.wait()
+        self._stderr.seek(0)
+        stderr = self._stderr.read().decode('utf-8', 'replace')
+        self._stderr.close()
+        if returncode != 0:
+            raise Exception(f"Error codificando la pista renderizada: {stderr[-2000:]}")
+
+def _ramp(positions: np.ndarray, start: int, length: int) -> np.ndarray:
+    """Rampa lineal 0→1 evaluada en posiciones absolutas de frame"""
+    return np.clip((positions - start + 1) / float(length + 1), 0.0, 1.0)[:, None]
+
+def render_offset_map(source_path: str, output_path: str, regions: List[OffsetRegion],
+                      total_duration: Optional[float] = None, block_frames: int = 1 << 16,
+                      crossfade: float = 0.02, encoder_args: Optional[List[str]] = None,
+                      cancel_event: Optional[threading.Event] = None) -> Dict:
+    """Renderizar la pista sincronizada en una sola pasada por bloques de tamaño fijo
+
+    Cada tramo produce ``out(t) = dub(t + offset)``. Si el offset crece en una
+    frontera se corta material del doblaje (con crossfade); si decrece se inserta
+    silencio para no repetir audio (con fundido de salida y de entrada).
+
+    Los offsets están en segundos, así que el mismo mapa sirve para cualquier
+    frecuencia y número de canales de la fuente. Con ``encoder_args`` la salida se
+    codifica al vuelo con FFmpeg (p. ej. ``['-c:a', 'aac']``) en lugar de escribir un WAV.
+    Si ``cancel_event`` se activa, el renderizado se interrumpe en el siguiente bloque.
+    """
+    started = time.time()
+    source, sample_rate = open_wav_memmap(source_path)
+    channels = source.shape[1]
+    limit = np.iinfo(source.dtype).max
+    # Mayor float32 que cabe en el entero de salida (con int32, float32(limit) ya vale 2**31 y desborda)
+    high = np.nextafter(np.float32(limit + 1), np.float32(0))
+    total_frames = int(round(total_duration * sample_rate)) if total_duration else len(source)
+    fade = max(1, int(crossfade * sample_rate))
+
+    bounds = []
+    for n, region in enumerate(regions):
+        start = 0 if n == 0 else int(round(region.start * sample_rate))
+        end = total_frames if region.end is None or n == len(regions) - 1 else int(round(region.end * sample_rate))
+        bounds.append((min(start, total_frames), min(end, total_frames), int(round(region.offset * sample_rate))))
+
+    if encoder_args:
+        writer = _EncoderWriter(output_path, sample_rate, channels, source.dtype.itemsize, encoder_args)
+    else:
+        writer = open_wav_writer(output_path, sample_rate, channels, source.dtype.itemsize)
+    try:
+        for n, (start, end, shift) in enumerate(bounds):
+            prev_shift = bounds[n - 1][2] if n > 0 else shift
+            next_shift = bounds[n + 1][2] if n + 1 < len(bounds) else shift
+            silence_end = start + max(0, prev_shift - shift)
+
+            for block_start in range(start, end, block_frames):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise Exception("Renderizado cancelado")
+                block_end = min(block_start + block_frames, end)
+                positions = np.arange(block_start, block_end)
+                out = _read_shifted(source, block_start, block_end, shift)
+
+                if silence_end > start:
+                    # Hueco: silencio y fundido de entrada del nuevo material
+                    out *= _ramp(positions, silence_end, fade)
+                elif shift > prev_shift and block_start < start + fade:
+                    # Corte: crossfade entre la continuación del tramo anterior y el nuevo
+                    weight = _ramp(positions, start, fade)
+                    previous = _read_shifted(source, block_start, block_end, prev_shift)
+                    out = out * weight + previous * (1.0 - weight)
+
+                if next_shift < shift and block_end > end - fade:
+                    # El siguiente tramo empieza con silencio: fundido de salida
+                    out *= 1.0 - _ramp(positions, end - fade, fade)
+
+                writer.writeframes(np.clip(out, -limit - 1, high).astype(source.dtype).tobytes())
+    finally:
+        writer.close()
+
+    elapsed = time.time() - started
+    audio_seconds = total_frames / float(sample_rate)
+    return {
+        'frames': total_frames,
+        'regions': len(bounds),
+        'elapsed': round(elapsed, 3),
+        'speed': round(audio_seconds / elapsed, 1) if elapsed > 0 else None
+    }
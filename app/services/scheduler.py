@@ -0,0 +1,142 @@
+"""
+Planificador de tareas: cola con prioridad, workers acotados y límites por etapa
+"""
+
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+class TaskCancelledError(Exception):
+    """La tarea fue cancelada mientras esperaba o ejecutaba una etapa"""
+
+def parse_stage_limits(value: str) -> Dict[str, int]:
+    """Convertir ``'extract=4,transcribe=1'`` en ``{'extract': 4, 'transcribe': 1}``"""
+    limits = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            name, limit = item.split('=', 1)
+            limits[name.strip()] = max(1, int(limit))
+    return limits
+
+class TaskScheduler:
+    """Cola FIFO con prioridad (menor número = antes) atendida por N workers"""
+
+    def __init__(self, max_workers: int = 2, stage_limits: Optional[Dict[str, int]] = None):
+        self.max_workers = max_workers
+        self._heap: List = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._running: Dict[str, str] = {}
+        self._workers: List[threading.Thread] = []
+        self._handler: Optional[Callable[[str], None]] = None
+        self._stage_limits: Dict[str, int] = {}
+        self._stage_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._stage_active: Dict[str, int] = {}
+        self._stage_free: Dict[str, List[int]] = {}
+        self.configure(max_workers, stage_limits or {})
+
+    def configure(self, max_workers: int, stage_limits: Dict[str, int]):
+        self.max_workers = max(1, max_workers)
+        self._stage_limits = dict(stage_limits)
+        self._stage_semaphores = {name: threading.BoundedSemaphore(limit) for name, limit in stage_limits.items()}
+        self._stage_active = {name: 0 for name in stage_limits}
+        self._stage_free = {name: list(reversed(range(limit))) for name, limit in stage_limits.items()}
+
+    def start(self, handler: Callable[[str], None]):
+        """Arrancar los workers (idempotente); ``handler(task_id)`` procesa cada tarea"""
+        self._handler = handler
+        with self._cond:
+            while len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._worker_loop, name=f'sync-worker-{len(self._workers)}', daemon=True)
+                self._workers.append(worker)
+                worker.start()
+
+    def submit(self, task_id: str, priority: int = 0):
+        """Encolar una tarea"""
+        with self._cond:
+            heapq.heappush(self._heap, (priority, next(self._counter), task_id))
+            self._cond.notify()
+
+    def remove(self, task_id: str) -> bool:
+        """Quitar una tarea de la cola si todavía no ha empezado"""
+        with self._cond:
+            for n, item in enumerate(self._heap):
+                if item[2] == task_id:
+                    self._heap.pop(n)
+                    heapq.heapify(self._heap)
+                    return True
+            return False
+
+    def queue_position(self, task_id: str) -> Optional[int]:
+        """Posición (1 = la siguiente) de una tarea en cola, o None si no está en cola"""
+        with self._cond:
+            for position, item in enumerate(sorted(self._heap), start=1):
+                if item[2] == task_id:
+                    return position
+            return None
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                _, _, task_id = heapq.heappop(self._heap)
+                self._running[task_id] = threading.current_thread().name
+
+            try:
+                self._handler(task_id)
+            except Exception:
+                pass
+            finally:
+                with self._cond:
+                    self._running.pop(task_id, None)
+
+    def stage_limit(self, name: str) -> Optional[int]:
+        """Concurrencia máxima de una etapa (None si no está limitada)"""
+        return self._stage_limits.get(name)
+
+    @contextmanager
+    def stage(self, name: str, cancel_event: Optional[threading.Event] = None):
+        """Limitar cuántas tareas ejecutan a la vez una etapa (p. ej. una transcripción por modelo)
+
+        Devuelve el índice de la plaza ocupada (0..límite-1), que identifica p. ej. la
+        réplica del modelo que puede usar quien la tiene. Si ``cancel_event`` se activa
+        mientras se espera la plaza se lanza ``TaskCancelledError`` sin ocuparla.
+        """
+        if cancel_event is not None and cancel_event.is_set():
+            raise TaskCancelledError(f"Tarea cancelada antes de la etapa '{name}'")
+        semaphore = self._stage_semaphores.get(name)
+        if semaphore is None:
+            yield 0
+            return
+
+        while not semaphore.acquire(timeout=0.5):
+            if cancel_event is not None and cancel_event.is_set():
+                raise TaskCancelledError(f"Tarea cancelada esperando la etapa '{name}'")
+        with self._cond:
+            self._stage_active[name] += 1
+            slot = self._stage_free[name].pop()
+        try:
+            yield slot
+        finally:
+            with self._cond:
+                self._stage_active[name] -= 1
+                self._stage_free[name].append(slot)
+            semaphore.release()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                'workers': self.max_workers,
+                'running': len(self._running),
+                'queued': len(self._heap),
+                'stages': {
+                    name: {'active': self._stage_active[name], 'limit': limit}
+                    for name, limit in self._stage_limits.items()
+                }
+            }
+
+# Instancia global del planificador
+scheduler = TaskScheduler()
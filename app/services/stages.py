@@ -0,0 +1,186 @@
+"""
+Etapas del pipeline como funciones puras (sin Flask) ejecutables en un proceso hijo
+
+Cada función recibe solo datos serializables y devuelve su resultado; los modelos
+se obtienen del ``model_pool`` del proceso en el que se ejecutan, de modo que un
+worker persistente los mantiene cargados entre tareas.
+"""
+
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+from app.services.model_pool import model_pool
+from app.services.alignment import align_segments
+from app.services.audio_analysis import (
+    onset_envelope, xcorr_offset, windowed_xcorr_offset, band_energies, spectral_offset
+)
+from app.services.audio_source import open_source, source_duration, probe_audio_stream, native_sample_width
+from app.services.vad import speech_regions
+from app.services.asr import WINDOW_SECONDS, create_backend, default_device
+from app.services.ffmpeg_runner import run_ffmpeg
+
+def asr_key(backend: str, model_name: str, compute_type: str, device: str, replica: int = 0) -> Tuple:
+    """Clave del motor ASR en el ``model_pool``"""
+    # Cada réplica es una instancia independiente (los motores no admiten llamadas concurrentes)
+    return ('asr', backend, model_name, compute_type, device) + ((replica,) if replica else ())
+
+def _asr(backend: str, model_name: str, compute_type: str, replica: int = 0):
+    device = default_device()
+    key = asr_key(backend, model_name, compute_type, device, replica)
+    return key, model_pool.acquire(key, lambda: create_backend(backend, model_name, device, compute_type))
+
+def _sentence_transformer(model_name: str):
+    from sentence_transformers import SentenceTransformer
+    device = default_device()
+    key = ('sentence_transformer', model_name, device)
+    return key, model_pool.acquire(key, lambda: SentenceTransformer(model_name, device=device))
+
+def extract_audio(video_path: str, audio_path: str, sample_rate: Optional[int] = 16000,
+                  channels: Optional[int] = 1, sample_width: Optional[int] = 2, timeout: float = 1800,
+                  progress: Optional[Callable[[float, Dict], None]] = None) -> Dict:
+    """Extraer audio PCM con FFmpeg (``None`` conserva la frecuencia, los canales o la resolución nativos)
+    
+    ``sample_width=None`` usa 32 bits si la fuente tiene más de 16 (PCM de 24 bits, códecs
+    con decodificación en coma flotante). Por encima de 4 GiB el WAV se escribe como RF64.
+    ``progress(fracción, info)`` informa del avance; devuelve tiempo y velocidad de la extracción.
+    """
+    if sample_width is None:
+        sample_width = native_sample_width(probe_audio_stream(video_path)['sample_fmt'])
+    # Comando FFmpeg optimizado para archivos grandes
+    cmd = [
+        'ffmpeg', '-i', video_path,
+        '-vn',  # Sin video
+        '-map', '0:a:0',  # Primera pista de audio
+        '-acodec', f'pcm_s{8 * sample_width}le',  # Codec de audio
+        *(['-ar', str(sample_rate)] if sample_rate else []),  # Sample rate
+        *(['-ac', str(channels)] if channels else []),  # Mono por defecto
+        '-map_metadata', '-1',  # Sin metadatos
+        '-fflags', '+bitexact',  # Reproducible
+        '-threads', '0',  # Usar todos los cores disponibles
+        '-f', 'wav',
+        '-rf64', 'auto',  # RF64 si supera 4 GiB (p. ej. pista 5.1 nativa de una película larga)
+        '-y',  # Sobrescribir
+        audio_path
+    ]
+
+    try:
+        duration = source_duration(video_path)  # solo cabeceras (ffprobe)
+    except Exception:
+        duration = None
+    result = run_ffmpeg(cmd, duration=duration, on_progress=progress, timeout=timeout)
+    if result.returncode != 0:
+        raise Exception(f"Error extrayendo audio: {result.stderr[-2000:]}")
+    return result.stats()
+
+def detect_speech(audio_path: str) -> Tuple[List[Tuple[float, float]], float]:
+    """Tramos de voz del audio y duración analizada"""
+    return speech_regions(audio_path)
+
+def load_models(asr_backend: str, whisper_name: str, compute_type: str,
+                sentence_transformer_name: str) -> Dict:
+    """Cargar (o reutilizar) los modelos en el pool de este proceso"""
+    loaded = {'whisper': False, 'sentence_transformer': False, 'asr_footprint': 0}
+    key, backend = _asr(asr_backend, whisper_name, compute_type)
+    model_pool.release(key)
+    loaded['whisper'] = True
+    loaded['asr_footprint'] = backend.memory_footprint()
+    try:
+        key, _ = _sentence_transformer(sentence_transformer_name)
+        model_pool.release(key)
+        loaded['sentence_transformer'] = True
+    except Exception:
+        pass
+    return loaded
+
+PACK_GAP = 0.5  # segundos de silencio entre tramos empaquetados en una misma llamada
+
+def source_time(t: float, packed_starts: np.ndarray, starts: np.ndarray, lengths: np.ndarray) -> float:
+    """Pasar un instante del audio empaquetado al tiempo del archivo original
+
+    Un instante que cae en el silencio de separación se lleva al final del tramo anterior.
+    """
+    i = max(0, int(np.searchsorted(packed_starts, t, side='right')) - 1)
+    return float(starts[i] + min(max(0.0, t - packed_starts[i]), lengths[i]))
+
+def transcribe(audio_path: str, asr_backend: str, model_name: str, compute_type: str, decode_options: Dict,
+               pieces: Optional[List[Tuple[float, float]]] = None, replica: int = 0) -> List[Dict]:
+    """Transcribir un audio (o sus tramos ``pieces``) y devolver los segmentos
+
+    Los tramos ``(inicio, fin)`` se concatenan separados por ``PACK_GAP`` segundos de
+    silencio y se transcriben en una sola llamada, de modo que la voz dispersa llena
+    ventanas de Whisper completas. El audio llega al motor ASR como array float32 a
+    16 kHz leído de la fuente (WAV en memmap o tubería de FFmpeg), sin que el motor
+    lance su propia decodificación. Los tiempos devueltos son absolutos respecto al
+    inicio del archivo.
+    """
+    parts, starts, packed_starts, lengths = [], [], [], []
+    position = 0.0
+    for start, end in pieces or [(0.0, None)]:
+        audio = open_source(audio_path, sample_rate=16000, channels=1, start=start,
+                            length=None if end is None else end - start).read()
+        if parts:
+            parts.append(np.zeros(int(PACK_GAP * 16000), dtype=np.float32))
+            position += PACK_GAP
+        parts.append(audio)
+        starts.append(start)
+        packed_starts.append(position)
+        lengths.append(len(audio) / 16000)
+        position += lengths[-1]
+    audio = np.concatenate(parts) if len(parts) > 1 else parts[0]
+
+    key, backend = _asr(asr_backend, model_name, compute_type, replica)
+    try:
+        segments = backend.transcribe(audio, decode_options)
+    finally:
+        model_pool.release(key)
+
+    time_map = (np.array(packed_starts), np.array(starts, dtype=np.float64), np.array(lengths))
+    for segment in segments:
+        segment['start'] = source_time(segment['start'], *time_map)
+        segment['end'] = source_time(segment['end'], *time_map)
+    return segments
+
+def detect_language(audio_path: str, asr_backend: str, model_name: str, compute_type: str,
+                    start: float = 0.0, replica: int = 0) -> Optional[str]:
+    """Idioma de la pista detectado una sola vez sobre la ventana de 30 s que empieza en ``start``"""
+    audio = open_source(audio_path, sample_rate=16000, channels=1, start=start, length=WINDOW_SECONDS).read()
+    key, backend = _asr(asr_backend, model_name, compute_type, replica)
+    try:
+        return backend.detect_language(audio)
+    finally:
+        model_pool.release(key)
+
+def embed_texts(model_name: str, texts: List[str], batch_size: int = 64) -> np.ndarray:
+    """Codificar textos en una matriz float32 de embeddings normalizados (L2)"""
+    key, model = _sentence_transformer(model_name)
+    try:
+        embeddings = model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    finally:
+        model_pool.release(key)
+
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+def align(orig_starts: np.ndarray, orig_ends: np.ndarray, dub_starts: np.ndarray,
+          orig_embeddings: np.ndarray, dub_embeddings: np.ndarray,
+          threshold: float, band: int, tolerance: float) -> Tuple[Dict, int]:
+    """Alinear segmentos y devolver el mapa de offsets serializado y el número de anclas"""
+    offset_map, anchors = align_segments(orig_starts, orig_ends, dub_starts, orig_embeddings,
+                                         dub_embeddings, threshold, band, tolerance)
+    return offset_map.to_dict(), anchors
+
+def xcorr_analysis(original_audio: str, dubbed_audio: str, max_offset: float) -> Tuple[float, float, Dict]:
+    """Offset y confianza por correlación cruzada de envolventes de onsets"""
+    return xcorr_offset(onset_envelope(original_audio), onset_envelope(dubbed_audio), max_offset=max_offset)
+
+def windowed_xcorr_analysis(original_video: str, dubbed_video: str, max_offset: float,
+                            n_windows: int, window_seconds: float) -> Tuple[float, float, Dict]:
+    """Offset y confianza decodificando solo ``n_windows`` ventanas de cada contenedor"""
+    return windowed_xcorr_offset(original_video, dubbed_video, source_duration(original_video),
+                                 source_duration(dubbed_video), max_offset=max_offset,
+                                 n_windows=n_windows, window_seconds=window_seconds)
+
+def spectral_analysis(original_audio: str, dubbed_audio: str, max_offset: float) -> Tuple[float, Dict]:
+    """Offset y calidad alineando energías log-mel"""
+    return spectral_offset(band_energies(original_audio), band_energies(dubbed_audio), max_offset=max_offset)
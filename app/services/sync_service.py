@@ -9,15 +9,35 @@ import time
 import threading
 import subprocess
 import json
+import math
 import tempfile
+import shutil
 import psutil
+from contextlib import contextmanager
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, Future
 from flask import current_app
 import numpy as np
-from typing import List, Tuple, Dict, Optional
+from typing import Callable, List, Tuple, Dict, Optional
 from datetime import datetime
 from app.models.task import SyncTask
 from app.models.database import db
+from app.services.alignment import OffsetMap
+from app.services.renderer import render_offset_map
+from app.services.audio_cache import audio_cache
+from app.services.transcript_cache import transcript_cache
+from app.services.embedding_cache import embedding_cache
+from app.services.model_pool import model_pool
+from app.services.scheduler import scheduler, parse_stage_limits, TaskCancelledError
+from app.services.process_pool import process_pool, resolve_stage, StageCancelledError
+from app.services.audio_source import source_duration, probe_audio_stream
+from app.services.vad import VAD_VERSION, speech_ratio
+from app.services.asr import WINDOW_SECONDS, create_backend, default_device, get_backend_class
+from app.services.stages import PACK_GAP, asr_key
+from app.services.checkpoints import checkpoint_store
+from app.services.ffmpeg_runner import FFmpegResult, run_ffmpeg, track_processes
+from app.services.events import event_bus
+from app.utils.audio_utils import is_wav, read_wav_header
 
 class AudioSegment:
     """Representa un segmento de audio transcrito"""
@@ -28,6 +48,9 @@ class AudioSegment:
         self.confidence = confidence
         self.duration = end - start
     
+    def to_dict(self) -> Dict:
+        return {'start': self.start, 'end': self.end, 'text': self.text, 'confidence': self.confidence}
+    
     def __repr__(self):
         return f"AudioSegment({self.start:.2f}-{self.end:.2f}: '{self.text[:50]}...')"
 
@@ -39,18 +62,203 @@ class SyncService:
         self._lock = threading.Lock()
         self.app = None
         
-        # Configuración de modelos IA
-        self.whisper_model = None
-        self.sentence_transformer = None
-        self._models_loaded = False
+        # Configuración de modelos IA (las instancias viven en el pool de modelos)
+        self.whisper_model_name = None
+        self.asr_backend = 'whisper'
+        self.asr_compute_type = 'default'
+        self.asr_language = None  # None = detectar una vez por pista
+        self.sentence_transformer_name = None
         
         # Configuración de recursos
         self.max_memory_usage = 0.85  # 85% de memoria máxima
         self.chunk_size = 60  # Procesar audio en chunks de 60 segundos para archivos grandes
+        self.chunk_overlap = 5  # Solapamiento entre chunks para no cortar frases en las costuras
+        self.work_folder = Path(tempfile.gettempdir())  # intermedios grandes (WAV nativo)
+        self.stage_timeout = 1800  # segundos por etapa (extracción y análisis sobre la pista completa)
     
     def set_app(self, app):
         """Establecer la instancia de la aplicación Flask"""
         self.app = app
+        self.asr_backend = app.config.get('ASR_BACKEND', self.asr_backend)
+        self.asr_compute_type = app.config.get('ASR_COMPUTE_TYPE', self.asr_compute_type)
+        self.asr_language = app.config.get('ASR_LANGUAGE') or None
+        self.chunk_size = app.config.get('AUDIO_CHUNK_SIZE', self.chunk_size)
+        self.chunk_overlap = app.config.get('AUDIO_CHUNK_OVERLAP', self.chunk_overlap)
+        self.work_folder = Path(app.config.get('WORK_FOLDER', self.work_folder))
+        self.stage_timeout = app.config.get('STAGE_TIMEOUT', self.stage_timeout)
+        self.work_folder.mkdir(parents=True, exist_ok=True)
+        audio_cache.configure(
+            app.config.get('AUDIO_CACHE_FOLDER'),
+            app.config.get('AUDIO_CACHE_MAX_BYTES', 20 * 1024 ** 3),
+            enabled=app.config.get('AUDIO_CACHE_ENABLED', True)
+        )
+        transcript_cache.configure(
+            app.config.get('TRANSCRIPT_CACHE_PATH'),
+            app.config.get('TRANSCRIPT_CACHE_MAX_ENTRIES', 500),
+            enabled=app.config.get('TRANSCRIPT_CACHE_ENABLED', True)
+        )
+        embedding_cache.configure(
+            app.config.get('EMBEDDING_CACHE_FOLDER'),
+            app.config.get('EMBEDDING_CACHE_MAX_ROWS', 1_000_000),
+            enabled=app.config.get('EMBEDDING_CACHE_ENABLED', True)
+        )
+        checkpoint_store.configure(
+            app.config.get('CHECKPOINT_FOLDER'),
+            enabled=app.config.get('CHECKPOINT_ENABLED', True)
+        )
+        
+        model_settings = {
+            'idle_timeout': app.config.get('MODEL_IDLE_TIMEOUT', 900),
+            'max_memory_usage': self.max_memory_usage
+        }
+        process_pool.configure(
+            app.config.get('PROCESS_POOL_WORKERS', 2),
+            enabled=app.config.get('STAGE_EXECUTOR', 'process') == 'process',
+            model_settings=model_settings  # los modelos viven en los workers: expulsión también allí
+        )
+        model_pool.configure(**model_settings)
+        scheduler.configure(
+            app.config.get('MAX_CONCURRENT_TASKS', 2),
+            parse_stage_limits(app.config.get('STAGE_LIMITS', ''))
+        )
+    
+    def start(self):
+        """Arrancar el procesamiento: workers del planificador, tareas con checkpoint y precarga
+        
+        Se llama una vez inicializada la base de datos y solo en el proceso que atiende
+        peticiones (no en el proceso vigilante del recargador de Werkzeug), para que una
+        tarea reanudada no se procese dos veces.
+        """
+        model_pool.start_reaper()
+        if self.app.config.get('PRELOAD_MODELS', False):
+            threading.Thread(target=self.preload_models, name='model-preload', daemon=True).start()
+        scheduler.start(self._process_with_context)
+        self._restore_checkpointed_tasks()
+    
+    def _run_stage(self, func_path: str, *args, timeout: Optional[float] = None,
+                   affinity: Optional[str] = None, task_id: Optional[str] = None,
+                   progress: Optional[Callable] = None, inline: bool = False, **kwargs):
+        """Ejecutar una etapa CPU de app.services.stages en el pool de procesos o en este hilo
+        
+        Con ``task_id``, cancelar la tarea termina el proceso hijo de inmediato; en este
+        hilo se terminan los FFmpeg que haya lanzado la etapa y el resto del cálculo no
+        se puede interrumpir: la cancelación se aplica al terminar.
+        ``progress`` se pasa a las etapas que informan de su avance (p. ej. extract_audio).
+        ``inline`` ejecuta siempre en este hilo las etapas que solo esperan a un
+        subproceso FFmpeg, sin ocupar un worker del pool; esas etapas reciben ``timeout``
+        y lo aplican ellas mismas al subproceso.
+        """
+        self._check_cancelled(task_id)
+        if process_pool.enabled and not inline:
+            try:
+                return process_pool.run(func_path, *args, timeout=timeout, affinity=affinity,
+                                        cancel_event=self._cancel_event(task_id), on_progress=progress, **kwargs)
+            except StageCancelledError as e:
+                raise TaskCancelledError(str(e))
+        if progress is not None:
+            kwargs['progress'] = progress
+        if inline and timeout is not None:
+            kwargs['timeout'] = timeout
+        # Los FFmpeg que lance la etapa (extracción, decodificación por tubería) se terminan al cancelar
+        with self._track_processes(task_id) as register, track_processes(register):
+            result = resolve_stage(func_path)(*args, **kwargs)
+        self._check_cancelled(task_id)
+        return result
+    
+    def _cancel_event(self, task_id: Optional[str]) -> Optional[threading.Event]:
+        with self._lock:
+            return self.tasks.get(task_id, {}).get('cancel_event') if task_id else None
+    
+    def _check_cancelled(self, task_id: Optional[str]):
+        """Lanzar TaskCancelledError si la tarea se ha cancelado (comprobación en fronteras de etapa)"""
+        event = self._cancel_event(task_id)
+        if event is not None and event.is_set():
+            raise TaskCancelledError("Tarea cancelada")
+    
+    def _run_ffmpeg(self, task_id: str, cmd: List[str], timeout: float, label: str,
+                    duration: Optional[float] = None,
+                    progress: Optional[Callable[[Optional[float], Dict], None]] = None) -> FFmpegResult:
+        """Ejecutar FFmpeg con progreso en vivo, registrando su Popen para poder terminarlo al cancelar
+        
+        El tiempo y la velocidad de la invocación quedan en ``metadata['ffmpeg'][label]``.
+        """
+        self._check_cancelled(task_id)
+        with self._track_processes(task_id) as register:
+            result = run_ffmpeg(cmd, duration=duration, on_progress=progress, on_start=register, timeout=timeout)
+        self._check_cancelled(task_id)
+        self._record_ffmpeg_stats(task_id, label, result.stats())
+        return result
+    
+    @contextmanager
+    def _track_processes(self, task_id: Optional[str]):
+        """Callback que registra procesos en ``task['processes']`` mientras dura el bloque"""
+        task = self.tasks.get(task_id) if task_id else None
+        started = []
+        
+        def register(process: subprocess.Popen):
+            if task is None:
+                return
+            started.append(process)
+            with self._lock:
+                task['processes'].append(process)
+                cancelled = task['cancel_event'].is_set()
+            if cancelled:  # cancelada mientras arrancaba
+                process.terminate()
+        
+        try:
+            yield register
+        finally:
+            with self._lock:
+                for process in started:
+                    task['processes'].remove(process)
+    
+    def _record_ffmpeg_stats(self, task_id: str, label: str, stats: Optional[Dict]):
+        """Guardar tiempo de reloj y velocidad (x tiempo real) de una invocación de FFmpeg"""
+        if not stats:
+            return
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if task is not None:
+                task['metadata'].setdefault('ffmpeg', {})[label] = stats
+        current_app.logger.info(f"ffmpeg {label}: {stats['media_seconds']}s of media "
+                                f"in {stats['elapsed']}s ({stats['speed']}x realtime)")
+    
+    def _progress_message(self, message: str, fraction: Optional[float], info: Dict) -> str:
+        details = [f"{fraction:.0%}"] if fraction is not None else []
+        if info.get('speed'):
+            details.append(f"{info['speed']:.1f}x")
+        return f"{message} ({', '.join(details)})..." if details else f"{message}..."
+    
+    def _task_progress(self, task_id: str, start: int, end: int,
+                       message: str) -> Callable[[Optional[float], Dict], None]:
+        """Callback de progreso de FFmpeg que proyecta ``out_time`` sobre el rango [start, end] de la tarea"""
+        def report(fraction: Optional[float], info: Dict):
+            progress = int(start + (end - start) * (fraction or 0.0))
+            self._update_task_status(task_id, 'processing', progress, self._progress_message(message, fraction, info))
+        return report
+    
+    def _probe_duration(self, path: str) -> Optional[float]:
+        """Duración de un archivo para calcular el progreso (None si no se puede sondear)"""
+        try:
+            return source_duration(path)
+        except Exception:
+            return None
+    
+    def preload_models(self):
+        """Cargar los modelos en el pool al arrancar para que la primera tarea no espere"""
+        if not self.app:
+            return
+        with self.app.app_context():
+            preload_id = '__preload__'
+            with self._lock:
+                self.tasks[preload_id] = {'model_keys': []}
+            try:
+                if self._load_ai_models_safe(preload_id):
+                    current_app.logger.info("AI models preloaded into the model pool")
+            finally:
+                self._release_task_models(preload_id)
+                with self._lock:
+                    self.tasks.pop(preload_id, None)
     
     def _check_memory_usage(self) -> bool:
         """Verificar uso de memoria del sistema"""
@@ -68,18 +276,12 @@ class SyncService:
             return True
     
     def _cleanup_memory(self):
-        """Limpiar memoria y forzar garbage collection"""
+        """Liberar memoria sin descargar los modelos activos del pool"""
         try:
-            # Limpiar modelos si están cargados
-            if self.whisper_model is not None:
-                del self.whisper_model
-                self.whisper_model = None
-            
-            if self.sentence_transformer is not None:
-                del self.sentence_transformer
-                self.sentence_transformer = None
-            
-            self._models_loaded = False
+            # Si la memoria sigue alta, expulsar primero los modelos libres menos usados
+            evicted = 0
+            if not self._check_memory_usage():
+                evicted = model_pool.relieve_memory_pressure()
             
             # Forzar garbage collection
             gc.collect()
@@ -94,101 +296,123 @@ class SyncService:
             
             if self.app:
                 with self.app.app_context():
-                    current_app.logger.info("Memory cleanup completed")
+                    current_app.logger.info(f"Memory cleanup completed ({evicted} models evicted)")
         except Exception as e:
             if self.app:
                 with self.app.app_context():
                     current_app.logger.warning(f"Error during memory cleanup: {e}")
     
-    def _load_ai_models_safe(self):
-        """Cargar modelos de IA de forma segura con soporte GPU"""
-        if self._models_loaded:
-            return True
+    def _release_task_models(self, task_id: str):
+        """Devolver al pool los modelos usados por una tarea (siguen cargados)"""
+        with self._lock:
+            keys = self.tasks.get(task_id, {}).get('model_keys', [])
+            self.tasks.get(task_id, {})['model_keys'] = []
+        for key in keys:
+            model_pool.release(key)
+    
+    def _load_ai_models_safe(self, task_id: str) -> bool:
+        """Obtener los modelos de IA del pool (cargándolos si hace falta) con soporte GPU"""
+        with self._lock:
+            if self.tasks.get(task_id, {}).get('model_keys'):
+                return True
         
+        model_name = current_app.config.get('WHISPER_MODEL', 'base')
+        st_model_name = current_app.config.get('SENTENCE_TRANSFORMER_MODEL', 'paraphrase-multilingual-MiniLM-L12-v2')
         try:
-            # Verificar memoria disponible antes de cargar
-            if not self._check_memory_usage():
-                if self.app:
-                    with self.app.app_context():
-                        current_app.logger.warning("Insufficient memory for AI models, using fallback mode")
-                return False
-            
-            # Cargar Whisper con soporte GPU
-            try:
-                import whisper
-                import torch
-                
-                # Determinar dispositivo (GPU si está disponible)
-                device = "cuda" if torch.cuda.is_available() else "cpu"
-                if self.app:
-                    with self.app.app_context():
-                        current_app.logger.info(f"Using device: {device}")
-                
-                # Usar modelo base para balance entre calidad y recursos
-                model_name = 'base'
-                if self.app:
-                    with self.app.app_context():
-                        model_name = current_app.config.get('WHISPER_MODEL', 'base')
-                        current_app.logger.info(f"Loading Whisper model: {model_name}")
-                
-                self.whisper_model = whisper.load_model(model_name, device=device)
-                if self.app:
-                    with self.app.app_context():
-                        current_app.logger.info(f"Whisper model '{model_name}' loaded successfully on {device}")
-            except Exception as e:
-                if self.app:
-                    with self.app.app_context():
-                        current_app.logger.warning(f"Failed to load Whisper: {e}")
-                return False
-            
-            # Verificar memoria después de cargar Whisper
+            backend_class = get_backend_class(self.asr_backend)
+        except ValueError as e:
+            current_app.logger.warning(str(e))
+            return False
+        if not backend_class.available():
+            current_app.logger.warning(f"AI libraries not available: {backend_class.module}")
+            return False
+        if process_pool.enabled:
+            return self._load_ai_models_in_worker(task_id, model_name, st_model_name)
+        
+        # Determinar dispositivo (GPU si está disponible)
+        device = default_device()
+        whisper_key = asr_key(self.asr_backend, model_name, self.asr_compute_type, device)
+        
+        # Verificar memoria disponible antes de cargar (un modelo ya caliente no la necesita)
+        if model_pool.peek(whisper_key) is None and not self._check_memory_usage():
+            model_pool.relieve_memory_pressure()
             if not self._check_memory_usage():
-                if self.app:
-                    with self.app.app_context():
-                        current_app.logger.warning("Memory limit reached after loading Whisper")
-                del self.whisper_model
-                self.whisper_model = None
+                current_app.logger.warning("Insufficient memory for AI models, using fallback mode")
                 return False
+        
+        # Cargar el motor ASR configurado (whisper o faster-whisper) con soporte GPU
+        try:
+            def load_asr():
+                current_app.logger.info(f"Loading {self.asr_backend} model: {model_name} on {device}")
+                return create_backend(self.asr_backend, model_name, device, self.asr_compute_type)
             
-            # Cargar Sentence Transformer
-            try:
-                from sentence_transformers import SentenceTransformer
-                st_model_name = 'paraphrase-multilingual-MiniLM-L12-v2'
-                if self.app:
-                    with self.app.app_context():
-                        st_model_name = current_app.config.get('SENTENCE_TRANSFORMER_MODEL', 'paraphrase-multilingual-MiniLM-L12-v2')
-                        current_app.logger.info(f"Loading Sentence Transformer: {st_model_name}")
-                
-                # Configurar dispositivo para sentence transformer
-                device_st = "cuda" if torch.cuda.is_available() else "cpu"
-                self.sentence_transformer = SentenceTransformer(st_model_name, device=device_st)
-                if self.app:
-                    with self.app.app_context():
-                        current_app.logger.info(f"Sentence Transformer loaded successfully on {device_st}")
-            except Exception as e:
-                if self.app:
-                    with self.app.app_context():
-                        current_app.logger.warning(f"Failed to load Sentence Transformer: {e}")
-                # Continuar sin sentence transformer
+            backend = model_pool.acquire(whisper_key, load_asr)
+            self.whisper_model_name = model_name
+            with self._lock:
+                self.tasks[task_id]['model_keys'].append(whisper_key)
+            self._record_asr_metadata(task_id, model_name, backend.memory_footprint())
+            current_app.logger.info(f"{self.asr_backend} model '{model_name}' ready on {device}")
+        except Exception as e:
+            current_app.logger.warning(f"Failed to load {self.asr_backend}: {e}")
+            return False
+        
+        # Cargar Sentence Transformer
+        try:
+            from sentence_transformers import SentenceTransformer
+            st_key = ('sentence_transformer', st_model_name, device)
             
-            self._models_loaded = True
-            return True
+            def load_sentence_transformer():
+                current_app.logger.info(f"Loading Sentence Transformer: {st_model_name} on {device}")
+                return SentenceTransformer(st_model_name, device=device)
             
-        except ImportError as e:
-            if self.app:
-                with self.app.app_context():
-                    current_app.logger.warning(f"AI libraries not available: {e}")
-            return False
+            model_pool.acquire(st_key, load_sentence_transformer)
+            self.sentence_transformer_name = st_model_name
+            with self._lock:
+                self.tasks[task_id]['model_keys'].append(st_key)
+            current_app.logger.info(f"Sentence Transformer ready on {device}")
         except Exception as e:
-            if self.app:
-                with self.app.app_context():
-                    current_app.logger.error(f"Error loading AI models: {e}")
-            self._cleanup_memory()
+            current_app.logger.warning(f"Failed to load Sentence Transformer: {e}")
+            self.sentence_transformer_name = None
+            # Continuar sin sentence transformer
+        
+        return True
+    
+    def _load_ai_models_in_worker(self, task_id: str, model_name: str, st_model_name: str) -> bool:
+        """Cargar los modelos en el worker de IA del pool de procesos (no en el proceso Flask)"""
+        try:
+            loaded = self._run_stage('app.services.stages:load_models', self.asr_backend, model_name,
+                                     self.asr_compute_type, st_model_name, affinity='ai', task_id=task_id,
+                                     timeout=current_app.config.get('MAX_PROCESSING_TIME', 3600))
+        except Exception as e:
+            current_app.logger.warning(f"Failed to load AI models in worker process: {e}")
             return False
+        
+        self.whisper_model_name = model_name
+        self.sentence_transformer_name = st_model_name if loaded['sentence_transformer'] else None
+        self._record_asr_metadata(task_id, model_name, loaded['asr_footprint'])
+        current_app.logger.info(f"AI models ready in worker process: {loaded}")
+        return True
+    
+    def _record_asr_metadata(self, task_id: str, model_name: str, footprint: int):
+        """Guardar en la tarea qué motor ASR se usa y cuánta memoria ocupa"""
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if task is not None and 'metadata' in task:
+                task['metadata']['asr'] = {
+                    'backend': self.asr_backend,
+                    'model': model_name,
+                    'compute_type': self.asr_compute_type,
+                    'footprint_mb': round(footprint / 1024 ** 2, 1)
+                }
+    
+    def _asr_label(self) -> str:
+        """Identificador del motor y modelo ASR (clave de la caché de transcripciones)"""
+        return f"{self.asr_backend}/{self.whisper_model_name}/{self.asr_compute_type}"
     
     def start_sync_task(self, task_id: str, original_path: str, dubbed_path: str, 
-                       custom_filename: str = '', custom_name: str = '', source_type: str = 'local'):
-        """Iniciar tarea de sincronización de forma asíncrona
+                       custom_filename: str = '', custom_name: str = '', source_type: str = 'local',
+                       priority: int = 0):
+        """Encolar tarea de sincronización para procesarla de forma asíncrona
         
         CORREGIDO: Acepta tanto custom_filename como custom_name para compatibilidad
         """
@@ -198,9 +422,10 @@ class SyncService:
         with self._lock:
             self.tasks[task_id] = {
                 'id': task_id,
-                'status': 'processing',
+                'status': 'queued',
                 'progress': 0,
-                'message': 'Iniciando procesamiento...',
+                'message': 'En cola de procesamiento...',
+                'priority': priority,
                 'original_path': original_path,
                 'dubbed_path': dubbed_path,
                 'custom_filename': final_custom_name,  # Mantener nombre original del campo
@@ -209,13 +434,158 @@ class SyncService:
                 'result_path': None,
                 'created_at': datetime.now().isoformat(),
                 'error': None,
-                'temp_files': []
+                'metadata': {},
+                'temp_files': [],
+                'cache_keys': [],
+                'model_keys': [],
+                'branches': {},
+                'cancel_event': threading.Event(),
+                'processes': []
             }
+            checkpoint_store.create(self.tasks[task_id])
+        
+        # Los workers del planificador la ejecutarán con contexto de aplicación
+        scheduler.submit(task_id, priority)
+        self._publish_task(task_id)
+    
+    def _restore_task(self, record: Dict) -> Dict:
+        """Reconstruir en memoria una tarea a partir de su checkpoint"""
+        failed = record.get('status') == 'failed'
+        task = {
+            'id': record['id'],
+            'status': 'error' if failed else 'queued',
+            'progress': 0,
+            'message': f"Error: {record.get('error')}" if failed else 'Reanudando desde el último checkpoint...',
+            'priority': record.get('priority') or 0,
+            'original_path': record['original_path'],
+            'dubbed_path': record['dubbed_path'],
+            'custom_filename': record.get('custom_name') or '',
+            'custom_name': record.get('custom_name') or '',
+            'source_type': record.get('source_type') or 'local',
+            'result_path': None,
+            'created_at': record.get('created_at') or datetime.now().isoformat(),
+            'error': record.get('error') if failed else None,
+            'metadata': record.get('metadata') or {},
+            'temp_files': [],
+            'cache_keys': [],
+            'model_keys': [],
+            'branches': {},
+            'cancel_event': threading.Event(),
+            'processes': []
+        }
+        with self._lock:
+            self.tasks[task['id']] = task
+        return task
+    
+    def _checkpoint_retention(self) -> float:
+        """Segundos que un checkpoint fallido sigue disponible para reintentarlo"""
+        return self.app.config.get('TASK_RETENTION_HOURS', 24) * 3600
+    
+    def _purge_checkpoints(self):
+        """Con AUTO_CLEANUP, borrar los checkpoints fallidos caducados y sus artefactos"""
+        if not self.app.config.get('AUTO_CLEANUP', True):
+            return
+        try:
+            purged = checkpoint_store.purge_failed(self._checkpoint_retention())
+            if purged:
+                self.app.logger.info(f"Purged {purged} expired failed checkpoints")
+        except Exception as e:
+            self.app.logger.warning(f"Checkpoint cleanup failed: {e}")
+    
+    def _restore_checkpointed_tasks(self):
+        """Al arrancar, volver a encolar las tareas interrumpidas
+        
+        Las fallidas solo se recuperan (en error, a la espera de un reintento) mientras no
+        superen la retención de TASK_RETENTION_HOURS; con AUTO_CLEANUP las caducadas se borran.
+        """
+        self._purge_checkpoints()
+        retention = self._checkpoint_retention()
+        resumed = 0
+        for record in checkpoint_store.list():
+            if record['id'] in self.tasks or checkpoint_store.expired(record, retention):
+                continue
+            task = self._restore_task(record)
+            if task['status'] == 'queued':
+                scheduler.submit(task['id'], task['priority'])
+                resumed += 1
+        if resumed:
+            self.app.logger.info(f"Resumed {resumed} interrupted tasks from checkpoints")
+    
+    def retry_task(self, task_id: str) -> Optional[Dict]:
+        """Reencolar una tarea fallida: las etapas con checkpoint no se repiten
+        
+        Devuelve None si la tarea no existe; lanza una excepción si no está en error.
+        """
+        with self._lock:
+            task = self.tasks.get(task_id)
+        if task is None:
+            record = checkpoint_store.load(task_id)
+            if record is None or checkpoint_store.expired(record, self._checkpoint_retention()):
+                return None
+            task = self._restore_task(record)
+        
+        with self._lock:
+            if task['status'] != 'error':
+                raise Exception("Solo se pueden reintentar tareas con error")
+            task.update({
+                'status': 'queued',
+                'progress': 0,
+                'message': 'Reintento en cola de procesamiento...',
+                'error': None,
+                'result_path': None,
+                'stage': None,
+                'temp_files': [],
+                'cache_keys': [],
+                'model_keys': [],
+                'branches': {},
+                'cancel_event': threading.Event(),
+                'processes': []
+            })
+        if checkpoint_store.load(task_id) is None:
+            # Checkpoint ya purgado: el reintento empieza de cero pero vuelve a guardar sus etapas
+            checkpoint_store.create(task)
+        checkpoint_store.mark_pending(task_id)
+        scheduler.submit(task_id, task['priority'])
+        self._publish_task(task_id)
         
-        # Ejecutar en hilo separado con contexto de aplicación
-        thread = threading.Thread(target=self._process_with_context, args=(task_id,))
-        thread.daemon = True
-        thread.start()
+        record = checkpoint_store.load(task_id) or {}
+        return {'task_id': task_id, 'status': 'queued', 'completed_stages': list(record.get('stages', {}))}
+    
+    def cancel_task(self, task_id: str) -> Optional[Dict]:
+        """Cancelar una tarea en cola o en curso
+        
+        En cola se retira sin ocupar worker. En curso se activa su evento de cancelación,
+        se terminan sus procesos FFmpeg y las etapas del pool de procesos; la transcripción
+        se detiene en la siguiente frontera de fragmento. Devuelve None si no existe y
+        lanza una excepción si ya terminó.
+        """
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                return None
+            if task['status'] not in ('queued', 'processing'):
+                raise Exception(f"La tarea ya ha terminado (estado: {task['status']})")
+            task['cancel_event'].set()
+            processes = list(task['processes'])
+        
+        if scheduler.remove(task_id):
+            # No había empezado: no hay nada que detener
+            with self._lock:
+                task.update({'status': 'cancelled', 'message': 'Tarea cancelada'})
+            self._publish_task(task_id)
+            self._publish_queue()
+            self._save_task_to_db(task_id)
+            checkpoint_store.discard(task_id)
+            return {'task_id': task_id, 'status': 'cancelled'}
+        
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        with self._lock:
+            task['message'] = 'Cancelando tarea...'
+        self._publish_task(task_id)
+        current_app.logger.info(f"Cancelling task {task_id} ({len(processes)} running processes)")
+        return {'task_id': task_id, 'status': 'cancelling'}
     
     def _process_with_context(self, task_id: str):
         """Procesar tarea con contexto de aplicación Flask"""
@@ -239,7 +609,7 @@ class SyncService:
             sync_task.progress = task['progress']
             sync_task.message = task['message']
             sync_task.created_at = datetime.fromisoformat(task['created_at']) if isinstance(task['created_at'], str) else task['created_at']
-            sync_task.finished_at = datetime.utcnow() if task['status'] in ['completed', 'error', 'failed'] else None
+            sync_task.finished_at = datetime.utcnow() if task['status'] in ['completed', 'error', 'failed', 'cancelled'] else None
             sync_task.original_path = task.get('original_path')
             sync_task.dubbed_path = task.get('dubbed_path')
             sync_task.result_path = task.get('result_path')
@@ -255,7 +625,9 @@ class SyncService:
             current_app.logger.info(f"Starting sync task: {task_id}")
             
             # Verificar archivos de entrada
+            self._check_cancelled(task_id)  # cancelada justo al salir de la cola
             self._update_task_status(task_id, 'processing', 5, "Verificando archivos de entrada...")
+            self._publish_queue()
             task = self.tasks[task_id]
             original_path = task['original_path']
             dubbed_path = task['dubbed_path']
@@ -279,40 +651,31 @@ class SyncService:
             if not self._check_memory_usage():
                 self._cleanup_memory()
             
-            # Extraer audio de ambos videos
-            self._update_task_status(task_id, 'processing', 15, "Extrayendo audio del video original...")
-            original_audio = self._extract_audio_optimized(original_path, task_id, "original")
-            
-            self._update_task_status(task_id, 'processing', 25, "Extrayendo audio del video doblado...")
-            dubbed_audio = self._extract_audio_optimized(dubbed_path, task_id, "dubbed")
-            
-            # Cargar modelos IA de forma segura
-            self._update_task_status(task_id, 'processing', 35, "Preparando modelos de IA...")
-            ai_available = self._load_ai_models_safe()
-            
-            if ai_available:
-                # Transcribir audios con IA
-                self._update_task_status(task_id, 'processing', 45, "Transcribiendo audio original...")
-                original_segments = self._transcribe_audio_safe(original_audio, task_id)
-                
-                self._update_task_status(task_id, 'processing', 60, "Transcribiendo audio doblado...")
-                dubbed_segments = self._transcribe_audio_safe(dubbed_audio, task_id)
-                
-                # Calcular offset con análisis semántico
-                self._update_task_status(task_id, 'processing', 75, "Calculando sincronización...")
-                time_offset = self._calculate_sync_offset_safe(original_segments, dubbed_segments)
-            else:
-                # Modo fallback sin IA
-                self._update_task_status(task_id, 'processing', 60, "Usando modo de compatibilidad...")
-                time_offset = self._calculate_simple_offset_from_audio(original_audio, dubbed_audio)
+            # Cada etapa guarda su resultado: un reinicio o reintento continúa desde la última completada
+            analysis = self._checkpoint_stage(
+                task_id, 'offset_map', lambda: self._analyze_offsets(task_id, original_path, dubbed_path),
+                required=('original_audio', 'dubbed_audio')
+            )
+            offset_map = OffsetMap.from_dict(analysis['offset_map'])
+            original_audio = analysis['original_audio']
+            with self._lock:
+                self.tasks[task_id]['offset_map'] = analysis['offset_map']
             
             # Aplicar sincronización
             self._update_task_status(task_id, 'processing', 85, "Aplicando sincronización...")
-            synced_audio = self._apply_sync_offset(dubbed_audio, time_offset, task_id)
+            render = self._checkpoint_stage(
+                task_id, 'render',
+                lambda: self._render_synced_audio(task_id, offset_map, original_audio,
+                                                  analysis['dubbed_audio'], dubbed_path),
+                required=('synced_audio',)
+            )
+            synced_audio, shift = render['synced_audio'], render['shift']
             
             # Generar archivo MKV final
             self._update_task_status(task_id, 'processing', 95, "Generando archivo MKV final...")
-            result_path = self._generate_mkv_final(original_path, original_audio, synced_audio, task_id)
+            with self._lock:
+                self.tasks[task_id]['stage'] = 'mux'
+            result_path = self._generate_mkv_final(original_path, original_audio, synced_audio, task_id, shift=shift)
             
             # Completar tarea
             with self._lock:
@@ -320,47 +683,328 @@ class SyncService:
                 self.tasks[task_id]['status'] = 'completed'
                 self.tasks[task_id]['progress'] = 100
                 self.tasks[task_id]['message'] = '¡Sincronización completada exitosamente!'
+            self._publish_task(task_id)
             self._save_task_to_db(task_id)
+            checkpoint_store.discard(task_id)
             current_app.logger.info(f"Task completed successfully: {task_id}")
             
         except Exception as e:
+            if self.tasks[task_id]['cancel_event'].is_set():
+                current_app.logger.info(f"Task cancelled: {task_id}")
+                self._update_task_status(task_id, 'cancelled', self.tasks[task_id]['progress'], 'Tarea cancelada')
+                self._save_task_to_db(task_id)
+                checkpoint_store.discard(task_id)
+                return
             current_app.logger.error(f"Error processing task {task_id}: {str(e)}")
             self._update_task_error(task_id, f"Error en el procesamiento: {str(e)}")
+            # Antes que la BBDD: si guardar falla, el checkpoint no debe quedar como interrumpido
+            checkpoint_store.mark_failed(task_id, self.tasks[task_id].get('stage'), str(e))
             self._save_task_to_db(task_id)
+            self._purge_checkpoints()
         finally:
-            # Limpiar archivos temporales y memoria
+            # Limpiar archivos temporales y memoria (los modelos quedan calientes en el pool)
             self._cleanup_task_files(task_id)
+            self._release_task_models(task_id)
             self._cleanup_memory()
     
-    def _extract_audio_optimized(self, video_path: str, task_id: str, prefix: str) -> str:
-        """Extraer audio de forma optimizada para archivos grandes"""
-        try:
-            temp_dir = tempfile.gettempdir()
-            audio_path = os.path.join(temp_dir, f"{prefix}_{task_id}.wav")
-            
-            # Comando FFmpeg optimizado para archivos grandes
-            cmd = [
-                'ffmpeg', '-i', video_path,
-                '-vn',  # Sin video
-                '-acodec', 'pcm_s16le',  # Codec de audio
-                '-ar', '16000',  # Sample rate
-                '-ac', '1',  # Mono
-                '-map_metadata', '-1',  # Sin metadatos
-                '-fflags', '+bitexact',  # Reproducible
-                '-threads', '0',  # Usar todos los cores disponibles
-                '-y',  # Sobrescribir
-                audio_path
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=1800)  # 30 min timeout
-            if result.returncode != 0:
-                raise Exception(f"Error extrayendo audio: {result.stderr}")
+    def _checkpoint_stage(self, task_id: str, stage: str, compute: Callable[[], Dict],
+                          required: Tuple[str, ...] = ()) -> Dict:
+        """Ejecutar una etapa o recuperar su resultado del checkpoint
+        
+        ``required`` son las claves del resultado con rutas de artefactos que deben seguir
+        existiendo para reutilizarlo (p. ej. un WAV que la caché de audio ya expulsó).
+        """
+        data = checkpoint_store.get_stage(task_id, stage)
+        if data is not None and all(os.path.exists(data[key]) for key in required):
+            current_app.logger.info(f"Task {task_id}: stage '{stage}' restored from checkpoint")
+            return data
+        
+        with self._lock:
+            previous = self.tasks[task_id].get('stage')
+            self.tasks[task_id]['stage'] = stage
+        data = compute()
+        # Las etapas que degradan ante errores podrían devolver un resultado a medias tras cancelar
+        self._check_cancelled(task_id)
+        with self._lock:
+            # Si compute() falla, 'stage' queda en la etapa interna que falló
+            self.tasks[task_id]['stage'] = previous
+            metadata = dict(self.tasks[task_id]['metadata'])
+        checkpoint_store.save_stage(task_id, stage, data, metadata=metadata)
+        return data
+    
+    def _analyze_offsets(self, task_id: str, original_path: str, dubbed_path: str) -> Dict:
+        """Etapas de análisis hasta el mapa de offsets: ventanas, extracción, correlación y transcripción"""
+        xcorr_enabled = current_app.config.get('XCORR_ENABLED', True)
+        threshold = current_app.config.get('XCORR_CONFIDENCE_THRESHOLD', 0.4)
+        
+        if xcorr_enabled and current_app.config.get('ANALYSIS_WINDOWS', 8) > 0:
+            # Vía más rápida: correlar solo unas ventanas de cada contenedor, sin extracción completa
+            self._update_task_status(task_id, 'processing', 10, "Analizando ventanas de audio...")
+            windows = self._checkpoint_stage(task_id, 'windows', lambda: dict(zip(
+                ('offset', 'confidence', 'consistent'),
+                self._calculate_offset_windows(original_path, dubbed_path, task_id)
+            )))
+            # Un offset global solo si todas las ventanas fiables coinciden (un cambio de rollo no)
+            if windows['confidence'] >= threshold and windows.get('consistent', False):
+                current_app.logger.info("High-confidence cross-correlation, skipping transcription")
+                # Las etapas siguientes leen el audio directamente de los videos
+                return {'offset_map': OffsetMap.constant(windows['offset']).to_dict(),
+                        'original_audio': original_path, 'dubbed_audio': dubbed_path}
+        
+        if xcorr_enabled:
+            # Las ventanas no coinciden: extraer ambas pistas completas en paralelo y
+            # transcribir solo si la correlación completa tampoco basta
+            tracks = self._checkpoint_stage(
+                task_id, 'extract', lambda: self._extract_tracks(task_id, original_path, dubbed_path),
+                required=('original_audio', 'dubbed_audio')
+            )
+            original_audio, dubbed_audio = tracks['original_audio'], tracks['dubbed_audio']
+            
+            # Vía rápida: correlación cruzada cuando ambas pistas comparten la banda M&E
+            self._update_task_status(task_id, 'processing', 30, "Correlacionando pistas de audio...")
+            xcorr = self._checkpoint_stage(task_id, 'xcorr', lambda: dict(zip(
+                ('offset', 'confidence', 'consistent'),
+                self._calculate_offset_xcorr(original_audio, dubbed_audio, task_id)
+            )))
+            if xcorr['confidence'] >= threshold and xcorr.get('consistent', False):
+                current_app.logger.info("High-confidence cross-correlation, skipping transcription")
+                return {'offset_map': OffsetMap.constant(xcorr['offset']).to_dict(),
+                        'original_audio': original_audio, 'dubbed_audio': dubbed_audio}
             
-            # Agregar a archivos temporales
+            self._update_task_status(task_id, 'processing', 35, "Preparando modelos de IA...")
+            transcripts = self._checkpoint_stage(
+                task_id, 'transcribe',
+                lambda: self._transcription_stage(task_id, original_audio, dubbed_audio, extract=False),
+                required=('original_audio', 'dubbed_audio')
+            )
+        else:
+            # DAG completo: modelos, extracción y transcripción de cada pista en paralelo
+            transcripts = self._checkpoint_stage(
+                task_id, 'transcribe',
+                lambda: self._transcription_stage(task_id, original_path, dubbed_path, extract=True),
+                required=('original_audio', 'dubbed_audio')
+            )
+        
+        original_audio, dubbed_audio = transcripts['original_audio'], transcripts['dubbed_audio']
+        with self._lock:
+            self.tasks[task_id].setdefault('speech_regions', {}).update(transcripts['speech_regions'])
+        
+        if transcripts['available']:
+            # Calcular mapa de offsets con alineamiento semántico
+            self._update_task_status(task_id, 'processing', 75, "Calculando sincronización...")
+            if not self.sentence_transformer_name:
+                # Reanudación tras un reinicio: la transcripción viene del checkpoint
+                self._load_ai_models_safe(task_id)
+            offset_map = self._calculate_offset_map_safe(
+                [AudioSegment(**segment) for segment in transcripts['original']],
+                [AudioSegment(**segment) for segment in transcripts['dubbed']],
+                task_id
+            )
+        else:
+            # Modo fallback sin IA
+            self._update_task_status(task_id, 'processing', 60, "Usando modo de compatibilidad...")
+            offset_map = OffsetMap.constant(
+                self._calculate_simple_offset_from_audio(original_audio, dubbed_audio, task_id)
+            )
+        return {'offset_map': offset_map.to_dict(), 'original_audio': original_audio, 'dubbed_audio': dubbed_audio}
+    
+    def _extract_tracks(self, task_id: str, original_path: str, dubbed_path: str) -> Dict:
+        """Etapa 'extract': fuentes de audio de ambas pistas (WAV de la caché o el propio video)"""
+        (original_audio, _), (dubbed_audio, _) = self._run_track_branches(
+            task_id, original_path, dubbed_path, transcribe=False, window=(10, 30)
+        )
+        return {'original_audio': original_audio, 'dubbed_audio': dubbed_audio}
+    
+    def _transcription_stage(self, task_id: str, original: str, dubbed: str, extract: bool) -> Dict:
+        """Etapa 'transcribe': segmentos de ambas pistas (extrayendo antes el audio si ``extract``)"""
+        original_segments = dubbed_segments = None
+        if extract:
+            (original_audio, original_segments), (dubbed_audio, dubbed_segments) = self._run_track_branches(
+                task_id, original, dubbed, transcribe=True, window=(10, 75)
+            )
+            available = original_segments is not None
+        else:
+            original_audio, dubbed_audio = original, dubbed
+            available = self._load_ai_models_safe(task_id)
+            if available:
+                original_segments, dubbed_segments = self._transcribe_tracks(
+                    task_id, original_audio, dubbed_audio, window=(40, 75)
+                )
+        
+        with self._lock:
+            speech = dict(self.tasks[task_id].get('speech_regions', {}))
+        return {
+            'original_audio': original_audio,
+            'dubbed_audio': dubbed_audio,
+            'available': available,
+            'original': [segment.to_dict() for segment in original_segments] if available else None,
+            'dubbed': [segment.to_dict() for segment in dubbed_segments] if available else None,
+            'speech_regions': speech
+        }
+    
+    def _render_synced_audio(self, task_id: str, offset_map: OffsetMap, original_audio: str,
+                             dubbed_audio: str, dubbed_path: str) -> Dict:
+        """Etapa 'render': pista doblada sincronizada (o desfase a aplicar al multiplexar)"""
+        copy_mux = current_app.config.get('MUX_AUDIO_MODE', 'copy') == 'copy'
+        if (copy_mux and offset_map.is_global and
+                current_app.config.get('OFFSET_APPLY_MODE', 'timestamp') == 'timestamp'):
+            # Sin decodificar: el desfase se aplica a las marcas de tiempo al multiplexar
+            return {'synced_audio': dubbed_path, 'shift': offset_map.global_offset}
+        
+        synced_audio = self._apply_sync_offset(
+            dubbed_audio, offset_map, task_id,
+            total_duration=source_duration(original_audio),
+            native_source=dubbed_path if copy_mux else None
+        )
+        if checkpoint_store.enabled:
+            # El renderizado sobrevive a la limpieza de temporales hasta que la tarea termine
             with self._lock:
-                self.tasks[task_id]['temp_files'].append(audio_path)
+                self.tasks[task_id]['temp_files'].remove(synced_audio)
+            synced_audio = checkpoint_store.keep(task_id, synced_audio)
+        return {'synced_audio': synced_audio, 'shift': None}
+    
+    def _in_app_context(self, func, *args, **kwargs):
+        """Ejecutar ``func`` en un hilo auxiliar con contexto de aplicación Flask"""
+        with self.app.app_context():
+            return func(*args, **kwargs)
+    
+    def _update_branch_status(self, task_id: str, branch: str, fraction: float, message: str):
+        """Actualizar el avance de una rama (pista) y recalcular el progreso global de la tarea
+        
+        El progreso global es la media de las ramas dentro de la ventana ``branch_window``
+        y el mensaje resume el estado de todas ellas.
+        """
+        labels = {'original': 'Original', 'dubbed': 'Doblado'}
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if not task:
+                return
+            task['branches'][branch] = {'progress': round(fraction * 100), 'message': message}
+            start, end = task.get('branch_window', (10, 75))
+            done = sum(b['progress'] for b in task['branches'].values()) / (100 * len(task['branches']))
+            task['progress'] = max(task['progress'], int(start + (end - start) * done))
+            task['message'] = ' · '.join(
+                f"{labels.get(name, name)}: {b['message']}" for name, b in task['branches'].items()
+            )
+        self._publish_task(task_id)
+    
+    def _prepare_track(self, task_id: str, video_path: str, prefix: str,
+                       models_future: Optional[Future]) -> Tuple[str, Optional[List[AudioSegment]]]:
+        """Rama de una pista: extraer audio y, si hay modelos, transcribir en cuanto termina"""
+        self._update_branch_status(task_id, prefix, 0.0, "extrayendo audio...")
+        span = 1.0 if models_future is None else 0.3  # parte de la rama que ocupa la extracción
+        
+        def progress(fraction: Optional[float], info: Dict):
+            self._update_branch_status(task_id, prefix, span * (fraction or 0.0),
+                                       self._progress_message("extrayendo audio", fraction, info))
+        
+        audio_path = self._extract_audio_optimized(video_path, task_id, prefix, progress=progress)
+        
+        if models_future is None:
+            self._update_branch_status(task_id, prefix, 1.0, "audio extraído")
+            return audio_path, None
+        
+        self._update_branch_status(task_id, prefix, 0.3, "audio extraído, esperando modelos de IA...")
+        if not models_future.result():
+            self._update_branch_status(task_id, prefix, 1.0, "audio extraído (sin IA)")
+            return audio_path, None
+        
+        return audio_path, self._transcribe_track(task_id, audio_path, prefix, start=0.3)
+    
+    def _transcribe_track(self, task_id: str, audio_path: str, prefix: str,
+                          start: float = 0.0) -> List[AudioSegment]:
+        """Transcribir una pista informando del avance de su rama"""
+        speech = None
+        if current_app.config.get('VAD_ENABLED', True):
+            self._update_branch_status(task_id, prefix, start, "detectando voz...")
+            speech = self._detect_speech(audio_path, task_id, prefix)
+        self._update_branch_status(task_id, prefix, start, "transcribiendo...")
+        
+        def progress(done: int, total: int):
+            self._update_branch_status(task_id, prefix, start + (1.0 - start) * done / total,
+                                       f"transcribiendo ({done}/{total} fragmentos)...")
+        
+        segments = self._transcribe_audio_safe(audio_path, task_id, progress=progress, speech=speech)
+        self._update_branch_status(task_id, prefix, 1.0, f"{len(segments)} segmentos")
+        return segments
+    
+    def _run_track_branches(self, task_id: str, original_path: str, dubbed_path: str,
+                            transcribe: bool, window: Tuple[int, int]):
+        """Ejecutar las ramas de ambas pistas en paralelo (DAG pequeño)
+        
+        extract(original) ─┐                ┌─ transcribe(original)
+        extract(dubbed)  ──┼─ load_models ──┴─ transcribe(dubbed)
+        
+        Cada transcripción arranca en cuanto su extracción y la carga de modelos terminan;
+        los límites de ``scheduler.stage`` siguen acotando la concurrencia global.
+        """
+        with self._lock:
+            self.tasks[task_id]['branches'] = {}
+            self.tasks[task_id]['branch_window'] = window
+        
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix=f'task-{task_id[:8]}') as executor:
+            models_future = None
+            if transcribe:
+                models_future = executor.submit(self._in_app_context, self._load_ai_models_safe, task_id)
+            original_future = executor.submit(self._in_app_context, self._prepare_track,
+                                              task_id, original_path, 'original', models_future)
+            dubbed_future = executor.submit(self._in_app_context, self._prepare_track,
+                                            task_id, dubbed_path, 'dubbed', models_future)
+            return original_future.result(), dubbed_future.result()
+    
+    def _transcribe_tracks(self, task_id: str, original_audio: str, dubbed_audio: str,
+                           window: Tuple[int, int]) -> Tuple[List[AudioSegment], List[AudioSegment]]:
+        """Transcribir ambas pistas en paralelo (audio ya extraído)"""
+        with self._lock:
+            self.tasks[task_id]['branches'] = {}
+            self.tasks[task_id]['branch_window'] = window
+        
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix=f'task-{task_id[:8]}') as executor:
+            original_future = executor.submit(self._in_app_context, self._transcribe_track,
+                                              task_id, original_audio, 'original')
+            dubbed_future = executor.submit(self._in_app_context, self._transcribe_track,
+                                            task_id, dubbed_audio, 'dubbed')
+            return original_future.result(), dubbed_future.result()
+    
+    def _extract_audio_optimized(self, video_path: str, task_id: str, prefix: str,
+                                 progress: Optional[Callable[[Optional[float], Dict], None]] = None) -> str:
+        """Obtener la fuente de audio de un video: WAV en la caché por huella o WAV de la tarea
+        
+        Sin caché el contenedor se decodifica una sola vez a un WAV temporal en
+        ``WORK_FOLDER`` que todas las etapas (correlación, VAD, transcripción) leen en
+        memmap, en lugar de que cada una vuelva a leer el video completo.
+        """
+        try:
+            if not audio_cache.enabled:
+                audio_path = self._materialize_wav(video_path, task_id, prefix, folder=self.work_folder,
+                                                   progress=progress)
+                current_app.logger.info(f"Audio decoded once for {prefix}: {audio_path}")
+                return audio_path
+            
+            key = audio_cache.key_for(video_path, sample_rate=16000, channels=1)
+            with audio_cache.key_lock(key):
+                audio_cache.pin(key)
+                with self._lock:
+                    self.tasks[task_id]['cache_keys'].append(key)
+                
+                audio_path = audio_cache.get(key)
+                if audio_path:
+                    current_app.logger.info(f"Audio cache hit for {prefix}: {audio_path}")
+                else:
+                    temp_path = audio_cache.temp_path_for(key)
+                    try:
+                        with scheduler.stage('extract', self._cancel_event(task_id)):
+                            self._run_audio_extraction(video_path, temp_path, task_id=task_id,
+                                                       label=f'extract_{prefix}', progress=progress)
+                    except Exception:
+                        if os.path.exists(temp_path):
+                            os.remove(temp_path)
+                        raise
+                    audio_path = audio_cache.commit(key, temp_path)
+                    current_app.logger.info(f"Audio extracted and cached: {audio_path}")
             
-            current_app.logger.info(f"Audio extracted successfully: {audio_path}")
+            with self._lock:
+                self.tasks[task_id]['metadata']['audio_cache'] = audio_cache.stats()
             return audio_path
             
         except subprocess.TimeoutExpired:
@@ -368,10 +1012,44 @@ class SyncService:
         except Exception as e:
             raise Exception(f"Error extrayendo audio: {str(e)}")
     
-    def _transcribe_audio_safe(self, audio_path: str, task_id: str) -> List[AudioSegment]:
-        """Transcribir audio de forma segura con manejo de memoria y archivos grandes"""
+    def _materialize_wav(self, source: str, task_id: str, prefix: str,
+                         sample_rate: Optional[int] = 16000, channels: Optional[int] = 1,
+                         sample_width: Optional[int] = 2, folder: Optional[Path] = None,
+                         progress: Optional[Callable[[Optional[float], Dict], None]] = None) -> str:
+        """Escribir la fuente a un WAV temporal (en ``folder`` o /tmp) solo cuando una etapa necesita acceso aleatorio"""
+        if is_wav(source):
+            return source
+        
+        audio_path = os.path.join(folder or tempfile.gettempdir(), f"{prefix}_{task_id}.wav")
+        with self._lock:
+            self.tasks[task_id]['temp_files'].append(audio_path)
+        with scheduler.stage('extract', self._cancel_event(task_id)):
+            self._run_audio_extraction(source, audio_path, sample_rate, channels, sample_width, task_id=task_id,
+                                       label=f'extract_{prefix}', progress=progress)
+        return audio_path
+    
+    def _run_audio_extraction(self, video_path: str, audio_path: str,
+                              sample_rate: Optional[int] = 16000, channels: Optional[int] = 1,
+                              sample_width: Optional[int] = 2, task_id: Optional[str] = None,
+                              label: str = 'extract',
+                              progress: Optional[Callable[[Optional[float], Dict], None]] = None):
+        """Extraer audio PCM, por defecto 16 kHz mono de 16 bits (etapa 'extract')"""
+        stats = self._run_stage('app.services.stages:extract_audio', video_path, audio_path,
+                                sample_rate=sample_rate, channels=channels, sample_width=sample_width, inline=True,
+                                timeout=self.stage_timeout, task_id=task_id, progress=progress)
+        if task_id:
+            self._record_ffmpeg_stats(task_id, label, stats)
+    
+    def _transcribe_audio_safe(self, audio_path: str, task_id: str,
+                               progress: Optional[Callable[[int, int], None]] = None,
+                               speech: Optional[List[Tuple[float, float]]] = None) -> List[AudioSegment]:
+        """Transcribir audio de forma segura con manejo de memoria y archivos grandes
+        
+        ``progress(hechos, total)`` se llama al terminar cada fragmento; con ``speech``
+        (tramos de voz del VAD) solo se transcriben esos tramos.
+        """
         try:
-            if not self.whisper_model:
+            if not self.whisper_model_name:
                 return self._create_fallback_segments(audio_path)
             
             # Verificar memoria antes de transcribir
@@ -379,27 +1057,40 @@ class SyncService:
                 current_app.logger.warning("Insufficient memory for transcription, using fallback")
                 return self._create_fallback_segments(audio_path)
             
-            # Transcribir con configuración optimizada para archivos grandes
-            result = self.whisper_model.transcribe(
-                audio_path,
-                word_timestamps=False,  # Reducir uso de memoria
-                language=None,  # Auto-detectar idioma
-                verbose=False,
-                temperature=0.0,  # Determinístico
-                beam_size=1,  # Reducir complejidad
-                best_of=1,  # Reducir complejidad
-                patience=1.0
-            )
+            # Configuración optimizada para archivos grandes
+            decode_options = {
+                'word_timestamps': False,  # Reducir uso de memoria
+                'language': self.asr_language,  # None = detectar una vez por pista (no en cada fragmento)
+                'temperature': 0.0,  # Determinístico
+                'beam_size': 1,  # Reducir complejidad
+                'best_of': 1,  # Reducir complejidad
+                'patience': 1.0
+            }
             
-            segments = []
-            for segment in result.get('segments', []):
-                audio_segment = AudioSegment(
-                    start=segment['start'],
-                    end=segment['end'],
-                    text=segment['text'],
-                    confidence=1.0
-                )
-                segments.append(audio_segment)
+            # Reutilizar transcripciones previas del mismo audio con el mismo modelo
+            cache_key = None
+            if transcript_cache.enabled:
+                cache_options = dict(decode_options, chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap,
+                                     vad=VAD_VERSION if speech is not None else None, pack_gap=PACK_GAP)
+                cache_key = transcript_cache.key_for(audio_path, self._asr_label(), cache_options)
+                cached = transcript_cache.get(cache_key)
+                if cached is not None:
+                    with self._lock:
+                        self.tasks[task_id]['metadata']['transcript_cache'] = transcript_cache.stats()
+                    current_app.logger.info(f"Transcript cache hit: {len(cached)} segments")
+                    return [AudioSegment(**segment) for segment in cached]
+            
+            if not decode_options['language']:
+                # Sin idioma fijo cada llamada a Whisper volvería a detectarlo (y podría discrepar)
+                decode_options['language'] = self._detect_language(audio_path, task_id, speech)
+            raw_segments = self._transcribe_chunks(audio_path, decode_options, progress, speech, task_id)
+            segments = [AudioSegment(**segment) for segment in raw_segments]
+            
+            # Una transcripción vacía guiada por el VAD suele ser un fallo de detección: no se cachea
+            if cache_key and (raw_segments or speech is None):
+                transcript_cache.put(cache_key, self._asr_label(), raw_segments)
+                with self._lock:
+                    self.tasks[task_id]['metadata']['transcript_cache'] = transcript_cache.stats()
             
             current_app.logger.info(f"Transcribed {len(segments)} segments")
             return segments
@@ -408,13 +1099,185 @@ class SyncService:
             current_app.logger.warning(f"Transcription failed: {e}, using fallback")
             return self._create_fallback_segments(audio_path)
     
+    def _detect_speech(self, audio_path: str, task_id: str, prefix: str) -> Optional[List[Tuple[float, float]]]:
+        """Detectar los tramos de voz de una pista (None si el VAD falla: se transcribe todo)"""
+        try:
+            started = time.time()
+            regions, duration = self._run_stage('app.services.stages:detect_speech', audio_path,
+                                                timeout=self.stage_timeout, task_id=task_id)
+            ratio = speech_ratio(regions, duration)
+            
+            with self._lock:
+                task = self.tasks[task_id]
+                task.setdefault('speech_regions', {})[prefix] = regions
+                task['metadata'].setdefault('vad', {})[prefix] = {
+                    'speech_ratio': round(ratio, 3),
+                    'regions': len(regions),
+                    'elapsed': round(time.time() - started, 3)
+                }
+            
+            current_app.logger.info(f"VAD {prefix}: {len(regions)} speech regions ({ratio:.1%} of {duration:.0f}s)")
+            if ratio < current_app.config.get('VAD_MIN_SPEECH_RATIO', 0.05):
+                # Una película casi sin voz es más probable un fallo del VAD que un dato real
+                current_app.logger.warning(f"Implausibly low speech ratio for {prefix}, transcribing the full track")
+                with self._lock:
+                    self.tasks[task_id]['speech_regions'].pop(prefix, None)
+                    self.tasks[task_id]['metadata']['vad'][prefix]['full_track'] = True
+                return None
+            return regions
+            
+        except Exception as e:
+            current_app.logger.warning(f"Voice activity detection failed: {e}")
+            return None
+    
+    def _detect_language(self, audio_path: str, task_id: str,
+                         speech: Optional[List[Tuple[float, float]]] = None) -> Optional[str]:
+        """Detectar el idioma de la pista una vez, en su primera ventana de 30 s con voz
+        
+        None si falla: cada llamada a Whisper lo detectará por su cuenta.
+        """
+        try:
+            start = self._language_window(source_duration(audio_path), speech)
+            with scheduler.stage('transcribe', self._cancel_event(task_id)) as slot:
+                language = self._run_stage(
+                    'app.services.stages:detect_language', audio_path, self.asr_backend,
+                    self.whisper_model_name, self.asr_compute_type, start=start,
+                    replica=0 if process_pool.enabled else slot,
+                    affinity='ai' if slot == 0 else f'ai-{slot}', timeout=self.stage_timeout, task_id=task_id
+                )
+            current_app.logger.info(f"Detected language '{language}' at {start:.0f}s")
+            return language
+        except TaskCancelledError:
+            raise
+        except Exception as e:
+            current_app.logger.warning(f"Language detection failed: {e}")
+            return None
+    
+    def _language_window(self, duration: float, speech: Optional[List[Tuple[float, float]]] = None) -> float:
+        """Inicio de la primera ventana con al menos media ventana de voz (o de la que más tenga)"""
+        if not speech:
+            # Sin VAD: saltar los créditos iniciales, que suelen ser música
+            return max(0.0, min(duration * 0.1, duration - WINDOW_SECONDS))
+        
+        starts = np.array([start for start, _ in speech], dtype=np.float64)
+        ends = np.array([end for _, end in speech], dtype=np.float64)
+        best_start, best_voice = float(starts[0]), -1.0
+        for start in starts:
+            voice = np.clip(np.minimum(ends, start + WINDOW_SECONDS) - np.maximum(starts, start), 0, None).sum()
+            if voice >= WINDOW_SECONDS / 2:
+                return float(start)
+            if voice > best_voice:
+                best_start, best_voice = float(start), voice
+        return best_start
+    
+    def _chunk_core(self) -> float:
+        """Zona propia de cada fragmento: con los solapes ocupa un múltiplo exacto de 30 s"""
+        span = self.chunk_size + 2 * self.chunk_overlap
+        return math.ceil(span / WINDOW_SECONDS) * WINDOW_SECONDS - 2 * self.chunk_overlap
+    
+    def _plan_chunks(self, duration: float, speech: Optional[List[Tuple[float, float]]] = None,
+                     max_gap: float = 2.0, split: bool = True) -> List[Tuple[float, float, List[Tuple[float, float]]]]:
+        """Planificar fragmentos ``(zona_inicio, zona_fin, tramos)`` en segundos
+        
+        Cada fragmento es una llamada a Whisper que ocupa como mucho un múltiplo de 30 s
+        (``_chunk_core`` más los solapes). Solo se decodifican los tramos de ``speech``
+        (todo el audio si es None): los separados por menos de ``max_gap`` se agrupan y
+        los grupos se empaquetan juntos hasta llenar el fragmento; los grupos más largos
+        se parten con ``chunk_overlap`` de solapamiento. Un fragmento es dueño de los
+        segmentos cuyo punto medio cae en su zona. Sin ``split`` (una sola réplica) la
+        pista sin VAD se transcribe en una llamada: partirla solo añadiría ventanas solapadas.
+        """
+        if speech is None and not split:
+            return [(0.0, float(duration), [(0.0, float(duration))])]
+        
+        core = self._chunk_core() if self.chunk_size > 0 else 0
+        span = core + 2 * self.chunk_overlap if core > 0 else float('inf')
+        groups: List[List[float]] = []
+        for start, end in (speech if speech is not None else [(0.0, duration)]):
+            if groups and start - groups[-1][1] <= max_gap and end - groups[-1][0] <= span:
+                groups[-1][1] = float(end)
+            else:
+                groups.append([float(start), float(end)])
+        
+        chunks = []
+        pack: List[Tuple[float, float]] = []
+        packed = 0.0
+        for start, end in groups:
+            needed = end - start + (PACK_GAP if pack else 0.0)
+            if pack and (end - start > span or packed + needed > span):
+                chunks.append((pack[0][0], pack[-1][1], pack))
+                pack, packed, needed = [], 0.0, end - start
+            if end - start <= span:
+                pack.append((start, end))
+                packed += needed
+                continue
+            for core_start in np.arange(start, end, core):
+                core_end = min(core_start + core, end)
+                core_start, core_end = float(core_start), float(core_end)
+                chunks.append((core_start, core_end, [(max(start, core_start - self.chunk_overlap),
+                                                       min(end, core_end + self.chunk_overlap))]))
+        if pack:
+            chunks.append((pack[0][0], pack[-1][1], pack))
+        return chunks
+    
+    def _transcribe_chunks(self, audio_path: str, decode_options: Dict,
+                           progress: Optional[Callable[[int, int], None]] = None,
+                           speech: Optional[List[Tuple[float, float]]] = None,
+                           task_id: Optional[str] = None) -> List[Dict]:
+        """Transcribir por fragmentos en paralelo, uno por réplica del modelo
+        
+        Los tramos partidos se decodifican con ``chunk_overlap`` segundos extra a cada lado
+        y solo conservan los segmentos cuyo punto medio cae en su zona propia, de modo que
+        las frases de las costuras no se duplican ni se pierden. Con ``speech`` (VAD)
+        Whisper solo decodifica la voz, empaquetada en ventanas completas; la etapa
+        devuelve los tiempos ya situados en la pista original. Cancelar la tarea detiene
+        la transcripción en la siguiente frontera de fragmento.
+        """
+        duration = source_duration(audio_path)
+        replicas = scheduler.stage_limit('transcribe') or 1
+        chunks = self._plan_chunks(duration, speech, split=replicas > 1)
+        if not chunks:
+            return []
+        timeout = current_app.config.get('MAX_PROCESSING_TIME', 3600)
+        completed = []
+        completed_lock = threading.Lock()
+        
+        def run_chunk(chunk: Tuple[float, float, List[Tuple[float, float]]]) -> List[Dict]:
+            core_start, core_end, pieces = chunk
+            start, end = pieces[0][0], pieces[-1][1]
+            # La plaza de la etapa 'transcribe' identifica la réplica del modelo a usar
+            with scheduler.stage('transcribe', self._cancel_event(task_id)) as slot:
+                segments = self._run_stage(
+                    'app.services.stages:transcribe', audio_path, self.asr_backend, self.whisper_model_name,
+                    self.asr_compute_type, decode_options,
+                    pieces=pieces,
+                    # Cada worker del pool ejecuta una llamada a la vez: basta con una réplica por proceso
+                    replica=0 if process_pool.enabled else slot,
+                    affinity='ai' if slot == 0 else f'ai-{slot}', timeout=timeout, task_id=task_id
+                )
+            
+            lower = core_start if core_start > start else float('-inf')
+            upper = core_end if core_end < end else float('inf')
+            kept = [seg for seg in segments if lower <= (seg['start'] + seg['end']) / 2 < upper]
+            with completed_lock:
+                completed.append(chunk)
+                done = len(completed)
+            if progress:
+                progress(done, len(chunks))
+            return kept
+        
+        workers = min(len(chunks), replicas)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='asr-chunk') as executor:
+            results = list(executor.map(run_chunk, chunks))
+        
+        current_app.logger.info(f"Transcribed {len(chunks)} chunks with {workers} model replicas")
+        return sorted((seg for part in results for seg in part), key=lambda seg: seg['start'])
+    
     def _create_fallback_segments(self, audio_path: str) -> List[AudioSegment]:
         """Crear segmentos simulados cuando la IA no está disponible"""
         try:
-            # Obtener duración del audio
-            cmd = ['ffprobe', '-v', 'quiet', '-show_entries', 'format=duration', '-of', 'csv=p=0', audio_path]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-            duration = float(result.stdout.strip()) if result.returncode == 0 else 60.0
+            # Obtener duración del audio (cabecera WAV, sin volver a sondear con ffprobe)
+            duration = source_duration(audio_path)
             
             # Crear segmentos cada 15 segundos para archivos grandes
             segments = []
@@ -430,49 +1293,157 @@ class SyncService:
         except Exception:
             return [AudioSegment(0, 60, "Audio segment")]
     
+    def _calculate_offset_windows(self, original_video: str, dubbed_video: str,
+                                  task_id: str) -> Tuple[float, float, bool]:
+        """Calcular offset correlando solo N ventanas de cada contenedor (seek con -ss/-t)
+        
+        Devuelve ``(offset, confianza, coherente)``; coherente indica que todas las
+        ventanas fiables coinciden en el mismo desfase.
+        """
+        try:
+            started = time.time()
+            offset, confidence, details = self._run_stage(
+                'app.services.stages:windowed_xcorr_analysis', original_video, dubbed_video,
+                max_offset=current_app.config.get('XCORR_MAX_OFFSET', 120.0),
+                n_windows=current_app.config.get('ANALYSIS_WINDOWS', 8),
+                window_seconds=current_app.config.get('ANALYSIS_WINDOW_SECONDS', 90.0),
+                timeout=self.stage_timeout, task_id=task_id
+            )
+            
+            with self._lock:
+                self.tasks[task_id]['metadata']['windowed_xcorr'] = {
+                    'offset': round(offset, 3),
+                    'confidence': round(confidence, 3),
+                    'consistent': details['consistent'],
+                    'windows': [
+                        {'position': w['position'], 'offset': round(w['offset'], 3), 'peak': round(w['peak'], 3)}
+                        for w in details['windows']
+                    ],
+                    'elapsed': round(time.time() - started, 3)
+                }
+            
+            current_app.logger.info(f"Windowed cross-correlation offset: {offset:.3f}s (confidence: {confidence:.3f}, "
+                                    f"consistent: {details['consistent']})")
+            return offset, confidence, details['consistent']
+            
+        except Exception as e:
+            current_app.logger.warning(f"Windowed cross-correlation failed: {e}")
+            return 0.0, 0.0, False
+    
+    def _calculate_offset_xcorr(self, original_audio: str, dubbed_audio: str,
+                                task_id: str) -> Tuple[float, float, bool]:
+        """Calcular offset por correlación cruzada de envolventes de onsets (sin ASR)"""
+        try:
+            started = time.time()
+            offset, confidence, details = self._run_stage(
+                'app.services.stages:xcorr_analysis', original_audio, dubbed_audio,
+                max_offset=current_app.config.get('XCORR_MAX_OFFSET', 120.0),
+                timeout=self.stage_timeout, task_id=task_id
+            )
+            
+            with self._lock:
+                self.tasks[task_id]['metadata']['xcorr'] = {
+                    'offset': round(offset, 3),
+                    'confidence': round(confidence, 3),
+                    'consistent': details['consistent'],
+                    'windows': len(details['windows']),
+                    'elapsed': round(time.time() - started, 3)
+                }
+            
+            current_app.logger.info(f"Cross-correlation offset: {offset:.3f}s (confidence: {confidence:.3f}, "
+                                    f"consistent: {details['consistent']})")
+            return offset, confidence, details['consistent']
+            
+        except Exception as e:
+            current_app.logger.warning(f"Cross-correlation failed: {e}")
+            return 0.0, 0.0, False
+    
+    def _calculate_offset_map_safe(self, original_segments: List[AudioSegment],
+                                   dubbed_segments: List[AudioSegment],
+                                   task_id: Optional[str] = None) -> OffsetMap:
+        """Calcular mapa de offsets por tramos siguiendo un camino monótono de anclas"""
+        try:
+            speech = self.tasks.get(task_id, {}).get('speech_regions', {}) if task_id else {}
+            orig_valid = self._filter_speech([seg for seg in original_segments if seg.text.strip()],
+                                             speech.get('original'))
+            dub_valid = self._filter_speech([seg for seg in dubbed_segments if seg.text.strip()],
+                                            speech.get('dubbed'))
+            
+            if not self.sentence_transformer_name or not orig_valid or not dub_valid:
+                return OffsetMap.constant(self._calculate_sync_offset_safe(original_segments, dubbed_segments))
+            
+            offset_map_data, anchors = self._run_stage(
+                'app.services.stages:align',
+                np.array([seg.start for seg in orig_valid]),
+                np.array([seg.end for seg in orig_valid]),
+                np.array([seg.start for seg in dub_valid]),
+                self._encode_texts([seg.text for seg in orig_valid], task_id=task_id),
+                self._encode_texts([seg.text for seg in dub_valid], task_id=task_id),
+                threshold=current_app.config.get('SIMILARITY_THRESHOLD', 0.7),
+                band=current_app.config.get('ALIGNMENT_BAND', 100),
+                tolerance=current_app.config.get('ALIGNMENT_TOLERANCE', 0.5),
+                timeout=self.stage_timeout, task_id=task_id
+            )
+            offset_map = OffsetMap.from_dict(offset_map_data)
+            
+            if task_id and embedding_cache.enabled:
+                with self._lock:
+                    self.tasks[task_id]['metadata']['embedding_cache'] = embedding_cache.stats()
+            
+            if anchors == 0:
+                current_app.logger.info("No alignment anchors found, using global semantic offset")
+                return OffsetMap.constant(self._calculate_sync_offset_safe(original_segments, dubbed_segments))
+            
+            current_app.logger.info(f"Offset map with {len(offset_map.regions)} regions from {anchors} anchors")
+            return offset_map
+            
+        except Exception as e:
+            current_app.logger.warning(f"Piecewise alignment failed: {e}")
+            return OffsetMap.constant(self._calculate_sync_offset_safe(original_segments, dubbed_segments))
+    
+    def _filter_speech(self, segments: List[AudioSegment],
+                       regions: Optional[List[Tuple[float, float]]]) -> List[AudioSegment]:
+        """Descartar segmentos que caen mayoritariamente fuera de los tramos de voz (alucinaciones)"""
+        if not regions or not segments:
+            return segments
+        
+        bounds = np.array(regions)
+        starts = np.array([seg.start for seg in segments])
+        ends = np.array([seg.end for seg in segments])
+        overlap = np.clip(np.minimum(ends[:, None], bounds[None, :, 1]) -
+                          np.maximum(starts[:, None], bounds[None, :, 0]), 0.0, None).sum(axis=1)
+        keep = overlap >= 0.5 * np.maximum(ends - starts, 1e-3)
+        return [seg for seg, kept in zip(segments, keep) if kept]
+    
     def _calculate_sync_offset_safe(self, original_segments: List[AudioSegment], 
                                    dubbed_segments: List[AudioSegment]) -> float:
         """Calcular offset de forma segura con análisis semántico optimizado"""
         try:
-            if not self.sentence_transformer or not original_segments or not dubbed_segments:
+            if not self.sentence_transformer_name or not original_segments or not dubbed_segments:
                 return self._calculate_simple_offset_segments(original_segments, dubbed_segments)
             
             # Verificar memoria
             if not self._check_memory_usage():
                 return self._calculate_simple_offset_segments(original_segments, dubbed_segments)
             
-            # Usar solo los primeros segmentos para reducir carga en archivos grandes
-            max_segments = min(20, len(original_segments), len(dubbed_segments))
-            orig_texts = [seg.text for seg in original_segments[:max_segments] if seg.text.strip()]
-            dub_texts = [seg.text for seg in dubbed_segments[:max_segments] if seg.text.strip()]
+            # Codificar cada lado una sola vez (embeddings normalizados)
+            orig_valid = [seg for seg in original_segments if seg.text.strip()]
+            dub_valid = [seg for seg in dubbed_segments if seg.text.strip()]
             
-            if not orig_texts or not dub_texts:
+            if not orig_valid or not dub_valid:
                 return 0.0
             
-            # Calcular embeddings en lotes pequeños para manejar memoria
-            batch_size = 5
+            orig_embeddings = self._encode_texts([seg.text for seg in orig_valid])
+            dub_embeddings = self._encode_texts([seg.text for seg in dub_valid])
+            
+            # Matriz completa de similitud coseno orig×dub en un único producto
+            similarity = orig_embeddings @ dub_embeddings.T
+            orig_idx, dub_idx = np.unravel_index(np.argmax(similarity), similarity.shape)
+            best_similarity = float(similarity[orig_idx, dub_idx])
             best_offset = 0.0
-            best_similarity = 0.0
             
-            for i in range(0, len(orig_texts), batch_size):
-                orig_batch = orig_texts[i:i+batch_size]
-                orig_embeddings = self.sentence_transformer.encode(orig_batch)
-                
-                for j in range(0, len(dub_texts), batch_size):
-                    dub_batch = dub_texts[j:j+batch_size]
-                    dub_embeddings = self.sentence_transformer.encode(dub_batch)
-                    
-                    # Encontrar mejor correspondencia en este lote
-                    for oi, orig_emb in enumerate(orig_embeddings):
-                        for di, dub_emb in enumerate(dub_embeddings):
-                            similarity = np.dot(orig_emb, dub_emb) / (np.linalg.norm(orig_emb) * np.linalg.norm(dub_emb))
-                            
-                            if similarity > best_similarity and similarity > 0.6:
-                                best_similarity = similarity
-                                orig_idx = i + oi
-                                dub_idx = j + di
-                                if orig_idx < len(original_segments) and dub_idx < len(dubbed_segments):
-                                    best_offset = dubbed_segments[dub_idx].start - original_segments[orig_idx].start
+            if best_similarity > 0.6:
+                best_offset = dub_valid[dub_idx].start - orig_valid[orig_idx].start
             
             current_app.logger.info(f"Calculated offset: {best_offset:.3f}s (similarity: {best_similarity:.3f})")
             return best_offset
@@ -481,6 +1452,22 @@ class SyncService:
             current_app.logger.warning(f"Semantic analysis failed: {e}")
             return self._calculate_simple_offset_segments(original_segments, dubbed_segments)
     
+    def _encode_texts(self, texts: List[str], batch_size: int = 64, task_id: Optional[str] = None) -> np.ndarray:
+        """Codificar textos en una matriz float32 de embeddings normalizados (L2)"""
+        if embedding_cache.enabled:
+            return embedding_cache.encode(
+                self.sentence_transformer_name, texts,
+                lambda missing: self._encode_uncached(missing, batch_size, task_id)
+            )
+        return self._encode_uncached(texts, batch_size, task_id)
+    
+    def _encode_uncached(self, texts: List[str], batch_size: int = 64, task_id: Optional[str] = None) -> np.ndarray:
+        """Codificar textos con el sentence transformer (sin caché)"""
+        with scheduler.stage('embed', self._cancel_event(task_id)):
+            return self._run_stage('app.services.stages:embed_texts', self.sentence_transformer_name,
+                                   texts, batch_size=batch_size, affinity='ai',
+                                   timeout=self.stage_timeout, task_id=task_id)
+    
     def _calculate_simple_offset_segments(self, original_segments: List[AudioSegment], 
                                         dubbed_segments: List[AudioSegment]) -> float:
         """Calcular offset simple basado en segmentos"""
@@ -488,63 +1475,233 @@ class SyncService:
             return 0.0
         return dubbed_segments[0].start - original_segments[0].start
     
-    def _calculate_simple_offset_from_audio(self, original_audio: str, dubbed_audio: str) -> float:
-        """Calcular offset simple comparando archivos de audio"""
+    def _calculate_simple_offset_from_audio(self, original_audio: str, dubbed_audio: str,
+                                            task_id: Optional[str] = None) -> float:
+        """Calcular offset sin IA alineando energías log-mel de ambos audios (solo CPU)"""
         try:
-            # Obtener duración de ambos audios
-            def get_duration(audio_path):
-                cmd = ['ffprobe', '-v', 'quiet', '-show_entries', 'format=duration', '-of', 'csv=p=0', audio_path]
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-                return float(result.stdout.strip()) if result.returncode == 0 else 0.0
-            
-            orig_duration = get_duration(original_audio)
-            dub_duration = get_duration(dubbed_audio)
-            
-            # Calcular offset basado en diferencia de duración
-            offset = (dub_duration - orig_duration) / 2.0
-            current_app.logger.info(f"Simple offset calculated: {offset:.3f}s")
+            started = time.time()
+            offset, quality = self._run_stage(
+                'app.services.stages:spectral_analysis', original_audio, dubbed_audio,
+                max_offset=current_app.config.get('XCORR_MAX_OFFSET', 120.0),
+                timeout=self.stage_timeout, task_id=task_id
+            )
+            
+            if task_id:
+                with self._lock:
+                    self.tasks[task_id]['metadata']['fallback'] = dict(
+                        quality, offset=round(offset, 3), elapsed=round(time.time() - started, 3)
+                    )
+            
+            if quality['score'] < 0.1:
+                current_app.logger.warning(f"Low quality signal-based offset: {offset:.3f}s ({quality})")
+            else:
+                current_app.logger.info(f"Signal-based offset calculated: {offset:.3f}s ({quality})")
             return offset
             
-        except Exception:
+        except Exception as e:
+            current_app.logger.warning(f"Signal-based offset failed: {e}")
             return 0.0
     
-    def _apply_sync_offset(self, audio_path: str, offset: float, task_id: str) -> str:
-        """Aplicar desfase temporal al audio"""
+    def _apply_sync_offset(self, audio_path: str, offset_map: OffsetMap, task_id: str,
+                           total_duration: Optional[float] = None, native_source: Optional[str] = None) -> str:
+        """Aplicar el mapa de desfases al audio doblado
+        
+        Convención: offset = inicio_doblado - inicio_original, es decir, un offset
+        positivo significa que el doblaje va retrasado y hay que adelantarlo.
+        
+        Con ``native_source`` (el video doblado) un desfase global se aplica sobre su
+        pista nativa y se codifica directamente al formato final, de modo que el
+        multiplexado solo copia flujos.
+        """
         try:
+            if offset_map.is_global and native_source:
+                return self._shift_native_audio(native_source, offset_map.global_offset, task_id, total_duration)
+            if native_source:
+                return self._render_native_audio(native_source, offset_map, task_id, total_duration)
+            
             temp_dir = tempfile.gettempdir()
             synced_audio_path = os.path.join(temp_dir, f"synced_{task_id}.wav")
+            with self._lock:
+                self.tasks[task_id]['temp_files'].append(synced_audio_path)
             
-            if abs(offset) < 0.1:  # Offset muy pequeño, copiar archivo
-                cmd = ['cp', audio_path, synced_audio_path]
-            elif offset > 0:  # Retrasar audio
+            if not offset_map.is_global:
+                # Desfase variable: renderizado por tramos en una sola pasada (requiere WAV en memmap)
+                audio_path = self._materialize_wav(audio_path, task_id, 'dubbed')
+                with scheduler.stage('render', self._cancel_event(task_id)):
+                    stats = render_offset_map(audio_path, synced_audio_path, offset_map.regions,
+                                              total_duration=total_duration,
+                                              cancel_event=self._cancel_event(task_id))
+                current_app.logger.info(f"Piecewise render: {stats['regions']} regions "
+                                        f"in {stats['elapsed']}s ({stats['speed']}x realtime)")
+                return synced_audio_path
+            
+            offset = offset_map.global_offset
+            # La fuente puede ser el WAV de la caché o el video doblado (se decodifica su primera pista)
+            output_args = ['-map', '0:a:0', '-ac', '1', '-ar', '16000', '-threads', '0', '-y', synced_audio_path]
+            if abs(offset) < 0.1 and is_wav(audio_path):  # Offset muy pequeño, copiar archivo
+                shutil.copyfile(audio_path, synced_audio_path)
+                return synced_audio_path
+            elif abs(offset) < 0.1:
+                cmd = ['ffmpeg', '-i', audio_path] + output_args
+            elif offset < 0:  # Doblaje adelantado: retrasar audio
                 cmd = [
                     'ffmpeg', '-i', audio_path,
-                    '-af', f'adelay={int(abs(offset) * 1000)}|{int(abs(offset) * 1000)}',
-                    '-threads', '0',
-                    '-y', synced_audio_path
-                ]
-            else:  # Adelantar audio
-                cmd = [
-                    'ffmpeg', '-ss', str(abs(offset)), '-i', audio_path,
-                    '-threads', '0',
-                    '-y', synced_audio_path
-                ]
+                    '-af', f'adelay={int(abs(offset) * 1000)}|{int(abs(offset) * 1000)}'
+                ] + output_args
+            else:  # Doblaje retrasado: adelantar audio
+                cmd = ['ffmpeg', '-ss', str(abs(offset)), '-i', audio_path] + output_args
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
+            result = self._run_ffmpeg(task_id, cmd, timeout=self.stage_timeout, label='offset', duration=total_duration,
+                                      progress=self._task_progress(task_id, 85, 95, "Aplicando sincronización"))
             if result.returncode != 0:
                 raise Exception(f"Error aplicando sincronización: {result.stderr}")
             
-            with self._lock:
-                self.tasks[task_id]['temp_files'].append(synced_audio_path)
-            
             return synced_audio_path
             
         except Exception as e:
             raise Exception(f"Error aplicando sincronización: {str(e)}")
     
+    def _render_native_audio(self, dubbed_video: str, offset_map: OffsetMap, task_id: str,
+                             total_duration: Optional[float] = None) -> str:
+        """Renderizar el mapa de offsets sobre la pista nativa del doblaje (frecuencia, canales y resolución originales)
+        
+        La ruta de análisis (16 kHz mono) solo aporta los offsets en segundos. La pista
+        nativa (5.1 incluido) se decodifica una única vez a un WAV en memmap dentro de
+        ``WORK_FOLDER`` y el renderizado se codifica al vuelo, sin un segundo WAV intermedio.
+        """
+        native_wav = self._materialize_wav(
+            dubbed_video, task_id, 'dubbed_native', sample_rate=None, channels=None, sample_width=None,
+            folder=self.work_folder,
+            progress=self._task_progress(task_id, 85, 90, "Decodificando la pista doblada")
+        )
+        synced_audio_path = str(self.work_folder / f"synced_{task_id}.mka")
+        with self._lock:
+            self.tasks[task_id]['temp_files'].append(synced_audio_path)
+        
+        channels = read_wav_header(native_wav)['channels']
+        encoder_args = ['-c:a', 'aac', '-b:a', self._audio_bitrate(channels)]
+        with scheduler.stage('render', self._cancel_event(task_id)):
+            stats = render_offset_map(native_wav, synced_audio_path, offset_map.regions,
+                                      total_duration=total_duration, encoder_args=encoder_args,
+                                      cancel_event=self._cancel_event(task_id))
+        current_app.logger.info(f"Native piecewise render: {stats['regions']} regions, {channels} channels "
+                                f"in {stats['elapsed']}s ({stats['speed']}x realtime)")
+        
+        # El WAV nativo puede ocupar varios GB: liberarlo en cuanto deja de hacer falta
+        if native_wav != dubbed_video and os.path.exists(native_wav):
+            os.remove(native_wav)
+        return synced_audio_path
+    
+    def _audio_bitrate(self, channels: int) -> str:
+        """Bitrate AAC para ``channels`` canales: ``OUTPUT_AUDIO_BITRATE`` es el de estéreo"""
+        bitrate = str(current_app.config.get('OUTPUT_AUDIO_BITRATE', '192k')).strip().lower()
+        kbps = float(bitrate[:-1]) if bitrate.endswith('k') else float(bitrate) / 1000
+        return f"{int(round(kbps * max(channels, 2) / 2))}k"
+    
+    def _shift_native_audio(self, dubbed_video: str, offset: float, task_id: str,
+                            total_duration: Optional[float] = None) -> str:
+        """Desplazar la pista nativa del doblaje (frecuencia y canales originales) y codificarla"""
+        synced_audio_path = str(self.work_folder / f"synced_{task_id}.mka")
+        with self._lock:
+            self.tasks[task_id]['temp_files'].append(synced_audio_path)
+        
+        output_args = [
+            '-map', '0:a:0',
+            '-c:a', 'aac',
+            '-b:a', self._audio_bitrate(probe_audio_stream(dubbed_video)['channels']),
+            '-threads', '0',
+            '-y', synced_audio_path
+        ]
+        if abs(offset) < 0.1:  # Offset muy pequeño: solo codificar
+            cmd = ['ffmpeg', '-i', dubbed_video] + output_args
+        elif offset < 0:  # Doblaje adelantado: retrasar audio (todos los canales)
+            cmd = ['ffmpeg', '-i', dubbed_video, '-af', f'adelay=delays={int(abs(offset) * 1000)}:all=1'] + output_args
+        else:  # Doblaje retrasado: adelantar audio
+            cmd = ['ffmpeg', '-ss', str(abs(offset)), '-i', dubbed_video] + output_args
+        
+        with scheduler.stage('render', self._cancel_event(task_id)):
+            result = self._run_ffmpeg(task_id, cmd, timeout=3600, label='offset', duration=total_duration,
+                                      progress=self._task_progress(task_id, 85, 95, "Aplicando sincronización"))
+        if result.returncode != 0:
+            raise Exception(f"Error aplicando sincronización: {result.stderr[-2000:]}")
+        return synced_audio_path
+    
+    def _count_audio_streams(self, video_path: str) -> int:
+        """Número de pistas de audio del contenedor (solo lee cabeceras)"""
+        cmd = ['ffprobe', '-v', 'error', '-select_streams', 'a', '-show_entries', 'stream=index',
+               '-of', 'csv=p=0', video_path]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        if result.returncode != 0:
+            raise Exception(f"Error analizando pistas de audio: {result.stderr[-500:]}")
+        return len([line for line in result.stdout.splitlines() if line.strip()])
+    
+    def _mux_command(self, original_video: str, original_audio: str, synced_audio: str, result_path,
+                     shift: Optional[float] = None) -> List[str]:
+        """Comando FFmpeg del MKV final según ``MUX_AUDIO_MODE``
+        
+        - 'copy': video y todas las pistas de audio originales sin recodificar; solo se
+          codifica la pista doblada si todavía no lo está (WAV renderizado).
+        - 'encode': modo anterior, ambas pistas desde las copias de análisis a AAC.
+        
+        Con ``shift`` (desfase global), ``synced_audio`` es el video doblado y su pista
+        comprimida se copia desplazando las marcas de tiempo: ``-itsoffset`` para
+        retrasarla o ``-ss`` de entrada para adelantarla (precisión de un paquete de
+        audio, ~20-30 ms).
+        """
+        bitrate = current_app.config.get('OUTPUT_AUDIO_BITRATE', '192k')
+        if current_app.config.get('MUX_AUDIO_MODE', 'copy') != 'copy':
+            return [
+                'ffmpeg',
+                '-i', original_video,    # Video original
+                '-i', original_audio,    # Audio original
+                '-i', synced_audio,      # Audio sincronizado
+                '-map', '0:v',           # Video del primer input
+                '-map', '1:a:0',         # Audio original
+                '-map', '2:a:0',         # Audio sincronizado
+                '-c:v', 'copy',          # Copiar video sin recodificar
+                '-c:a', 'aac',           # Codec de audio
+                '-b:a', bitrate,         # Bitrate de audio más alto para calidad
+                '-metadata:s:a:0', 'title=Original',
+                '-metadata:s:a:0', 'language=eng',
+                '-metadata:s:a:1', 'title=Doblado',
+                '-metadata:s:a:1', 'language=spa',
+                '-threads', '0',         # Usar todos los cores
+                '-y',                    # Sobrescribir
+                str(result_path)
+            ]
+        
+        dubbed_index = self._count_audio_streams(original_video)  # la pista doblada va detrás
+        dubbed_input = ['-i', synced_audio]
+        if shift is not None and shift < 0:  # Doblaje adelantado: retrasar sus marcas de tiempo
+            dubbed_input = ['-itsoffset', f'{-shift:.3f}'] + dubbed_input
+        elif shift is not None and shift > 0:  # Doblaje retrasado: empezar a leerlo en el desfase
+            dubbed_input = ['-ss', f'{shift:.3f}'] + dubbed_input
+        
+        cmd = [
+            'ffmpeg',
+            '-i', original_video,        # Video y audio originales
+            *dubbed_input,               # Audio sincronizado (o video doblado con desfase)
+            '-map', '0:v',
+            '-map', '0:a',               # Todas las pistas originales, con sus metadatos
+            '-map', '1:a:0',
+            '-c', 'copy',                # Sin recodificar: el mux queda limitado por E/S
+        ]
+        if shift is None and is_wav(synced_audio):
+            cmd += [f'-c:a:{dubbed_index}', 'aac', f'-b:a:{dubbed_index}', bitrate]
+        cmd += [
+            f'-metadata:s:a:{dubbed_index}', 'title=Doblado',
+            f'-metadata:s:a:{dubbed_index}', 'language=spa',
+            '-y',
+            str(result_path)
+        ]
+        return cmd
+    
     def _generate_mkv_final(self, original_video: str, original_audio: str, 
-                           synced_audio: str, task_id: str) -> str:
-        """Generar archivo MKV final con video original y ambas pistas de audio"""
+                           synced_audio: str, task_id: str, shift: Optional[float] = None) -> str:
+        """Generar archivo MKV final con video original y ambas pistas de audio
+        
+        ``shift`` aplica un desfase global por marcas de tiempo (ver ``_mux_command``).
+        """
         try:
             output_dir = current_app.config['OUTPUT_FOLDER']
             output_dir.mkdir(exist_ok=True)
@@ -562,29 +1719,14 @@ class SyncService:
             
             result_path = output_dir / result_filename
             
-            # Comando FFmpeg optimizado para archivos grandes
-            cmd = [
-                'ffmpeg',
-                '-i', original_video,    # Video original
-                '-i', original_audio,    # Audio original
-                '-i', synced_audio,      # Audio sincronizado
-                '-map', '0:v',           # Video del primer input
-                '-map', '1:a',           # Audio original
-                '-map', '2:a',           # Audio sincronizado
-                '-c:v', 'copy',          # Copiar video sin recodificar
-                '-c:a', 'aac',           # Codec de audio
-                '-b:a', '192k',          # Bitrate de audio más alto para calidad
-                '-metadata:s:a:0', 'title=Original',
-                '-metadata:s:a:0', 'language=eng',
-                '-metadata:s:a:1', 'title=Doblado',
-                '-metadata:s:a:1', 'language=spa',
-                '-threads', '0',         # Usar todos los cores
-                '-movflags', '+faststart',  # Optimizar para streaming
-                '-y',                    # Sobrescribir
-                str(result_path)
-            ]
+            cmd = self._mux_command(original_video, original_audio, synced_audio, result_path, shift=shift)
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=3600)  # 1 hora timeout
+            with scheduler.stage('mux', self._cancel_event(task_id)):
+                result = self._run_ffmpeg(
+                    task_id, cmd, timeout=3600, label='mux',  # 1 hora timeout
+                    duration=self._probe_duration(original_video),
+                    progress=self._task_progress(task_id, 95, 99, "Generando archivo MKV final")
+                )
             if result.returncode != 0:
                 raise Exception(f"Error generando MKV: {result.stderr}")
             
@@ -608,6 +1750,7 @@ class SyncService:
                     'progress': progress,
                     'message': message
                 })
+        self._publish_task(task_id)
     
     def _update_task_error(self, task_id: str, error_message: str):
         """Actualizar tarea con error"""
@@ -618,6 +1761,35 @@ class SyncService:
                     'error': error_message,
                     'message': f'Error: {error_message}'
                 })
+        self._publish_task(task_id)
+    
+    def _task_summary(self, task_id: str, task: Dict) -> Dict:
+        """Resumen de una tarea para listados y eventos (llamar con ``self._lock`` adquirido)"""
+        return {
+            'task_id': task_id,
+            'status': task['status'],
+            'progress': task['progress'],
+            'message': task['message'],
+            'error': task.get('error'),
+            'created_at': task['created_at'],
+            'queue_position': scheduler.queue_position(task_id) if task['status'] == 'queued' else None
+        }
+    
+    def _publish_task(self, task_id: str):
+        """Notificar a los clientes del stream SSE el estado actual de una tarea"""
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if task is None or 'status' not in task:
+                return
+            summary = self._task_summary(task_id, task)
+        event_bus.publish('task', summary)
+    
+    def _publish_queue(self):
+        """Notificar las nuevas posiciones de las tareas en cola cuando una sale de ella"""
+        with self._lock:
+            queued = [task_id for task_id, task in self.tasks.items() if task.get('status') == 'queued']
+        for task_id in queued:
+            self._publish_task(task_id)
     
     def _cleanup_task_files(self, task_id: str):
         """Limpiar archivos temporales de una tarea"""
@@ -635,6 +1807,10 @@ class SyncService:
                         with self.app.app_context():
                             current_app.logger.warning(f"Error removing temp file {file_path}: {e}")
             
+            # Las entradas de la caché de audio se conservan; solo se liberan
+            for key in task.get('cache_keys', []):
+                audio_cache.unpin(key)
+            
             if self.app:
                 with self.app.app_context():
                     current_app.logger.info(f"Cleaned up {len(temp_files)} temp files for task {task_id}")
@@ -656,7 +1832,11 @@ class SyncService:
                 'progress': task['progress'],
                 'message': task['message'],
                 'error': task.get('error'),
-                'created_at': task['created_at']
+                'created_at': task['created_at'],
+                'queue_position': scheduler.queue_position(task_id) if task['status'] == 'queued' else None,
+                'branches': task.get('branches', {}),
+                'offset_map': task.get('offset_map'),
+                'metadata': task.get('metadata', {})
             }
     
     def get_result_path(self, task_id: str):
@@ -670,22 +1850,24 @@ class SyncService:
                 return task['result_path']
             return None
     
-    def list_all_tasks(self):
-        """Listar todas las tareas"""
+    def list_all_tasks(self, active_only: bool = False, task_id: Optional[str] = None):
+        """Listar las tareas en memoria
+        
+        ``active_only`` devuelve solo las que están en cola o en curso (las terminadas ya
+        están en la BBDD) y ``task_id`` limita el listado a esa tarea.
+        """
         with self._lock:
-            return {
-                'tasks': [
-                    {
-                        'task_id': task_id,
-                        'status': task['status'],
-                        'progress': task['progress'],
-                        'message': task['message'],
-                        'created_at': task['created_at']
-                    }
-                    for task_id, task in self.tasks.items()
-                ],
-                'total': len(self.tasks)
-            }
+            if task_id:
+                items = [(task_id, self.tasks[task_id])] if task_id in self.tasks else []
+            else:
+                items = self.tasks.items()
+            tasks = [
+                self._task_summary(key, task)
+                for key, task in items
+                if 'status' in task  # excluye registros internos como la precarga de modelos
+                and (not active_only or task['status'] in ('queued', 'processing'))
+            ]
+            return {'tasks': tasks, 'total': len(tasks)}
 
 # Instancia global del servicio
 sync_service = SyncService()
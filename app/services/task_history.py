@@ -0,0 +1,75 @@
+"""
+Historial de tareas en BBDD: índices y paginación por cursor (coste proporcional a la página)
+"""
+
+import base64
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import Index, and_, or_
+from app.models.database import db
+from app.models.task import SyncTask
+
+# (created_at, id) cubre el orden y el cursor; (status, created_at) los filtros por estado
+TASK_HISTORY_INDEXES = (
+    Index('ix_sync_tasks_created_at_id', SyncTask.created_at, SyncTask.id),
+    Index('ix_sync_tasks_status_created_at', SyncTask.status, SyncTask.created_at),
+)
+
+def ensure_task_indexes():
+    """Crear los índices si faltan (tablas creadas por versiones anteriores); requiere contexto de app"""
+    for index in TASK_HISTORY_INDEXES:
+        index.create(bind=db.engine, checkfirst=True)
+
+def encode_cursor(created_at: datetime, task_id: str) -> str:
+    raw = f"{created_at.isoformat()}|{task_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Posición (created_at, id) de la última fila devuelta; ValueError si el cursor no es válido"""
+    try:
+        created_at, task_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|', 1)
+        return datetime.fromisoformat(created_at), task_id
+    except (UnicodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Cursor no válido: {cursor}") from e
+
+def parse_date(value: Optional[str]) -> Optional[datetime]:
+    """Fecha ISO (``2024-05-01`` o ``2024-05-01T10:00:00``) o None; ValueError si no es válida
+
+    Las fechas con zona horaria se pasan a hora local sin zona, como ``created_at``.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError as e:
+        raise ValueError(f"Fecha no válida: {value}") from e
+    return parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo else parsed
+
+def query_task_history(limit: int, cursor: Optional[str] = None, statuses: Sequence[str] = (),
+                       since: Optional[datetime] = None, until: Optional[datetime] = None,
+                       exclude_ids: Sequence[str] = ()) -> Tuple[List[Dict], Optional[str]]:
+    """Una página del historial, de la más reciente a la más antigua
+
+    Devuelve ``(tareas, siguiente_cursor)``. Las tareas de ``exclude_ids`` (las que siguen
+    en memoria) se omiten de la respuesta pero cuentan para el cursor, de modo que las
+    páginas siguientes no se desplazan.
+    """
+    query = SyncTask.query
+    if statuses:
+        query = query.filter(SyncTask.status.in_(list(statuses)))
+    if since:
+        query = query.filter(SyncTask.created_at >= since)
+    if until:
+        query = query.filter(SyncTask.created_at < until)
+    if cursor:
+        created_at, task_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            SyncTask.created_at < created_at,
+            and_(SyncTask.created_at == created_at, SyncTask.id < task_id)
+        ))
+
+    # Una fila extra indica si hay más páginas sin contar toda la tabla
+    rows = query.order_by(SyncTask.created_at.desc(), SyncTask.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+    excluded = set(exclude_ids)
+    return [row.to_dict() for row in rows[:limit] if row.id not in excluded], next_cursor
@@ -0,0 +1,102 @@
+"""
+Caché persistente de transcripciones (SQLite) por huella de audio, modelo y opciones
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+from app.utils.file_utils import content_fingerprint
+
+class TranscriptCache:
+    """Almacén de segmentos transcritos con expulsión LRU por número de entradas"""
+
+    def __init__(self, db_path: Optional[str] = None, max_entries: int = 500):
+        self.db_path = Path(db_path) if db_path else None
+        self.max_entries = max_entries
+        self.enabled = db_path is not None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def configure(self, db_path, max_entries: int, enabled: bool = True):
+        """Configurar ubicación y tamaño máximo (se llama desde set_app)"""
+        self.db_path = Path(db_path)
+        self.max_entries = max_entries
+        self.enabled = enabled
+        if enabled:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS transcripts ('
+                    ' key TEXT PRIMARY KEY,'
+                    ' model TEXT NOT NULL,'
+                    ' segments TEXT NOT NULL,'
+                    ' created_at REAL NOT NULL,'
+                    ' last_used REAL NOT NULL)'
+                )
+                conn.execute('CREATE INDEX IF NOT EXISTS ix_transcripts_last_used ON transcripts (last_used)')
+
+    @contextmanager
+    def _connect(self):
+        """Conexión de corta duración (una por operación, segura entre hilos)"""
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def key_for(self, audio_path: str, model_name: str, options: Dict) -> str:
+        """Clave: huella del contenido del audio + modelo + opciones de decodificación"""
+        payload = f"{content_fingerprint(audio_path)}|{model_name}|{json.dumps(options, sort_keys=True)}"
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict]]:
+        """Devolver la lista de segmentos cacheados o None"""
+        with self._lock, self._connect() as conn:
+            row = conn.execute('SELECT segments FROM transcripts WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute('UPDATE transcripts SET last_used = ? WHERE key = ?', (time.time(), key))
+            self.hits += 1
+
+        return [
+            {'start': start, 'end': end, 'text': text, 'confidence': confidence}
+            for start, end, text, confidence in json.loads(row[0])
+        ]
+
+    def put(self, key: str, model_name: str, segments: List[Dict]):
+        """Guardar segmentos en formato compacto y aplicar la política de expulsión"""
+        compact = json.dumps(
+            [[round(s['start'], 3), round(s['end'], 3), s['text'], s.get('confidence', 1.0)] for s in segments],
+            ensure_ascii=False, separators=(',', ':')
+        )
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO transcripts (key, model, segments, created_at, last_used) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, model_name, compact, now, now)
+            )
+            conn.execute(
+                'DELETE FROM transcripts WHERE key IN ('
+                ' SELECT key FROM transcripts ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = 0
+            if self.enabled:
+                with self._connect() as conn:
+                    entries = conn.execute('SELECT COUNT(*) FROM transcripts').fetchone()[0]
+            return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'max_entries': self.max_entries}
+
+# Instancia global de la caché
+transcript_cache = TranscriptCache()
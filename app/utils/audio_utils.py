@@ -0,0 +1,92 @@
+"""
+Utilidades para leer y escribir audio PCM (WAV) sin cargarlo completo en memoria
+"""
+
+import struct
+import wave
+import numpy as np
+from typing import Tuple
+
+PCM_DTYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+RIFF_IDS = (b'RIFF', b'RF64', b'BW64')  # RF64/BW64: WAV de más de 4 GiB (tamaños en el bloque ds64)
+
+def is_wav(path: str) -> bool:
+    """Comprobar por la firma RIFF/WAVE (o RF64) si un archivo es WAV"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(12)
+    except OSError:
+        return False
+    return len(header) == 12 and header[:4] in RIFF_IDS and header[8:] == b'WAVE'
+
+def read_wav_header(path: str) -> dict:
+    """Leer cabecera WAV (o RF64) y localizar el bloque de datos PCM"""
+    with open(path, 'rb') as f:
+        riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+        if riff not in RIFF_IDS or wave_id != b'WAVE':
+            raise ValueError(f"No es un archivo WAV válido: {path}")
+
+        info = {}
+        data_size64 = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                break
+            chunk_id, chunk_size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                fmt = f.read(chunk_size)
+                audio_format, channels, sample_rate, _, _, bits = struct.unpack('<HHIIHH', fmt[:16])
+                info.update(format=audio_format, channels=channels,
+                            sample_rate=sample_rate, sample_width=bits // 8)
+                if chunk_size % 2:
+                    f.seek(1, 1)
+            elif chunk_id == b'ds64':
+                # RF64: el tamaño real del bloque de datos va en 64 bits
+                ds64 = f.read(chunk_size)
+                data_size64 = struct.unpack('<QQ', ds64[:16])[1]
+            elif chunk_id == b'data':
+                info['data_offset'] = f.tell()
+                f.seek(0, 2)
+                available = f.tell() - info['data_offset']
+                if chunk_size == 0xFFFFFFFF:
+                    # RF64 (tamaño en ds64) o salida no seekable / WAV de más de 4 GiB: hasta el final
+                    chunk_size = data_size64 if data_size64 else available
+                info['data_size'] = min(chunk_size, available) if chunk_size else available
+                break
+            else:
+                f.seek(chunk_size + (chunk_size % 2), 1)
+
+    if 'data_offset' not in info or 'channels' not in info:
+        raise ValueError(f"WAV sin bloques fmt/data: {path}")
+
+    frame_size = info['channels'] * info['sample_width']
+    info['frames'] = info['data_size'] // frame_size
+    info['duration'] = info['frames'] / float(info['sample_rate'])
+    return info
+
+def open_wav_memmap(path: str) -> Tuple[np.memmap, int]:
+    """Abrir un WAV PCM como memmap de forma (frames, canales) sin leerlo"""
+    info = read_wav_header(path)
+    if info['format'] not in (1, 0xFFFE) or info['sample_width'] not in PCM_DTYPES:
+        raise ValueError(f"Formato WAV no soportado (solo PCM entero): {path}")
+
+    data = np.memmap(
+        path,
+        dtype=PCM_DTYPES[info['sample_width']],
+        mode='r',
+        offset=info['data_offset'],
+        shape=(info['frames'], info['channels'])
+    )
+    return data, info['sample_rate']
+
+def wav_duration(path: str) -> float:
+    """Duración en segundos leída de la cabecera (sin ffprobe)"""
+    return read_wav_header(path)['duration']
+
+def open_wav_writer(path: str, sample_rate: int, channels: int, sample_width: int = 2):
+    """Abrir un WAV PCM de salida para escritura incremental por bloques"""
+    writer = wave.open(path, 'wb')
+    writer.setnchannels(channels)
+    writer.setsampwidth(sample_width)
+    writer.setframerate(sample_rate)
+    return writer
@@ -164,3 +164,44 @@ def validate_custom_filename(filename):
     
     return True, clean_name
 
+
+def file_fingerprint(filepath, sample_bytes=1024 * 1024):
+    """Huella rápida de un archivo: ruta, tamaño, mtime y hash parcial del contenido
+    
+    Solo se leen el primer y el último bloque de ``sample_bytes`` para que la huella
+    sea barata incluso con archivos de varios GB sobre NFS.
+    """
+    import hashlib
+    path = os.path.abspath(filepath)
+    stat = os.stat(path)
+    digest = hashlib.sha1()
+    digest.update(f"{path}|{stat.st_size}|{stat.st_mtime_ns}".encode('utf-8'))
+    
+    with open(path, 'rb') as f:
+        digest.update(f.read(sample_bytes))
+        if stat.st_size > sample_bytes:
+            f.seek(max(sample_bytes, stat.st_size - sample_bytes))
+            digest.update(f.read(sample_bytes))
+    
+    return digest.hexdigest()
+
+def content_fingerprint(filepath, samples=16, block_size=64 * 1024):
+    """Huella del contenido independiente de la ruta: tamaño + bloques muestreados
+    
+    Dos extracciones idénticas del mismo audio producen la misma huella aunque
+    estén en rutas distintas o se hayan regenerado.
+    """
+    import hashlib
+    size = os.path.getsize(filepath)
+    digest = hashlib.sha1(str(size).encode('utf-8'))
+    
+    with open(filepath, 'rb') as f:
+        if size <= samples * block_size:
+            digest.update(f.read())
+        else:
+            step = (size - block_size) // (samples - 1)
+            for i in range(samples):
+                f.seek(i * step)
+                digest.update(f.read(block_size))
+    
+    return digest.hexdigest()
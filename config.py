@@ -27,21 +27,78 @@ class Config:
     
     # Configuración de modelos IA
     WHISPER_MODEL = os.environ.get('WHISPER_MODEL', 'base')
+    # Motor ASR: 'whisper' (PyTorch) o 'faster-whisper' (CTranslate2, int8 en CPU)
+    ASR_BACKEND = os.environ.get('ASR_BACKEND', 'whisper')
+    ASR_COMPUTE_TYPE = os.environ.get('ASR_COMPUTE_TYPE', 'default')  # default = int8 en CPU, float16 en GPU
+    # Idioma de las pistas ('es', 'en'...); vacío = detectarlo una vez por pista
+    ASR_LANGUAGE = os.environ.get('ASR_LANGUAGE', '')
     SENTENCE_TRANSFORMER_MODEL = os.environ.get('SENTENCE_TRANSFORMER_MODEL', 'paraphrase-multilingual-MiniLM-L12-v2')
+    PRELOAD_MODELS = os.environ.get('PRELOAD_MODELS', 'false').lower() == 'true'
+    MODEL_IDLE_TIMEOUT = int(os.environ.get('MODEL_IDLE_TIMEOUT', 900))  # segundos sin uso antes de descargar
     
     # Configuración de sincronización
     SIMILARITY_THRESHOLD = float(os.environ.get('SIMILARITY_THRESHOLD', 0.7))
     MAX_TIME_DRIFT = float(os.environ.get('MAX_TIME_DRIFT', 10.0))
+    ALIGNMENT_BAND = int(os.environ.get('ALIGNMENT_BAND', 100))  # segmentos alrededor de la diagonal
+    ALIGNMENT_TOLERANCE = float(os.environ.get('ALIGNMENT_TOLERANCE', 0.5))  # segundos entre tramos
+    
+    # Vía rápida por correlación cruzada (omite Whisper si la confianza es alta)
+    XCORR_ENABLED = os.environ.get('XCORR_ENABLED', 'true').lower() == 'true'
+    XCORR_CONFIDENCE_THRESHOLD = float(os.environ.get('XCORR_CONFIDENCE_THRESHOLD', 0.4))
+    XCORR_MAX_OFFSET = float(os.environ.get('XCORR_MAX_OFFSET', 120.0))  # segundos
+    # Análisis por ventanas: decodificar solo N ventanas de cada archivo (0 = desactivado)
+    ANALYSIS_WINDOWS = int(os.environ.get('ANALYSIS_WINDOWS', 8))
+    ANALYSIS_WINDOW_SECONDS = float(os.environ.get('ANALYSIS_WINDOW_SECONDS', 90.0))
     
     # Configuración de audio
     AUDIO_SAMPLE_RATE = int(os.environ.get('AUDIO_SAMPLE_RATE', 16000))
     AUDIO_FORMAT = os.environ.get('AUDIO_FORMAT', 'wav')
-    OUTPUT_AUDIO_BITRATE = os.environ.get('OUTPUT_AUDIO_BITRATE', '192k')
+    OUTPUT_AUDIO_BITRATE = os.environ.get('OUTPUT_AUDIO_BITRATE', '192k')  # estéreo; escala con los canales (5.1 = 576k)
+    # Intermedios grandes en disco (pista nativa decodificada para el renderizado): no en /tmp
+    WORK_FOLDER = Path(os.environ.get('WORK_FOLDER', str(BASE_DIR / 'cache' / 'work')))
+    # Mux final: 'copy' = audio original sin recodificar y desfase sobre la pista nativa del doblaje,
+    # 'encode' = ambas pistas a AAC desde las copias de análisis (modo anterior)
+    MUX_AUDIO_MODE = os.environ.get('MUX_AUDIO_MODE', 'copy')
+    # Desfase global: 'timestamp' = desplazar marcas de tiempo al multiplexar (sin decodificar, requiere
+    # MUX_AUDIO_MODE=copy), 'reencode' = desplazar y codificar la pista del doblaje
+    OFFSET_APPLY_MODE = os.environ.get('OFFSET_APPLY_MODE', 'timestamp')
+    
+    # Caché de audio extraído (clave: ruta, tamaño, mtime y hash parcial del archivo fuente)
+    AUDIO_CACHE_ENABLED = os.environ.get('AUDIO_CACHE_ENABLED', 'true').lower() == 'true'
+    AUDIO_CACHE_FOLDER = Path(os.environ.get('AUDIO_CACHE_FOLDER', str(BASE_DIR / 'cache' / 'audio')))
+    AUDIO_CACHE_MAX_BYTES = int(os.environ.get('AUDIO_CACHE_MAX_BYTES', 20 * 1024 ** 3))  # 20GB
+    
+    # Caché de transcripciones (clave: huella del audio + motor/modelo ASR + opciones de decodificación)
+    TRANSCRIPT_CACHE_ENABLED = os.environ.get('TRANSCRIPT_CACHE_ENABLED', 'true').lower() == 'true'
+    TRANSCRIPT_CACHE_PATH = Path(os.environ.get('TRANSCRIPT_CACHE_PATH', str(BASE_DIR / 'cache' / 'transcripts.db')))
+    TRANSCRIPT_CACHE_MAX_ENTRIES = int(os.environ.get('TRANSCRIPT_CACHE_MAX_ENTRIES', 500))
+    
+    # Caché de embeddings (float16, clave: modelo + hash del texto normalizado)
+    EMBEDDING_CACHE_ENABLED = os.environ.get('EMBEDDING_CACHE_ENABLED', 'true').lower() == 'true'
+    EMBEDDING_CACHE_FOLDER = Path(os.environ.get('EMBEDDING_CACHE_FOLDER', str(BASE_DIR / 'cache' / 'embeddings')))
+    EMBEDDING_CACHE_MAX_ROWS = int(os.environ.get('EMBEDDING_CACHE_MAX_ROWS', 1000000))  # por modelo
+    
+    # Checkpoints por etapa: una tarea interrumpida o reintentada continúa desde la última etapa completada
+    CHECKPOINT_ENABLED = os.environ.get('CHECKPOINT_ENABLED', 'true').lower() == 'true'
+    CHECKPOINT_FOLDER = Path(os.environ.get('CHECKPOINT_FOLDER', str(BASE_DIR / 'cache' / 'checkpoints')))
     
     # Configuración de procesamiento
     NUM_THREADS = int(os.environ.get('NUM_THREADS', 0))  # 0 = usar todos los cores
     AUDIO_CHUNK_SIZE = int(os.environ.get('AUDIO_CHUNK_SIZE', 60))  # segundos
+    AUDIO_CHUNK_OVERLAP = float(os.environ.get('AUDIO_CHUNK_OVERLAP', 5))  # segundos extra a cada lado
+    VAD_ENABLED = os.environ.get('VAD_ENABLED', 'true').lower() == 'true'  # transcribir solo tramos con voz
+    # Por debajo de esta fracción de voz el VAD se considera fallido y se transcribe la pista completa
+    VAD_MIN_SPEECH_RATIO = float(os.environ.get('VAD_MIN_SPEECH_RATIO', 0.05))
     MAX_PROCESSING_TIME = int(os.environ.get('MAX_PROCESSING_TIME', 3600))  # 1 hora
+    STAGE_TIMEOUT = int(os.environ.get('STAGE_TIMEOUT', 1800))  # extracción y análisis de una pista completa
+    MAX_CONCURRENT_TASKS = int(os.environ.get('MAX_CONCURRENT_TASKS', 2))  # workers del planificador
+    # Concurrencia máxima por etapa entre todas las tareas (etapas sin límite: ilimitadas)
+    # 'transcribe' = réplicas de Whisper: los fragmentos de una transcripción se reparten entre ellas
+    STAGE_LIMITS = os.environ.get('STAGE_LIMITS', 'extract=4,transcribe=1,embed=1,render=2,mux=2')
+    # Ejecución de etapas CPU (extracción, transcripción, embeddings, alineamiento):
+    # 'process' = pool de procesos separado del proceso Flask, 'thread' = en el propio proceso
+    STAGE_EXECUTOR = os.environ.get('STAGE_EXECUTOR', 'process')
+    PROCESS_POOL_WORKERS = int(os.environ.get('PROCESS_POOL_WORKERS', 2))
     
     # Configuración de limpieza
     AUTO_CLEANUP = os.environ.get('AUTO_CLEANUP', 'true').lower() == 'true'
@@ -395,18 +395,41 @@ class SyncDubUploader {
         }
     }
 
-    async monitorTask(taskId) {
+    monitorTask(taskId) {
+        const handleStatus = (data) => {
+            if (data.status === 'completed') {
+                this.showResult(`/api/download/${taskId}`);
+                return true;
+            }
+            if (data.status === 'error' || data.status === 'cancelled') {
+                this.showError(data.error || data.message || 'Error en el procesamiento');
+                return true;
+            }
+            const message = data.status === 'queued' && data.queue_position
+                ? `En cola (posición ${data.queue_position})`
+                : (data.message || 'Procesando...');
+            this.updateProgress(data.progress || 0, message);
+            return false;
+        };
+
+        if (window.EventSource) {
+            // Estado por push (SSE) limitado a esta tarea
+            const stream = new EventSource(`/api/tasks/stream?task_id=${encodeURIComponent(taskId)}`);
+            const onUpdate = (data) => {
+                if (handleStatus(data)) {
+                    stream.close();
+                }
+            };
+            stream.addEventListener('snapshot', event => JSON.parse(event.data).tasks.forEach(onUpdate));
+            stream.addEventListener('task', event => onUpdate(JSON.parse(event.data)));
+            return;
+        }
+
         const checkStatus = async () => {
             try {
                 const response = await fetch(`/api/status/${taskId}`);
                 const data = await response.json();
-
-                if (data.status === 'completed') {
-                    this.showResult(`/api/download/${taskId}`);
-                } else if (data.status === 'failed') {
-                    this.showError(data.error || 'Error en el procesamiento');
-                } else {
-                    this.updateProgress(data.progress || 0, data.message || 'Procesando...');
+                if (!handleStatus(data)) {
                     setTimeout(checkStatus, 2000);
                 }
             } catch (error) {
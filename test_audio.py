@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Pruebas deterministas de las funciones de audio puras (sin Flask, FFmpeg ni modelos)
+
+Ejecutar con: python -m pytest -q test_audio.py
+"""
+
+import struct
+import wave
+import numpy as np
+from app.services.alignment import OffsetMap, OffsetRegion
+from app.services.audio_analysis import xcorr_offset
+from app.services.renderer import render_offset_map
+from app.services.stages import source_time
+from app.services.vad import speech_regions, speech_ratio
+from app.utils.audio_utils import read_wav_header, open_wav_memmap
+
+ENVELOPE_RATE = 100
+
+def _write_wav(path, samples: np.ndarray, sample_rate: int):
+    with wave.open(str(path), 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(samples.astype(np.int16).tobytes())
+
+def _read_wav(path) -> np.ndarray:
+    with wave.open(str(path), 'rb') as w:
+        return np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+
+def _onsets(seconds: float, seed: int) -> np.ndarray:
+    """Envolvente de onsets dispersa (picos aleatorios, como golpes y sílabas)"""
+    rng = np.random.default_rng(seed)
+    envelope = np.zeros(int(seconds * ENVELOPE_RATE), dtype=np.float32)
+    hits = rng.choice(len(envelope), size=len(envelope) // 20, replace=False)
+    envelope[hits] = rng.uniform(0.5, 1.0, size=len(hits))
+    return envelope
+
+def test_xcorr_known_offset():
+    """Un doblaje que empieza 2.37 s más tarde da offset +2.37 con todas las ventanas de acuerdo"""
+    orig = _onsets(600, seed=1)
+    lag = 237
+    dub = np.concatenate([_onsets(lag / ENVELOPE_RATE, seed=2) * 0.1, orig])
+
+    offset, confidence, details = xcorr_offset(orig, dub, envelope_rate=ENVELOPE_RATE, max_offset=10)
+
+    assert abs(offset - lag / ENVELOPE_RATE) < 1e-6
+    assert details['consistent']
+    assert confidence > 0.9
+
+def test_xcorr_reel_break_is_not_consistent():
+    """Si el desfase cambia a mitad de pista (cambio de rollo) no se acepta un offset global"""
+    orig = _onsets(600, seed=3)
+    half = len(orig) // 2
+    # Primera mitad +1 s, segunda mitad +4 s
+    dub = np.concatenate([np.zeros(100, np.float32), orig[:half], np.zeros(300, np.float32), orig[half:]])
+
+    _, _, details = xcorr_offset(orig, dub, envelope_rate=ENVELOPE_RATE, max_offset=10)
+
+    assert sorted({round(w['offset']) for w in details['windows']}) == [1, 4]
+    assert not details['consistent']
+
+def test_offset_map_single_step():
+    """Un escalón en t=5 s: tramo a +0.5 s y tramo a +1.5 s, serializable y consultable"""
+    offset_map = OffsetMap([OffsetRegion(0.0, 5.0, 0.5, anchors=3), OffsetRegion(5.0, None, 1.5, anchors=7)])
+    restored = OffsetMap.from_dict(offset_map.to_dict())
+
+    assert not restored.is_global
+    assert restored.global_offset == 1.5
+    assert restored.offset_at(4.99) == 0.5
+    assert restored.offset_at(5.0) == 1.5
+    assert OffsetMap.constant(-2.0).is_global
+
+def test_render_offset_map_step(tmp_path):
+    """Render con escalón: out(t) = dub(t + offset) a cada lado del corte"""
+    sample_rate = 1000
+    # Cada muestra vale su índice: el valor leído indica de qué instante procede
+    source = np.arange(20 * sample_rate) % 30000
+    source_path, output_path = tmp_path / 'dub.wav', tmp_path / 'synced.wav'
+    _write_wav(source_path, source, sample_rate)
+
+    regions = [OffsetRegion(0.0, 5.0, 0.5), OffsetRegion(5.0, None, 1.5)]
+    stats = render_offset_map(str(source_path), str(output_path), regions, total_duration=10.0,
+                              block_frames=777, crossfade=0.02)
+    out = _read_wav(output_path)
+
+    assert stats['frames'] == len(out) == 10 * sample_rate
+    assert out[1000] == source[1500]
+    assert out[4900] == source[5400]
+    # Pasado el crossfade de 20 ms el material es el del nuevo desfase (se cortó 1 s del doblaje)
+    assert out[5100] == source[6600]
+    assert out[9999] == source[11499]
+
+def test_render_offset_map_gap_inserts_silence(tmp_path):
+    """Si el offset decrece se inserta silencio en lugar de repetir audio"""
+    sample_rate = 1000
+    source = np.full(20 * sample_rate, 1000)
+    source_path, output_path = tmp_path / 'dub.wav', tmp_path / 'synced.wav'
+    _write_wav(source_path, source, sample_rate)
+
+    regions = [OffsetRegion(0.0, 5.0, 1.5), OffsetRegion(5.0, None, 0.5)]
+    render_offset_map(str(source_path), str(output_path), regions, total_duration=10.0, crossfade=0.02)
+    out = _read_wav(output_path)
+
+    assert np.all(out[5000:6000] == 0)
+    assert np.all(out[6100:] == 1000)
+
+def test_rf64_header_over_4gib(tmp_path):
+    """Cabecera RF64 con 5 GiB de datos (archivo disperso): tamaño real leído del bloque ds64"""
+    sample_rate, channels, width = 48000, 6, 2
+    frames = 5 * 1024 ** 3 // (channels * width) + 1
+    data_size = frames * channels * width
+    fmt = struct.pack('<HHIIHH', 1, channels, sample_rate, sample_rate * channels * width, channels * width, 8 * width)
+    header = (b'RF64' + struct.pack('<I', 0xFFFFFFFF) + b'WAVE'
+              + b'ds64' + struct.pack('<IQQQI', 28, 4 + 36 + 24 + data_size, data_size, frames, 0)
+              + b'fmt ' + struct.pack('<I', len(fmt)) + fmt
+              + b'data' + struct.pack('<I', 0xFFFFFFFF))
+    path = tmp_path / 'long.wav'
+    with open(path, 'wb') as f:
+        f.write(header)
+        # Último frame con valores conocidos; el resto queda como hueco del archivo disperso
+        f.seek(len(header) + data_size - channels * width)
+        f.write(np.arange(1, channels + 1, dtype=np.int16).tobytes())
+
+    info = read_wav_header(str(path))
+    assert info['data_offset'] == len(header)
+    assert info['data_size'] == data_size
+    assert info['frames'] == frames
+    assert abs(info['duration'] - frames / sample_rate) < 1e-9
+
+    samples, rate = open_wav_memmap(str(path))
+    assert rate == sample_rate
+    assert samples.shape == (frames, channels)
+    assert samples[-1].tolist() == [1, 2, 3, 4, 5, 6]
+
+def test_streamed_wav_reads_to_end(tmp_path):
+    """Un WAV escrito sin poder volver atrás (tamaño 0xFFFFFFFF) se lee hasta el final del archivo"""
+    fmt = struct.pack('<HHIIHH', 1, 1, 16000, 32000, 2, 16)
+    payload = np.arange(1000, dtype=np.int16).tobytes()
+    path = tmp_path / 'pipe.wav'
+    path.write_bytes(b'RIFF' + struct.pack('<I', 0xFFFFFFFF) + b'WAVE' + b'fmt ' + struct.pack('<I', 16) + fmt
+                     + b'data' + struct.pack('<I', 0xFFFFFFFF) + payload)
+
+    assert read_wav_header(str(path))['frames'] == 1000
+
+def _voice_over_bed(path, seconds: int, speech: bool, sample_rate: int = 16000):
+    """Sílabas armónicas (3.2 s de cada 5) sobre un tono continuo de 110/220 Hz y ruido blanco"""
+    t = np.arange(seconds * sample_rate) / sample_rate
+    rng = np.random.default_rng(0)
+    signal = 3000 * (np.sin(2 * np.pi * 110 * t) + np.sin(2 * np.pi * 220 * t)) + rng.normal(0, 30, len(t))
+    if speech:
+        phase = 2 * np.pi * np.cumsum(140 + 20 * np.sin(2 * np.pi * 0.3 * t)) / sample_rate
+        voice = sum(np.sin(k * phase) / (1 + abs(k * 140 - 900) / 600) for k in range(2, 24))
+        syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 0.5
+        sentences = (t % 5) < 3.2
+        voice = voice * syllables * sentences
+        signal += voice * 4000 / np.sqrt(np.mean(voice[sentences] ** 2))
+    _write_wav(path, np.clip(signal, -32767, 32767), sample_rate)
+
+def test_vad_speech_over_tone_and_noise(tmp_path):
+    """Los diálogos se detectan aunque haya un tono continuo de fondo"""
+    path = tmp_path / 'speech.wav'
+    _voice_over_bed(path, 30, speech=True)
+
+    regions, duration = speech_regions(str(path))
+
+    assert abs(duration - 30) < 0.1
+    assert 0.5 < speech_ratio(regions, duration) < 0.85
+    # Cada frase (0-3.2 s de cada bloque de 5 s) cae dentro de algún tramo
+    for sentence in range(1, 6):
+        middle = sentence * 5 + 1.6
+        assert any(start <= middle <= end for start, end in regions)
+
+def test_vad_tone_and_noise_only(tmp_path):
+    """Un tono sostenido con ruido no es voz"""
+    path = tmp_path / 'bed.wav'
+    _voice_over_bed(path, 30, speech=False)
+
+    regions, duration = speech_regions(str(path))
+
+    assert speech_ratio(regions, duration) < 0.05
+
+def test_packed_time_map():
+    """Instantes del audio empaquetado (tramos unidos con 0.5 s de silencio) vuelven al original"""
+    packed_starts = np.array([0.0, 2.5, 6.0])
+    starts = np.array([10.0, 50.0, 100.0])
+    lengths = np.array([2.0, 3.0, 4.0])
+
+    assert source_time(1.9, packed_starts, starts, lengths) == 11.9
+    # El silencio de separación se lleva al final del tramo anterior
+    assert source_time(2.2, packed_starts, starts, lengths) == 12.0
+    assert source_time(3.0, packed_starts, starts, lengths) == 50.5
+    assert source_time(6.5, packed_starts, starts, lengths) == 100.5